@@ -11,12 +11,18 @@ TYPE_COLUMN = "Typ"
 DESC_COLUMN = "Benennung"
 IDENT_COLUMN = "Identifikation"
 STORED_AMOUNT_COLUMN = "Stueckzahl"
+# Below this amount an entry is put on the shopping list, 0 for never
+MIN_AMOUNT_COLUMN = "Mindestbestand"
 
 LOCATION_SHEET = "Locations"
 LOCATION_NAME_COLUMN = "Name"
 LOCATION_ID_COLUMN = "UUID"
 LOCATION_PARENT_COLUMN = "Parent"
 
+# Further locations of entries, each with its own amount. The main location is in the data sheet.
+STOCK_SHEET = "Stock"
+STOCK_COLUMNS = [ID_COLUMN, LOCATION_COLUMN, STORED_AMOUNT_COLUMN]
+
 INFO_SHEET = "Info"
 INFO_KEY_COLUMN = "Key"
 INFO_VALUE_COLUMN = "Value"
@@ -27,6 +33,39 @@ REQUIRED_DB_VERSION = "v0.3.0"
 SETTINGS_FILE_PATH = "settings.json"
 SCANNED_IDS_FILE_PATH = "scannedIDs.json"
 
+# Pending changes are written after this many milliseconds without a new change
+SAVE_IDLE_MS = 2000
+# or after this many changes, whatever comes first
+SAVE_MAX_MUTATIONS = 10
+# Seconds a station waits for another one to finish writing the excel file (see db.writeLock())
+FILE_LOCK_TIMEOUT_S = 90
+# A lock file older than this many seconds was left behind by a crashed station and is removed
+FILE_LOCK_STALE_S = 60
+
+# Rendered label symbols, cached by the hash of their code
+LABEL_CACHE_DIR = "labelCache"
+# Labels per A4 sheet
+LABEL_COLUMNS = 3
+LABEL_ROWS = 10
+
+# How long another station waits for the answer to a scan (see scanServer)
+SCAN_SERVER_TIMEOUT_S = 5
+
+# Every processed scan is appended to a journal in this directory (see scanLog),
+# the journal is compacted into a segment after this many scans or at the start of a new month
+SCAN_LOG_DIR = "scanLog"
+SCAN_LOG_SEGMENT_ROWS = 50_000
+# Segments with only older scans are deleted
+SCAN_LOG_KEEP_DAYS = 730
+# Reorder quantities are suggested to last this many weeks at the observed consumption
+CONSUMPTION_COVER_WEEKS = 8
+
+# Repeated texts are stored as categories and whole numbers with 32 bit, see db.compactColumns()
+COMPACT_DATA = True
+
+# The columns needed for scanning are kept here, so the scan view opens before the excel file is parsed (see lazyLoad)
+STARTUP_CACHE_FILE = "startupCache.pkl"
+
 Examples = {
     TYPE_COLUMN: "z.B. Led rot",
     DESC_COLUMN: "z.B. 2.1V",
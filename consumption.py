@@ -0,0 +1,403 @@
+import argparse
+import os
+import sys
+import time
+from PySide6.QtCore import Qt
+from PySide6.QtWidgets import (
+    QFileDialog,
+    QHBoxLayout,
+    QHeaderView,
+    QLabel,
+    QMessageBox,
+    QPushButton,
+    QSpinBox,
+    QTableWidget,
+    QTableWidgetItem,
+    QTabWidget,
+    QVBoxLayout,
+    QWidget,
+)
+import numpy as np
+import pandas as pd
+
+from consts import (
+    CONSUMPTION_COVER_WEEKS,
+    DESC_COLUMN,
+    ID_COLUMN,
+    LOCATION_COLUMN,
+    SCAN_LOG_DIR,
+    TYPE_COLUMN,
+)
+import db
+from location import treeOrder
+from reorder import storedAmounts
+from reports import NO_LOCATION, UNKNOWN_LOCATION
+from scanLog import MODE_COLUMN, QUANTITY_COLUMN, TIME_COLUMN, loadScans
+from state import Data, State, mainWindow
+
+SCANS_COLUMN = "Scans"
+USED_COLUMN = "Verbrauch"
+RATE_COLUMN = "Pro Woche"
+STORED_COLUMN = "Bestand"
+LASTS_COLUMN = "Reicht (Wochen)"
+SUGGESTION_COLUMN = "Vorschlag"
+WEEK_COLUMN = "Woche ab"
+PARTS_COLUMN = "Teile"
+PATH_COLUMN = "Lagerort"
+
+PART_COLUMNS = [
+    ID_COLUMN,
+    TYPE_COLUMN,
+    DESC_COLUMN,
+    SCANS_COLUMN,
+    USED_COLUMN,
+    RATE_COLUMN,
+    STORED_COLUMN,
+    LASTS_COLUMN,
+    SUGGESTION_COLUMN,
+]
+WEEK_COLUMNS = [WEEK_COLUMN, SCANS_COLUMN, PARTS_COLUMN, USED_COLUMN]
+LOCATION_COLUMNS = [PATH_COLUMN, PARTS_COLUMN, USED_COLUMN]
+
+# Scans that change the list: adding is a consumption, removing from the list corrects it
+CONSUMPTION_MODES = ["add", "delete"]
+
+SECONDS_PER_WEEK = 7 * 86400
+
+
+def consumptionScans(scans: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns the scans that added entries to the list or removed them (not the counts of a stock-taking).
+    """
+    return scans[scans[MODE_COLUMN].isin(CONSUMPTION_MODES)]
+
+
+def observedWeeks(scans: pd.DataFrame, since: int, now: int) -> float:
+    """
+    Returns the weeks from the start of the period, or the first scan if the log is younger, until now. At least one week.
+    """
+    if scans.empty:
+        return 1.0
+    start = max(since, int(scans[TIME_COLUMN].min()))
+    return max(1.0, (now - start) / SECONDS_PER_WEEK)
+
+
+def consumptionPerPart(
+    scans: pd.DataFrame,
+    data: Data,
+    weeks: float,
+    coverWeeks: int = CONSUMPTION_COVER_WEEKS,
+) -> pd.DataFrame:
+    """
+    Computes the consumption of every entry in the scans and suggests a reorder quantity from the observed rate.
+
+    All scans are grouped at once, so a year of scans takes a few ten milliseconds.
+
+    Parameters
+    ----------
+    scans : The scans of the period (see ``scanLog.loadScans()``)
+    data : The data with the names and stored amounts of the entries
+    weeks : The length of the period in weeks, see ``observedWeeks()``
+    coverWeeks : How many weeks the stored amount plus the suggestion should last
+
+    Returns
+    -------
+    One row per entry with a consumption (``PART_COLUMNS``), the highest consumption first.
+    Deleted entries are left out. The suggestion is the amount missing to last ``coverWeeks`` weeks.
+    """
+    used = consumptionScans(scans)
+    grouped = (
+        used.assign(**{SCANS_COLUMN: (used[MODE_COLUMN] == "add").to_numpy(dtype=np.int64)})
+        .groupby(ID_COLUMN, sort=False)
+        .agg(**{SCANS_COLUMN: (SCANS_COLUMN, "sum"), USED_COLUMN: (QUANTITY_COLUMN, "sum")})
+    )
+    grouped = grouped[grouped[USED_COLUMN] > 0]
+
+    df = data.df
+    stored = pd.Series(storedAmounts(data), index=df[ID_COLUMN].to_numpy(dtype=np.int64))
+    stored = stored[~stored.index.duplicated()]
+    grouped = grouped[grouped.index.isin(stored.index)]
+    names = df.drop_duplicates(ID_COLUMN).set_index(ID_COLUMN)
+
+    ids = grouped.index.to_numpy(dtype=np.int64)
+    usedAmounts = grouped[USED_COLUMN].to_numpy(dtype=np.int64)
+    rates = usedAmounts / weeks
+    storedOfParts = stored.reindex(ids).to_numpy(dtype=np.int64)
+    suggestions = np.maximum(0, np.ceil(rates * coverWeeks).astype(np.int64) - storedOfParts)
+    part = pd.DataFrame(
+        {
+            ID_COLUMN: ids,
+            TYPE_COLUMN: names[TYPE_COLUMN].reindex(ids).astype(object).fillna("").astype(str).to_numpy()
+            if TYPE_COLUMN in names.columns
+            else "",
+            DESC_COLUMN: names[DESC_COLUMN].reindex(ids).astype(object).fillna("").astype(str).to_numpy()
+            if DESC_COLUMN in names.columns
+            else "",
+            SCANS_COLUMN: grouped[SCANS_COLUMN].to_numpy(dtype=np.int64),
+            USED_COLUMN: usedAmounts,
+            RATE_COLUMN: np.round(rates, 1),
+            STORED_COLUMN: storedOfParts,
+            LASTS_COLUMN: np.round(storedOfParts / rates, 1),
+            SUGGESTION_COLUMN: suggestions,
+        }
+    )
+    return part.sort_values(USED_COLUMN, ascending=False, kind="stable").reset_index(drop=True)
+
+
+def consumptionPerWeek(scans: pd.DataFrame) -> pd.DataFrame:
+    """
+    Computes the scans, scanned entries and consumption of every week (from Monday, UTC), the newest week first.
+    """
+    used = consumptionScans(scans)
+    days = used[TIME_COLUMN].to_numpy(dtype=np.int64) // 86400
+    # 1970-01-01 was a Thursday
+    mondays = days - (days + 3) % 7
+    grouped = (
+        used.assign(monday=mondays, added=(used[MODE_COLUMN] == "add").to_numpy(dtype=np.int64))
+        .groupby("monday")
+        .agg(
+            **{
+                SCANS_COLUMN: ("added", "sum"),
+                PARTS_COLUMN: (ID_COLUMN, "nunique"),
+                USED_COLUMN: (QUANTITY_COLUMN, "sum"),
+            }
+        )
+        .sort_index(ascending=False)
+    )
+    weeks = pd.to_datetime(grouped.index.to_numpy(dtype=np.int64), unit="D").strftime("%d.%m.%Y")
+    return pd.DataFrame(
+        {
+            WEEK_COLUMN: weeks,
+            SCANS_COLUMN: grouped[SCANS_COLUMN].to_numpy(),
+            PARTS_COLUMN: grouped[PARTS_COLUMN].to_numpy(),
+            USED_COLUMN: grouped[USED_COLUMN].to_numpy(),
+        }
+    )
+
+
+def consumptionPerLocation(scans: pd.DataFrame, data: Data) -> pd.DataFrame:
+    """
+    Computes the consumption of the entries in every location, by the main location of the entries,
+    the highest consumption first.
+    """
+    used = consumptionScans(scans)
+    perPart = used.groupby(ID_COLUMN)[QUANTITY_COLUMN].sum()
+    df = data.df.drop_duplicates(ID_COLUMN)
+    locations = (
+        df[LOCATION_COLUMN].astype(str).replace("nan", "")
+        if LOCATION_COLUMN in df.columns
+        else pd.Series("", index=df.index)
+    )
+    locationOf = pd.Series(locations.to_numpy(), index=df[ID_COLUMN].to_numpy(dtype=np.int64))
+    perPart = perPart[(perPart > 0) & perPart.index.isin(locationOf.index)]
+    grouped = (
+        pd.DataFrame(
+            {
+                LOCATION_COLUMN: locationOf.reindex(perPart.index).to_numpy(),
+                USED_COLUMN: perPart.to_numpy(),
+            }
+        )
+        .groupby(LOCATION_COLUMN)
+        .agg(**{PARTS_COLUMN: (USED_COLUMN, "size"), USED_COLUMN: (USED_COLUMN, "sum")})
+    )
+    _, paths = treeOrder(data.locations)
+    paths[""] = NO_LOCATION
+    result = pd.DataFrame(
+        {
+            PATH_COLUMN: [paths.get(location, UNKNOWN_LOCATION) for location in grouped.index],
+            PARTS_COLUMN: grouped[PARTS_COLUMN].to_numpy(),
+            USED_COLUMN: grouped[USED_COLUMN].to_numpy(),
+        }
+    )
+    # Deleted locations are combined in one row
+    result = result.groupby(PATH_COLUMN, as_index=False, sort=False).sum()
+    return result.sort_values(USED_COLUMN, ascending=False, kind="stable").reset_index(drop=True)
+
+
+def analyzeConsumption(
+    data: Data, days: int, directory: str = SCAN_LOG_DIR, now: int | None = None
+) -> dict[str, pd.DataFrame]:
+    """
+    Loads the scans of the last days from the scan log and computes the consumption per entry, week and location.
+
+    Returns
+    -------
+    The tables by their title, see ``consumptionPerPart()``, ``consumptionPerWeek()`` and ``consumptionPerLocation()``.
+    """
+    if now is None:
+        now = int(time.time())
+    since = now - days * 86400
+    scans = loadScans(directory, since)
+    return {
+        "Je Teil": consumptionPerPart(scans, data, observedWeeks(scans, since, now)),
+        "Je Woche": consumptionPerWeek(scans),
+        "Je Lagerort": consumptionPerLocation(scans, data),
+    }
+
+
+def writeConsumption(tables: dict[str, pd.DataFrame], path: str):
+    """
+    Writes the tables to an excel file (.xlsx) with one sheet per table,
+    or the consumption per entry to a CSV file (.csv), depending on the extension.
+    Throws a ValueError for other extensions.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".xlsx":
+        with pd.ExcelWriter(path) as writer:
+            for title, table in tables.items():
+                table.to_excel(writer, sheet_name=title, index=False)  # type: ignore
+    elif extension == ".csv":
+        # Semicolons and a BOM, so Excel opens it correctly with German settings
+        next(iter(tables.values())).to_csv(path, index=False, sep=";", encoding="utf-8-sig")
+    else:
+        raise ValueError(f"Unbekanntes Dateiformat: {extension}")
+
+
+def fillTable(table: QTableWidget, values: pd.DataFrame):
+    table.clear()
+    table.setRowCount(len(values))
+    table.setColumnCount(len(values.columns))
+    table.setHorizontalHeaderLabels([str(column) for column in values.columns])
+    numeric = [pd.api.types.is_numeric_dtype(values[column]) for column in values.columns]
+    for row, rowValues in enumerate(values.astype(str).values.tolist()):
+        for column, value in enumerate(rowValues):
+            item = QTableWidgetItem(value if value != "inf" else "∞")
+            if numeric[column]:
+                item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+            table.setItem(row, column, item)
+
+
+def addSuggestions(data: Data, part: pd.DataFrame) -> int:
+    """
+    Puts the entries with a reorder suggestion on the list of scanned entries, with the suggestion as their count.
+    Entries already on the list keep a higher count. Returns the number of entries.
+    """
+    suggested = part[part[SUGGESTION_COLUMN] > 0]
+    for id, count in zip(suggested[ID_COLUMN].tolist(), suggested[SUGGESTION_COLUMN].tolist()):
+        if id not in data.scannedIDs:
+            data.addId(id)
+        data.setScanCount(id, max(count, data.scanCount(id)))
+    return len(suggested)
+
+
+def showConsumption(state: State):
+    """
+    Shows the consumption per entry, week and location from the scan log in a new window,
+    with reorder suggestions and an export to excel or CSV.
+    """
+    window = QWidget(mainWindow(), Qt.WindowType.Window)
+    window.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
+    window.setWindowTitle("Verbrauch")
+    window.resize(900, 600)
+    layout = QVBoxLayout()
+    window.setLayout(layout)
+
+    periodLayout = QHBoxLayout()
+    periodLayout.addWidget(QLabel("Zeitraum (Tage):"))
+    periodInput = QSpinBox()
+    periodInput.setRange(7, 3650)
+    periodInput.setValue(365)
+    periodLayout.addWidget(periodInput)
+    periodLayout.addStretch(1)
+    summary = QLabel()
+    periodLayout.addWidget(summary)
+    layout.addLayout(periodLayout)
+
+    tabs = QTabWidget()
+    layout.addWidget(tabs)
+    tables: dict[str, QTableWidget] = {}
+
+    buttonLayout = QHBoxLayout()
+    buttonLayout.addStretch(1)
+    suggestButton = QPushButton("Vorschläge auf die Liste")
+    suggestButton.setToolTip(
+        f"Setzt die Einträge mit der Menge auf die Liste, die für {CONSUMPTION_COVER_WEEKS} Wochen fehlt"
+    )
+    buttonLayout.addWidget(suggestButton)
+    refreshButton = QPushButton("Aktualisieren")
+    buttonLayout.addWidget(refreshButton)
+    exportButton = QPushButton("Exportieren")
+    buttonLayout.addWidget(exportButton)
+    layout.addLayout(buttonLayout)
+
+    results: dict[str, pd.DataFrame] = {}
+
+    def refresh():
+        try:
+            results.update(analyzeConsumption(state.data, periodInput.value()))
+        except (OSError, ValueError) as e:
+            QMessageBox.warning(window, "Fehler", f"Scan-Protokoll konnte nicht gelesen werden: {e}")
+            return
+        for title, values in results.items():
+            if title not in tables:
+                table = QTableWidget()
+                table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+                table.verticalHeader().setVisible(False)
+                tabs.addTab(table, title)
+                tables[title] = table
+            fillTable(tables[title], values)
+            tables[title].horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        part = next(iter(results.values()))
+        summary.setText(
+            f"{len(part)} Teile verbraucht, {int((part[SUGGESTION_COLUMN] > 0).sum())} Vorschläge"
+        )
+
+    def suggest():
+        count = addSuggestions(state.data, next(iter(results.values())))
+        QMessageBox.information(window, "Erfolg", f"{count} Einträge auf die Liste gesetzt")
+
+    def export():
+        path, _ = QFileDialog.getSaveFileName(
+            window, "Verbrauch exportieren", "Verbrauch.xlsx", "Excel (*.xlsx);;CSV (*.csv)"
+        )
+        if path == "":
+            return
+        try:
+            writeConsumption(results, path)
+        except (ValueError, OSError) as e:
+            QMessageBox.warning(window, "Fehler", f"Verbrauch konnte nicht gespeichert werden: {e}")
+            return
+        QMessageBox.information(window, "Erfolg", f"Verbrauch gespeichert unter {path}")
+
+    refreshButton.clicked.connect(refresh)
+    periodInput.editingFinished.connect(refresh)
+    suggestButton.clicked.connect(suggest)
+    exportButton.clicked.connect(export)
+    refresh()
+    window.show()
+
+
+def main(args: list[str]):
+    parser = argparse.ArgumentParser(
+        prog="consumption.py",
+        description="Zeigt den Verbrauch je Teil, Woche und Lagerort aus dem Scan-Protokoll mit Bestellvorschlägen.",
+    )
+    parser.add_argument("database", help="Pfad zur Excel-Datei")
+    parser.add_argument("output", nargs="?", help="Ausgabedatei (.xlsx oder .csv), sonst Ausgabe in der Konsole")
+    parser.add_argument("--days", type=int, default=365, help="Zeitraum in Tagen (Standard: 365)")
+    parser.add_argument("--log", default=SCAN_LOG_DIR, help=f"Ordner des Scan-Protokolls (Standard: {SCAN_LOG_DIR})")
+    options = parser.parse_args(args)
+
+    try:
+        # Only the names, locations and amounts are needed
+        data = db.loadData(options.database, columns=[DESC_COLUMN])
+        tables = analyzeConsumption(data, options.days, options.log)
+    except ValueError as e:
+        print(f"[Error] {e.args[0]}")
+        return 1
+    if options.output is None:
+        for title, table in tables.items():
+            print(f"## {title}")
+            print(table.to_string(index=False))
+        return 0
+    try:
+        writeConsumption(tables, options.output)
+    except ValueError as e:
+        print(f"[Error] {e.args[0]}")
+        return 1
+    print(f"Verbrauch gespeichert unter {options.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,27 +1,279 @@
-from dataclasses import dataclass
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
 import json
 import os
+import sys
+import threading
+import time
+from typing import Any, Iterator
+import numpy as np
 import pandas as pd
 
 from consts import *
-from location import getChildren, parseLocations, serializeLocations
-from state import DBInfo, Data, Location, State
+from events import (
+    DataReloaded,
+    LocationChanged,
+    RowDeleted,
+    RowEdited,
+    RowsAdded,
+    RowsEdited,
+    SaveConflicts,
+    ScanAdded,
+    ScansCleared,
+)
+from location import (
+    getLocation,
+    getLocationString,
+    getSubtreeIds,
+    keepTopParents,
+    parseLocations,
+    serializeLocations,
+)
+import remoteBackend
+from state import (
+    DBInfo,
+    Data,
+    DataDiff,
+    Location,
+    PendingChanges,
+    RowConflict,
+    State,
+    StockIndex,
+)
+
+# The types of the columns, the same for the excel file and the sync server
+DATA_DTYPES = {ID_COLUMN: int, CODE_COLUMN: str, "Bestellnummer": str, STORED_AMOUNT_COLUMN: int}
+# Columns with amounts, empty values are 0. Otherwise the excel file can not be read again.
+NUMBER_COLUMNS = [STORED_AMOUNT_COLUMN, MIN_AMOUNT_COLUMN]
+# Always loaded, also when only some columns are loaded (see ``newDataFromExel()``)
+KEY_COLUMNS = [ID_COLUMN, CODE_COLUMN, TYPE_COLUMN, LOCATION_COLUMN, STORED_AMOUNT_COLUMN, MIN_AMOUNT_COLUMN]
+# Shown after the columns of the database in the table
+BUTTON_HEADERS = [EDIT_COLUMN, DELETE_COLUMN, COUNT_COLUMN]
+# Text columns with at most this share of distinct values are stored as categories (see ``compactColumns()``)
+CATEGORY_SHARE = 0.5
+
+# The lock files this process holds and how often, so a write can call another one (see ``writeLock()``)
+heldLocks: dict[str, int] = {}
+heldLocksGuard = threading.RLock()
+
+
+@contextmanager
+def writeLock(path: str) -> Iterator[None]:
+    """
+    Lets only one station at a time reload, change and write the excel file, so no station overwrites
+    a write of another one that happened after its reload.
+    The lock is a file next to the excel file (``[file].lock``), created exclusively, so it also works on network drives.
+    A lock older than ``consts.FILE_LOCK_STALE_S`` was left behind by a crashed station and is removed.
+    Can be nested, only the outermost use creates and removes the lock file.
+    Does nothing for a sync server, it is the only one writing the file.
+
+    Throws a ValueError if another station holds the lock longer than ``consts.FILE_LOCK_TIMEOUT_S``.
+    """
+    if remoteBackend.isRemote(path):
+        yield
+        return
+    lockPath = f"{os.path.abspath(path)}.lock"
+    with heldLocksGuard:
+        if lockPath not in heldLocks:
+            __acquireLockFile(lockPath)
+        heldLocks[lockPath] = heldLocks.get(lockPath, 0) + 1
+        try:
+            yield
+        finally:
+            heldLocks[lockPath] -= 1
+            if heldLocks[lockPath] == 0:
+                del heldLocks[lockPath]
+                try:
+                    os.remove(lockPath)
+                except OSError:
+                    pass
+
+
+def __acquireLockFile(lockPath: str):
+    deadline = time.monotonic() + FILE_LOCK_TIMEOUT_S
+    while True:
+        try:
+            handle = os.open(lockPath, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lockPath) > FILE_LOCK_STALE_S:
+                    os.remove(lockPath)
+                    continue
+            except OSError:
+                # Removed by its owner in the meantime
+                continue
+            if time.monotonic() > deadline:
+                raise ValueError(
+                    "Die Datei wird gerade von einem anderen Arbeitsplatz gespeichert, bitte später erneut versuchen."
+                )
+            # A lock file can not be waited on, the owner only holds it for a reload and a write
+            time.sleep(0.02)
+            continue
+        with os.fdopen(handle, "w") as file:
+            file.write(f"{os.getpid()}\n")
+        return
 
 
 def saveToExel(data: Data, filePath: str):
     """
     Saves the ``panda.Dataframe`` in the data to an excel file to the given path.
+    This also writes all pending changes, so they are cleared afterwards.
 
     Parameters
     ----------
     data : The data to be saved
     filePath : The path to the file
     """
-    with pd.ExcelWriter(filePath, engine="openpyxl") as writer:
-        # to_excel is not properly typed
-        serializeDBInfo(data.info).to_excel(writer, sheet_name=INFO_SHEET, index=False)  # type: ignore
-        data.df.to_excel(writer, sheet_name=DATA_SHEET, index=False)  # type: ignore
-        serializeLocations(data.locations).to_excel(writer, sheet_name=LOCATION_SHEET, index=False)  # type: ignore
+    if data.projected:
+        raise ValueError("Die Daten wurden nur teilweise geladen und können nicht gespeichert werden.")
+    # Written to a temporary file first and then swapped in,
+    # so others reading the file at the same time never see a half written file
+    root, extension = os.path.splitext(filePath)
+    tempPath = f"{root}.{os.getpid()}.tmp{extension}"
+    try:
+        with pd.ExcelWriter(tempPath, engine="openpyxl") as writer:
+            # to_excel is not properly typed
+            serializeDBInfo(data.info).to_excel(writer, sheet_name=INFO_SHEET, index=False)  # type: ignore
+            data.df.to_excel(writer, sheet_name=DATA_SHEET, index=False)  # type: ignore
+            serializeLocations(data.locations).to_excel(writer, sheet_name=LOCATION_SHEET, index=False)  # type: ignore
+            # Further locations of deleted entries are dropped
+            stock = data.stock[data.stock[ID_COLUMN].isin(data.df[ID_COLUMN])]
+            stock.to_excel(writer, sheet_name=STOCK_SHEET, index=False)  # type: ignore
+        os.replace(tempPath, filePath)
+    finally:
+        if os.path.exists(tempPath):
+            os.remove(tempPath)
+    # Everything in memory, including the pending changes, is now in the file
+    data.pending.clear()
+    data.fileStamp = fileStamp(filePath)
+
+
+def fileStamp(filePath: str) -> tuple[str, float, int] | None:
+    """
+    Returns the path, modification time and size of the file, None if it does not exist.
+    """
+    try:
+        stat = os.stat(filePath)
+    except OSError:
+        return None
+    return (os.path.abspath(filePath), stat.st_mtime, stat.st_size)
+
+
+def save(data: Data, path: str, locations: bool = False, stock: bool = False):
+    """
+    Writes the data to the database, either the excel file or the sync server (see ``remoteBackend.isRemote()``).
+    The whole excel file is rewritten, a sync server only gets the pending changes.
+    All pending changes are cleared afterwards.
+
+    Parameters
+    ----------
+    data : The data to be saved
+    path : The path of the excel file or the address of the sync server
+    locations : Whether the locations changed, they are always written to an excel file
+    stock : Whether the further locations of entries changed (``Data.stock``), they are always written to an excel file
+    """
+    if not remoteBackend.isRemote(path):
+        saveToExel(data, path)
+        return
+    if data.projected:
+        raise ValueError("Die Daten wurden nur teilweise geladen und können nicht gespeichert werden.")
+    backend = remoteBackend.connect(path)
+    if data.pending.dirty():
+        rows = list(data.pending.rows.values())
+        base = {
+            id: toJsonValues([values])[0] if values is not None else None
+            for id, values in data.pending.base.items()
+        }
+        conflicts = backend.pushRows(
+            data.dataHeaders, toJsonValues(rows), list(data.pending.deleted), base
+        )
+        if conflicts:
+            data.events.emit(
+                SaveConflicts([RowConflict(**conflict) for conflict in conflicts])
+            )
+    # The server merges the locations with the changes of other users, based on the locations before the change
+    if locations:
+        base = data.pending.locationsBase
+        backend.pushLocations(
+            serializeLocations(data.locations).astype(object).to_dict("records"),  # type: ignore
+            serializeLocations(base).astype(object).to_dict("records") if base is not None else None,  # type: ignore
+        )
+    if stock:
+        base = data.pending.stockBase
+        backend.pushStock(
+            toJsonValues(data.stock[STOCK_COLUMNS].values.tolist()),
+            toJsonValues(base[STOCK_COLUMNS].values.tolist()) if base is not None else None,
+        )
+    data.pending.clear()
+
+
+def loadData(path: str, columns: list[str] | None = None) -> Data:
+    """
+    Creates a new Data struct from the excel file or the sync server (see ``remoteBackend.isRemote()``).
+    Throws a ValueError if the data could not be loaded or if the columns are invalid.
+    ``columns`` only loads these columns of an excel file, see ``newDataFromExel()``.
+    The sync server always sends all columns.
+    """
+    if remoteBackend.isRemote(path):
+        snapshot = remoteBackend.connect(path).fetchSnapshot(onlyIfChanged=False)
+        assert snapshot is not None
+        return newDataFromSnapshot(snapshot)
+    return newDataFromExel(path, columns)
+
+
+def toJsonValues(rows: list[list]) -> list[list]:
+    """
+    Converts the values of rows to types that can be sent as JSON, empty values (NaN) become None.
+    """
+    return [
+        [
+            None if pd.isna(value) else value.item() if hasattr(value, "item") else value
+            for value in row
+        ]
+        for row in rows
+    ]
+
+
+def snapshotOfData(data: Data, version: int) -> dict:
+    """
+    Serializes all data for the sync server, the inverse of ``db.newDataFromSnapshot()``.
+    """
+    return {
+        "version": version,
+        "info": {INFO_VERSION_KEY: data.info.version},
+        "headers": data.dataHeaders,
+        "rows": toJsonValues(data.df[data.dataHeaders].values.tolist()),
+        "locations": serializeLocations(data.locations).astype(object).to_dict("records"),  # type: ignore
+        "stock": toJsonValues(data.stock[STOCK_COLUMNS].values.tolist()),
+    }
+
+
+def newDataFromSnapshot(snapshot: dict) -> Data:
+    """
+    Creates a new Data struct from the data sent by a sync server (see ``db.snapshotOfData()``).
+    Throws a ValueError if the columns are invalid.
+    """
+    df = pd.DataFrame(snapshot["rows"], columns=snapshot["headers"])
+    # Same types as data read from excel, empty values stay NaN
+    df = df.fillna(value=float("nan"))
+    for column, dtype in DATA_DTYPES.items():
+        if column not in df.columns:
+            continue
+        if dtype == str:
+            df[column] = df[column].where(df[column].isna(), df[column].astype(str))
+        else:
+            df[column] = df[column].astype(dtype)
+    locationSheet = pd.DataFrame(
+        snapshot["locations"],
+        columns=[LOCATION_ID_COLUMN, LOCATION_NAME_COLUMN, LOCATION_PARENT_COLUMN],
+    ).fillna("")
+    stock = pd.DataFrame(snapshot.get("stock", []), columns=STOCK_COLUMNS)
+    return newDataFromContents(
+        df,
+        parseLocations(locationSheet),
+        DBInfo(snapshot["info"][INFO_VERSION_KEY]),
+        stock,
+    )
 
 
 def serializeDBInfo(info: DBInfo) -> pd.DataFrame:
@@ -36,12 +288,17 @@ def serializeDBInfo(info: DBInfo) -> pd.DataFrame:
     )
 
 
-def reloadFromFile(data: Data, filePath: str):
+def reloadFromFile(data: Data, filePath: str) -> DataDiff:
     """
     Reloads the data from the given file path.
 
-    Updates references inside the data struct using the ``db.changeDataTo()`` method.
-    This means that the reference to the data struct is still valide, enabling seamless reloading of the data.
+    Only the rows and locations that changed in the file are updated (see ``db.diffData()``).
+    This means that the reference to the data struct and its locations are still valide, enabling seamless reloading of the data.
+    Pending changes are merged with the contents of the file.
+    The file is not read at all if it was not modified since it was last read or written (``Data.fileStamp``),
+    unless only some columns were loaded (``Data.projected``), then all columns are loaded.
+    Emits a ``events.DataReloaded`` event if anything changed and a ``events.SaveConflicts`` event
+    if pending changes conflict with changes of other users.
 
     Copys like the ``db.Row`` abstraction do not update.
 
@@ -51,9 +308,567 @@ def reloadFromFile(data: Data, filePath: str):
     ----------
     data : The data to be updated
     filePath : The path of the file
+
+    Returns
+    -------
+    The changes that were applied to the data
+    """
+    if remoteBackend.isRemote(filePath):
+        snapshot = remoteBackend.connect(filePath).fetchSnapshot()
+        if snapshot is None:
+            # Nothing changed on the server since the last reload
+            return DataDiff()
+        newData = newDataFromSnapshot(snapshot)
+    else:
+        if (
+            not data.projected
+            and data.fileStamp is not None
+            and data.fileStamp == fileStamp(filePath)
+        ):
+            # Nobody changed the file since it was last read or written
+            return DataDiff()
+        newData = newDataFromExel(filePath)
+    return applyLoadedData(data, newData)
+
+
+def applyLoadedData(data: Data, newData: Data) -> DataDiff:
     """
-    newData = newDataFromExel(filePath)
-    __changeDataTo(data, newData, False)
+    Updates the data to the freshly loaded data, like ``db.reloadFromFile()`` after reading the file.
+    Used to load the file in another thread and apply it in the main thread (see the ``lazyLoad`` module).
+    If only some columns were loaded before (``Data.projected``), the pending changes are extended to all columns.
+
+    Parameters
+    ----------
+    data : The data to be updated
+    newData : The data loaded from the database, with all columns
+
+    Returns
+    -------
+    The changes that were applied to the data
+    """
+    before = None
+    if data.projected:
+        # The rows of the file before the merge, the base of the pending changes with all columns
+        ids = set(data.pending.rows.keys()) | set(data.pending.base.keys())
+        before = newData.df[newData.df[ID_COLUMN].isin(ids)].drop_duplicates(ID_COLUMN).set_index(ID_COLUMN, drop=False)
+    conflicts = __applyPending(newData, data.pending, data.dataHeaders)
+    if before is not None:
+        __extendPending(data.pending, newData, before)
+        data.projected = False
+    diff = diffData(data, newData)
+    if diff.structural:
+        __changeDataTo(data, newData, False)
+    else:
+        __applyDiff(data, newData, diff)
+    # IDs and codes could have been used by other users
+    data.allocator.reserve([newData.allocator.maxId], newData.allocator.usedCodes)
+    data.fileStamp = newData.fileStamp
+    if not diff.empty():
+        data.events.emit(DataReloaded(diff))
+    if conflicts:
+        data.events.emit(SaveConflicts(conflicts))
+    return diff
+
+
+def __applyPending(
+    data: Data, pending: PendingChanges, headers: list[str]
+) -> list[RowConflict]:
+    """
+    Merges the pending changes into the dataframe of the data.
+    Used after reloading, so that changes that are not yet written are not lost.
+
+    Rows that were not changed by others since they were loaded (``PendingChanges.base``) are simply replaced.
+    For rows that were also changed by others, only the columns changed by this user are replaced (three-way merge).
+    Columns that both changed to different values are conflicts, the value of this user is kept.
+    New rows whose id was taken by another user in the meantime get a new id.
+    Afterwards the pending changes are based on the new data, so every conflict is only reported once.
+
+    Parameters
+    ----------
+    data : The data the changes are merged into, e.g. the freshly loaded data
+    pending : The pending changes, rebased onto the data
+    headers : The headers the values of the pending rows belong to
+
+    Returns
+    -------
+    The rows that were changed by this and another user
+    """
+    conflicts: list[RowConflict] = []
+    ids = set(pending.rows.keys()) | pending.deleted
+    theirRows = (
+        data.df[data.df[ID_COLUMN].isin(ids)]
+        .drop_duplicates(ID_COLUMN)
+        .set_index(ID_COLUMN, drop=False)
+        .reindex(columns=headers)
+    )
+
+    def unchanged(values: list, base: list) -> bool:
+        return [__comparable(value) for value in values] == [
+            __comparable(value) for value in base
+        ]
+
+    if pending.deleted:
+        for id in pending.deleted:
+            base = pending.base.get(id)
+            if id in theirRows.index and base is not None:
+                if not unchanged(theirRows.loc[id].tolist(), base):
+                    conflicts.append(RowConflict(id, deletedHere=True))
+        data.df = data.df.drop(
+            index=data.df.index[data.df[ID_COLUMN].isin(pending.deleted)]
+        )
+
+    for id, values in list(pending.rows.items()):
+        base = pending.base.get(id)
+        if base is None:
+            # New row, another user could have created an entry with the same id at the same time
+            if id in theirRows.index and __comparable(
+                theirRows.loc[id, CODE_COLUMN]
+            ) != __comparable(values[headerIndex(headers, CODE_COLUMN)]):
+                newId = data.allocator.nextIds(1)[0]
+                values[headerIndex(headers, ID_COLUMN)] = newId
+                del pending.rows[id]
+                pending.rows[newId] = values
+                pending.base.pop(id, None)
+                pending.base[newId] = None
+            continue
+        if id not in theirRows.index:
+            conflicts.append(RowConflict(id, deletedByOthers=True))
+            pending.base[id] = None
+            continue
+        theirs = theirRows.loc[id].tolist()
+        if unchanged(theirs, base):
+            continue
+        merged: list[int | str] = []
+        conflict = RowConflict(id)
+        for header, mine, old, their in zip(headers, values, base, theirs):
+            if __comparable(mine) == __comparable(old):
+                merged.append(their)
+            else:
+                merged.append(mine)
+                if __comparable(their) not in (__comparable(old), __comparable(mine)):
+                    conflict.columns.append(header)
+        if conflict.columns:
+            conflicts.append(conflict)
+        pending.rows[id] = merged
+        pending.base[id] = theirs
+
+    if pending.rows:
+        rows = pd.DataFrame(list(pending.rows.values()), columns=headers)
+        if headers != data.dataHeaders:
+            # Columns the pending rows do not have keep their values, new rows get empty values
+            existing = data.df.drop_duplicates(ID_COLUMN).set_index(ID_COLUMN)
+            rows = rows.reindex(columns=data.dataHeaders)
+            for column in data.dataHeaders:
+                if column not in headers:
+                    rows[column] = rows[ID_COLUMN].map(existing[column]).astype(object).fillna("")
+        data.df = __upsertRows(data.df, fillNumberColumns(rows), data.dataHeaders)
+    return conflicts
+
+
+def __extendPending(pending: PendingChanges, data: Data, before: pd.DataFrame):
+    """
+    Replaces the values of the pending rows and their base with the values of all columns of the data,
+    after the pending rows of projected data (``Data.projected``) were merged into it.
+
+    Parameters
+    ----------
+    pending : The pending changes with the values of the loaded columns
+    data : The data with all columns, the pending changes are already merged into it
+    before : The rows of the data before the merge by id
+    """
+    rows = data.df[data.df[ID_COLUMN].isin(pending.rows.keys())].drop_duplicates(ID_COLUMN)
+    for values in rows.values.tolist():
+        pending.rows[int(values[headerIndex(data.dataHeaders, ID_COLUMN)])] = values
+    for id, base in pending.base.items():
+        if base is not None:
+            pending.base[id] = before.loc[id].tolist() if id in before.index else None
+
+
+def __comparable(value: object) -> str:
+    """
+    Values are compared as strings like ``Row.getValue()`` returns them, so empty values are equal.
+    """
+    if value is None:
+        return ""
+    text = str(value)
+    return "" if text == "nan" else text
+
+
+def applyChanges(
+    data: Data,
+    rows: list[list],
+    deleted: list[int],
+    headers: list[str],
+    base: dict[int, list | None] = {},
+) -> list[RowConflict]:
+    """
+    Merges changed and new rows and deleted ids sent by a client into the data, used by the sync server.
+    Returns the conflicts with changes of other clients, see ``db.__applyPending()``.
+
+    Parameters
+    ----------
+    data : The data the changes are applied to
+    rows : The values of the changed and new rows
+    deleted : The ids of the deleted rows
+    headers : The headers the values of the rows belong to
+    base : The values of the rows when the client loaded them
+    """
+    pending = PendingChanges(
+        rows={int(values[headerIndex(headers, ID_COLUMN)]): values for values in rows},
+        deleted=set(deleted),
+        base=dict(base),
+    )
+    conflicts = __applyPending(data, pending, headers)
+    data.allocator.reserve(
+        list(pending.rows.keys()),
+        [str(values[headerIndex(headers, CODE_COLUMN)]) for values in rows],
+    )
+    return conflicts
+
+
+def __upsertRows(
+    df: pd.DataFrame, rows: pd.DataFrame, headers: list[str]
+) -> pd.DataFrame:
+    """
+    Replaces the rows of the dataframe that have the same id as one of the given rows and appends the others.
+    Vectorized, so many rows cost about as much as one.
+
+    Parameters
+    ----------
+    df : The dataframe, rows are replaced in place
+    rows : The new rows with unique ids
+    headers : The columns of both dataframes
+
+    Returns
+    -------
+    The dataframe with the rows, a new one if rows were appended
+    """
+    if rows.empty:
+        return df
+    rows = rows.set_index(ID_COLUMN, drop=False)
+    mask = df[ID_COLUMN].isin(rows.index)
+    if mask.any():
+        ids = df.loc[mask, ID_COLUMN].values
+        for column in headers:
+            setColumn(df, mask, column, rows.loc[ids, column].values)
+    newRows = rows[~rows.index.isin(df[ID_COLUMN])]
+    if not newRows.empty:
+        df = appendRows(df, newRows.reset_index(drop=True))
+    return df
+
+
+def setColumn(df: pd.DataFrame, mask: "pd.Series[bool]", column: str, values: Any):
+    """
+    Sets the values of a column in the masked rows, in place.
+    Compact columns (see ``compactColumns()``) stay compact: new texts become new categories,
+    whole numbers keep the smaller type if they fit in it. Otherwise the column is changed to a type that fits all values.
+
+    Parameters
+    ----------
+    df : The dataframe
+    mask : The rows to set
+    column : The column to set
+    values : One value for all rows or one value per row
+    """
+    dtype = df[column].dtype
+    # A plain array, values from another dataframe can be categories that differ from the ones of the column
+    single = not np.ndim(values)
+    array = np.asarray([values] if single else values)
+    if isinstance(dtype, pd.CategoricalDtype):
+        array = array.astype(object)
+        new = pd.Index(pd.unique(array[pd.notna(array)])).difference(dtype.categories)
+        if len(new):
+            df[column] = df[column].cat.add_categories(new)
+    elif dtype != array.dtype and dtype != object:
+        if pd.api.types.is_integer_dtype(dtype) and pd.api.types.is_integer_dtype(array.dtype):
+            limits = np.iinfo(dtype)
+            if len(array) and not (limits.min <= array.min() and array.max() <= limits.max):
+                df[column] = df[column].astype(np.int64)
+            array = array.astype(df[column].dtype)
+        else:
+            df[column] = df[column].astype(object)
+    df.loc[mask, column] = array[0] if single else array
+
+
+def appendRows(df: pd.DataFrame, rows: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns the dataframe with the rows appended. Compact columns stay compact (see ``compactColumns()``):
+    the texts of the rows are added to the categories, whole numbers keep the smaller type if they fit in it.
+    """
+    rows = rows.copy()
+    for column in df.columns:
+        if column not in rows.columns:
+            continue
+        dtype = df[column].dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            values = rows[column].astype(object)
+            new = pd.Index(pd.unique(values[values.notna()])).difference(dtype.categories)
+            if len(new):
+                df = df.assign(**{column: df[column].cat.add_categories(new)})
+            rows[column] = pd.Categorical(values, categories=df[column].cat.categories)
+        elif (
+            pd.api.types.is_integer_dtype(dtype)
+            and pd.api.types.is_integer_dtype(rows[column].dtype)
+            and rows[column].between(np.iinfo(dtype).min, np.iinfo(dtype).max).all()
+        ):
+            rows[column] = rows[column].astype(dtype)
+    return pd.concat([df, rows], ignore_index=True)
+
+
+def rowHashes(data: Data) -> "pd.Series[int]":
+    """
+    Returns a content hash for every row of the dataframe, indexed by the id of the row.
+    Values are compared as strings like ``Row.getValue()`` does, so "nan" and "" are equal.
+    """
+    strings = data.df[data.dataHeaders].astype(str).replace("nan", "")
+    return pd.Series(
+        pd.util.hash_pandas_object(strings, index=False).values,  # type: ignore
+        index=data.df[ID_COLUMN].values,
+    )
+
+
+def diffData(data: Data, to: Data) -> DataDiff:
+    """
+    Compares the rows (by their content hash), the locations and the further locations of entries of two data structs.
+
+    Parameters
+    ----------
+    data : The current data
+    to : The new data
+    """
+    diff = DataDiff()
+    oldIDs = pd.Index(data.df[ID_COLUMN])
+    newIDs = pd.Index(to.df[ID_COLUMN])
+    diff.addedIDs = set(newIDs.difference(oldIDs).tolist())
+    diff.removedIDs = set(oldIDs.difference(newIDs).tolist())
+    if (
+        data.dataHeaders != to.dataHeaders
+        or not oldIDs.is_unique
+        or not newIDs.is_unique
+    ):
+        diff.structural = True
+        diff.changedIDs = set(oldIDs.intersection(newIDs).tolist())
+    else:
+        oldHashes = rowHashes(data)
+        newHashes = rowHashes(to)
+        common = oldHashes.index.intersection(newHashes.index)
+        changed = oldHashes.loc[common].values != newHashes.loc[common].values
+        diff.changedIDs = set(common[changed].tolist())
+
+    oldLocations = {location.id: location for location in data.locations}
+    newLocations = {location.id: location for location in to.locations}
+    diff.addedLocations = set(newLocations.keys() - oldLocations.keys())
+    diff.removedLocations = set(oldLocations.keys() - newLocations.keys())
+    diff.changedLocations = {
+        id
+        for id in oldLocations.keys() & newLocations.keys()
+        if (oldLocations[id].name, oldLocations[id].parent)
+        != (newLocations[id].name, newLocations[id].parent)
+    }
+    diff.stockChanged = not data.stock.equals(to.stock)
+    return diff
+
+
+def __applyDiff(data: Data, to: Data, diff: DataDiff):
+    """
+    Applies the changes in the diff from the new data to the data.
+    Unchanged rows and locations are kept as they are.
+
+    Parameters
+    ----------
+    data : The data struct to be updated
+    to : The data struct containing the new contents
+    diff : The changes between both, see ``db.diffData()``
+    """
+    df = data.df
+    if diff.removedIDs:
+        df = df.drop(index=df.index[df[ID_COLUMN].isin(diff.removedIDs)])
+    df = __upsertRows(
+        df,
+        to.df[to.df[ID_COLUMN].isin(diff.changedIDs | diff.addedIDs)],
+        data.dataHeaders,
+    )
+    data.df = df
+
+    newLocations = {location.id: location for location in to.locations}
+    for location in data.locations:
+        if location.id in diff.changedLocations:
+            location.name = newLocations[location.id].name
+            location.parent = newLocations[location.id].parent
+    data.locations = [
+        location
+        for location in data.locations
+        if location.id not in diff.removedLocations
+    ] + [location for location in to.locations if location.id in diff.addedLocations]
+    if diff.stockChanged:
+        data.stock = to.stock
+    if diff.rowsChanged() or diff.stockChanged:
+        data.stockIndex = None
+    data.info = to.info
+
+
+def updateDfRow(data: Data, values: list[int | str]):
+    """
+    Replaces the row with the same id as the values in the dataframe or appends it if it is a new row.
+    Only changes the data in memory, use ``db.Row.write()`` to also write it to the database.
+    """
+    id = int(values[headerIndex(data.dataHeaders, ID_COLUMN)])
+    # Amounts are stored as text by ``Row.setValue()``, numbers keep the columns numeric
+    values = list(values)
+    for column in NUMBER_COLUMNS:
+        if column in data.dataHeaders:
+            index = headerIndex(data.dataHeaders, column)
+            amount = pd.to_numeric(values[index], errors="coerce")
+            values[index] = 0 if pd.isna(amount) else int(amount)
+    mask = data.df[ID_COLUMN] == id
+    if not mask.any():
+        data.df = appendRows(data.df, pd.DataFrame([values], columns=data.dataHeaders))
+    else:
+        for header, value in zip(data.dataHeaders, values):
+            setColumn(data.df, mask, header, value)
+    if data.stockIndex is not None:
+        data.stockIndex.setEntry(id, *__mainLocation(data.dataHeaders, values))
+
+
+def fillNumberColumns(rows: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns the rows with whole numbers in the number columns (``NUMBER_COLUMNS``), empty or invalid values become 0.
+    Otherwise the excel file can not be read again.
+    """
+    rows = rows.copy()
+    for column in NUMBER_COLUMNS:
+        if column in rows.columns:
+            rows[column] = pd.to_numeric(rows[column], errors="coerce").fillna(0).astype(int)
+    return rows
+
+
+def addRows(data: Data, rows: pd.DataFrame, path: str) -> list[int]:
+    """
+    Adds many new entries at once and writes them to the database with a single flush.
+    IDs are assigned by the ``Data.allocator``, empty codes are replaced by new codes.
+
+    Parameters
+    ----------
+    data : The data the entries are added to
+    rows : The new entries, with a column for each header in ``Data.dataHeaders``
+    path : The path of the database file
+
+    Returns
+    -------
+    The IDs of the new entries
+    """
+    rows = rows[data.dataHeaders].copy()
+    ids = data.allocator.nextIds(len(rows))
+    rows[ID_COLUMN] = ids
+    codes = rows[CODE_COLUMN].astype(str).replace("nan", "")
+    noCode = codes == ""
+    codes[noCode] = data.allocator.nextCodes(int(noCode.sum()))
+    rows[CODE_COLUMN] = codes
+    rows = fillNumberColumns(rows)
+    data.allocator.reserve([], codes)
+
+    data.df = __upsertRows(data.df, rows, data.dataHeaders)
+    data.stockIndex = None
+    for values in rows.values.tolist():
+        data.pending.rows[int(values[headerIndex(data.dataHeaders, ID_COLUMN)])] = values
+    data.pending.mutations += 1
+    data.events.emit(RowsAdded(set(ids)))
+    flush(data, path)
+    return ids
+
+
+def setStoredAmounts(data: Data, amounts: dict[int, int], path: str):
+    """
+    Sets the stored amount (``consts.STORED_AMOUNT_COLUMN``) of many entries at once
+    and writes them to the database with a single flush.
+    Like ``db.Row.write()``, the changes are merged with changes of other users.
+
+    Parameters
+    ----------
+    data : The data the entries are in
+    amounts : The new stored amount by entry id, ids that do not exist (anymore) are ignored
+    path : The path of the database file
+    """
+    mask = data.df[ID_COLUMN].isin(amounts.keys())
+    if not mask.any():
+        return
+    idIndex = headerIndex(data.dataHeaders, ID_COLUMN)
+    for values in data.df.loc[mask, data.dataHeaders].values.tolist():
+        data.pending.base.setdefault(int(values[idIndex]), values)
+    setColumn(data.df, mask, STORED_AMOUNT_COLUMN, data.df.loc[mask, ID_COLUMN].map(amounts).astype(int).values)
+    ids: set[int] = set()
+    for values in data.df.loc[mask, data.dataHeaders].values.tolist():
+        id = int(values[idIndex])
+        data.pending.rows[id] = values
+        data.pending.deleted.discard(id)
+        ids.add(id)
+    data.pending.mutations += 1
+    data.stockIndex = None
+    data.events.emit(RowsEdited(ids))
+    flush(data, path)
+
+
+def rememberLocations(data: Data):
+    """
+    Remembers the locations and the further locations of entries right after the reload before they are changed.
+    Needed by a sync server to merge the change with changes of other users,
+    see ``PendingChanges.locationsBase`` and ``PendingChanges.stockBase``.
+    """
+    # The locations are changed in place, e.g. when they are renamed
+    data.pending.locationsBase = [replace(location) for location in data.locations]
+    # Changes replace the dataframe, it is never changed in place
+    data.pending.stockBase = data.stock
+
+
+def rememberBase(data: Data, id: int):
+    """
+    Remembers the values the row had when it was loaded, before it is changed for the first time.
+    Needed to merge the change with changes of other users, see ``PendingChanges.base``.
+    """
+    if id in data.pending.base:
+        return
+    rows = data.df.loc[data.df[ID_COLUMN] == id, data.dataHeaders]
+    data.pending.base[id] = list(rows.values[0]) if not rows.empty else None
+
+
+def markDirty(data: Data, path: str):
+    """
+    Counts a mutation of the data.
+    Writes the pending changes to the database if there is no scheduler (``PendingChanges.onDirty``)
+    or if there are too many pending changes. Otherwise the scheduler is notified.
+
+    Parameters
+    ----------
+    data : The data that was mutated
+    path : The path of the file the changes belong to
+    """
+    data.pending.mutations += 1
+    onDirty = data.pending.onDirty
+    if onDirty is None or data.pending.mutations >= SAVE_MAX_MUTATIONS:
+        flush(data, path)
+    else:
+        onDirty()
+
+
+def flush(data: Data, path: str):
+    """
+    Writes all pending changes to the database.
+
+    The file is reloaded first, so changes of other users are kept.
+    No other station can write the file between the reload and the write (see ``db.writeLock()``).
+    For a sync server only the changes of other users are loaded, if there are any.
+    Does nothing if there are no pending changes.
+
+    Parameters
+    ----------
+    data : The data with the pending changes
+    path : The path of the file
+    """
+    if not data.pending.dirty():
+        return
+    with writeLock(path):
+        reloadFromFile(data, path)
+        save(data, path)
 
 
 def __changeDataTo(data: Data, to: Data, changeScannedIDs: bool = True):
@@ -72,6 +887,8 @@ def __changeDataTo(data: Data, to: Data, changeScannedIDs: bool = True):
         data.scannedIDs = to.scannedIDs
         data.anzahlScannedItems = to.anzahlScannedItems
     data.df = to.df
+    data.stock = to.stock
+    data.stockIndex = None
     data.tableHeaders = to.tableHeaders
     data.dataHeaders = to.dataHeaders
     for toLoc in to.locations:
@@ -89,6 +906,7 @@ class Row:
 
     When changes are made to the values or the scanCount,
     Call the ``Row.write(Data)`` method to write the changes to the data struct and database.
+    Writes to the database are coalesced, see ``db.markDirty()``.
     If you only changed values not saved in the database (e.g. scanCount), you can call ``Row.writeNoValues(Data)`` instead.
 
     Setting scanCount to 0 will remove the entry from the scanned IDs list upon writing.
@@ -141,21 +959,20 @@ class Row:
 
     def write(self, data: Data, path: str):
         """
-        Writes the values to the database and updates the scannedIDs and anzahlScannedItems dicts.
+        Writes the values to the data struct and updates the scannedIDs and anzahlScannedItems dicts.
+        The change is written to the database with the next flush (see ``db.markDirty()``).
 
         :param data: The data struct that holds the dataframe and the scannedIDs and anzahlScannedItems dicts
+        :param path: The path of the database file
         """
+        rememberBase(data, self.id())
+        updateDfRow(data, self.values)
+        data.allocator.reserve([self.id()], [self.code()])
         self.writeNoValues(data)
-        reloadFromFile(data, path)
-        dfRow: pd.DataFrame = data.df.loc[data.df[ID_COLUMN] == self.id()]
-        if dfRow.empty:
-            data.df = pd.concat(
-                [data.df, pd.DataFrame([self.values], columns=data.dataHeaders)],
-                ignore_index=True,
-            )
-        else:
-            data.df.loc[data.df[ID_COLUMN] == self.id()] = self.values
-        saveToExel(data, path)
+        data.events.emit(RowEdited(self.id()))
+        data.pending.deleted.discard(self.id())
+        data.pending.rows[self.id()] = list(self.values)
+        markDirty(data, path)
 
     def writeNoValues(self, data: Data):
         """
@@ -166,10 +983,12 @@ class Row:
         if self.isScanned():
             if not self.id() in data.scannedIDs:
                 data.scannedIDs.append(self.id())
-            data.anzahlScannedItems[self.id()] = self.scanCount
+                data.anzahlScannedItems[self.id()] = self.scanCount
+                data.events.emit(ScanAdded(self.id()))
+            else:
+                data.setScanCount(self.id(), self.scanCount)
         else:
-            data.scannedIDs.remove(self.id())
-            data.anzahlScannedItems.pop(self.id())
+            data.removeId(self.id())
 
     def isScanned(self) -> bool:
         """
@@ -182,18 +1001,21 @@ class Row:
     def delete(self, data: Data, path: str) -> bool:
         """
         Deletes the entry from the database.
+        The deletion is written to the database with the next flush (see ``db.markDirty()``).
         Returns true if the entry was deleted from the database successfully, otherwise false.
         """
-        reloadFromFile(data, path)
         try:
+            rememberBase(data, self.id())
             # Remove the row from the DataFrame
             data.df = data.df[data.df[ID_COLUMN] != self.id()]
+            if data.stockIndex is not None:
+                data.stockIndex.removeEntry(self.id())
             # Update the scannedIDs and anzahlScannedItems
-            if self.id() in data.scannedIDs:
-                data.scannedIDs.remove(self.id())
-            data.anzahlScannedItems.pop(self.id(), None)
-            # Save the updated DataFrame to the Excel file
-            saveToExel(data, SETTINGS_FILE_PATH)
+            data.removeId(self.id())
+            data.events.emit(RowDeleted(self.id()))
+            data.pending.rows.pop(self.id(), None)
+            data.pending.deleted.add(self.id())
+            markDirty(data, path)
             return True
         except Exception as e:
             print(f"Error deleting row: {e}")
@@ -202,16 +1024,27 @@ class Row:
 
 def clearScanned(data: Data):
     data.scannedIDs.clear()
+    data.anzahlScannedItems.clear()
+    data.events.emit(ScansCleared())
 
 
-def newDataFromExel(filePath: str) -> Data:
+def newDataFromExel(filePath: str, columns: list[str] | None = None) -> Data:
     """
     Creates a new Data struct from the given excel file.
     Throws a ValueError if the file could not be read or if the columns are invalid.
+
+    Parameters
+    ----------
+    filePath : The path of the excel file
+    columns : Only load these columns of the data sheet and the ``KEY_COLUMNS``, None for all columns.
+        The other columns are never parsed, which is faster for wide sheets.
+        The data is marked as ``Data.projected`` and can not be saved.
     """
     # read_excel is not properly typed
     if not os.path.exists(filePath):
         raise ValueError("Datei wurde nicht gefunden.")
+    # Taken before reading, so a change while reading is noticed by the next reload
+    stamp = fileStamp(filePath)
     try:
         infoSheet: pd.DataFrame = pd.read_excel(filePath, sheet_name=INFO_SHEET, dtype={INFO_KEY_COLUMN: str, INFO_VALUE_COLUMN: str})  # type: ignore
     except Exception:
@@ -223,12 +1056,44 @@ def newDataFromExel(filePath: str) -> Data:
         )
 
     try:
-        df: pd.DataFrame = pd.read_excel(filePath, sheet_name=DATA_SHEET, dtype={ID_COLUMN: int, CODE_COLUMN: str, "Bestellnummer": str, STORED_AMOUNT_COLUMN: int})  # type: ignore
+        wanted = set(KEY_COLUMNS + (columns or []))
+        usecols = None if columns is None else lambda column: column in wanted
+        df: pd.DataFrame = pd.read_excel(filePath, sheet_name=DATA_SHEET, dtype=DATA_DTYPES, usecols=usecols)  # type: ignore
         locationSheet: pd.DataFrame = pd.read_excel(filePath, sheet_name=LOCATION_SHEET, dtype={LOCATION_ID_COLUMN: str, LOCATION_NAME_COLUMN: str, LOCATION_PARENT_COLUMN: str})  # type: ignore
     except Exception:
         raise ValueError("Datei konnte nicht gelesen werden.")
+    try:
+        stock: pd.DataFrame | None = pd.read_excel(filePath, sheet_name=STOCK_SHEET, dtype={LOCATION_COLUMN: str})  # type: ignore
+    except ValueError:
+        # Files written before entries could have several locations
+        stock = None
+    data = newDataFromContents(df, parseLocations(locationSheet), info, stock)
+    data.fileStamp = stamp
+    data.projected = columns is not None
+    return data
+
+
+def newDataFromContents(
+    df: pd.DataFrame,
+    locations: list[Location],
+    info: DBInfo,
+    stock: pd.DataFrame | None = None,
+    compact: bool = COMPACT_DATA,
+) -> Data:
+    """
+    Creates a new Data struct from the contents of the database.
+    ``stock`` are the further locations of entries (see ``db.newStock()``), None if there are none.
+    Files without a minimum stock column get it next to the stored amount, it is written with the next save.
+    With ``compact`` the columns are stored in less memory, see ``db.compactColumns()``.
+    Throws a ValueError if the columns are invalid.
+    """
+    if MIN_AMOUNT_COLUMN not in df.columns and STORED_AMOUNT_COLUMN in df.columns:
+        df.insert(df.columns.get_loc(STORED_AMOUNT_COLUMN) + 1, MIN_AMOUNT_COLUMN, 0)
+    if MIN_AMOUNT_COLUMN in df.columns:
+        df[MIN_AMOUNT_COLUMN] = pd.to_numeric(df[MIN_AMOUNT_COLUMN], errors="coerce").fillna(0).astype(int)
+    if compact:
+        compactColumns(df)
     # Add and remove the columns that shoud be displayed in the table
-    locations = parseLocations(locationSheet)
     data = Data(
         tableHeaders=list(df.columns),
         dataHeaders=list(df.columns),
@@ -237,16 +1102,156 @@ def newDataFromExel(filePath: str) -> Data:
         df=df,
         locations=locations,
         info=info,
+        stock=newStock(stock),
     )
     if not validateColumns(data):
         raise ValueError("Die Spalten in der Excel-Datei sind ungültig.")
+    data.allocator.reserve(
+        [int(df[ID_COLUMN].max())] if not df.empty else [],
+        df[CODE_COLUMN].astype(str),
+    )
     data.tableHeaders.remove(ID_COLUMN)
-    data.tableHeaders.append(EDIT_COLUMN)
-    data.tableHeaders.append(DELETE_COLUMN)
-    data.tableHeaders.append(COUNT_COLUMN)
+    data.tableHeaders.extend(BUTTON_HEADERS)
     return data
 
 
+def compactColumns(df: pd.DataFrame) -> int:
+    """
+    Stores the columns of the dataframe in less memory, in place. Returns how many bytes were saved.
+
+    Text columns with few distinct values (at most ``CATEGORY_SHARE`` of the rows), e.g. types, locations or manufacturers,
+    become categories: every row only stores a small code instead of a reference to its text.
+    Whole numbers are stored with 32 bit if they fit. The ID and code columns keep their types.
+    The values do not change, so ``Row.getValue()`` and the written file are the same.
+    Changes keep the columns compact, see ``db.setColumn()`` and ``db.appendRows()``.
+    """
+    saved = 0
+    for column in df.columns:
+        values = df[column]
+        if column == CODE_COLUMN or len(values) == 0:
+            continue
+        if values.dtype == object and column != ID_COLUMN:
+            if values.nunique() > CATEGORY_SHARE * len(values):
+                continue
+            compact = values.astype("category")
+            saved += values.nbytes - compact.cat.codes.nbytes - compact.cat.categories.nbytes
+        elif (
+            pd.api.types.is_integer_dtype(values.dtype)
+            and values.dtype.itemsize > 4
+            and column != ID_COLUMN
+        ):
+            limits = np.iinfo(np.int32)
+            if values.min() < limits.min or values.max() > limits.max:
+                continue
+            compact = values.astype(np.int32)
+            saved += values.nbytes - compact.nbytes
+        else:
+            continue
+        df[column] = compact
+    return saved
+
+
+def memoryUsage(df: pd.DataFrame) -> int:
+    """
+    Returns the memory used by the dataframe in bytes.
+    Unlike ``DataFrame.memory_usage(deep=True)``, texts that are used several times (e.g. by openpyxl or the categories)
+    are only counted once, like they are stored.
+    """
+    total = int(df.index.nbytes)
+    seen: set[int] = set()
+
+    def objectsSize(values: Any) -> int:
+        size = 0
+        for value in values:
+            if id(value) not in seen:
+                seen.add(id(value))
+                size += sys.getsizeof(value)
+        return size
+
+    for column in df.columns:
+        values = df[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            categories = values.cat.categories
+            total += values.cat.codes.nbytes + categories.nbytes
+            if categories.dtype == object:
+                total += objectsSize(categories)
+        else:
+            total += values.nbytes
+            if values.dtype == object:
+                total += objectsSize(values.values)
+    return total
+
+
+def memoryReport(df: pd.DataFrame) -> str:
+    """
+    Describes the memory used by the dataframe, compacted with ``compactColumns()`` and without.
+    Compacting does not copy the texts, so the memory without it is the compacted memory plus the saved references and numbers.
+    """
+    after = memoryUsage(df)
+    before = after
+    for column in df.columns:
+        values = df[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            before += len(values) * 8 - values.cat.codes.nbytes - values.cat.categories.nbytes
+        elif pd.api.types.is_integer_dtype(values.dtype) and values.dtype.itemsize < 8:
+            before += len(values) * (8 - values.dtype.itemsize)
+    return (
+        f"{len(df)} Einträge: {after / 1e6:.1f} MB"
+        f" (ohne Komprimierung etwa {before / 1e6:.1f} MB, {100 * (before - after) / max(before, 1):.0f} % gespart)"
+    )
+
+
+def mergeStock(base: pd.DataFrame, mine: pd.DataFrame, theirs: pd.DataFrame) -> pd.DataFrame:
+    """
+    Merges the further locations of entries changed by one user with the ones changed by others in the meantime,
+    like ``location.mergeLocations()``. The further locations of an entry are taken from this user if it changed them,
+    otherwise they are kept from the others.
+
+    Parameters
+    ----------
+    base : The further locations before this user changed them
+    mine : The further locations changed by this user
+    theirs : The current further locations, possibly changed by others
+    """
+
+    def byEntry(stock: pd.DataFrame) -> dict[int, list[tuple]]:
+        return {
+            int(id): sorted(map(tuple, rows[[LOCATION_COLUMN, STORED_AMOUNT_COLUMN]].values.tolist()))
+            for id, rows in stock.groupby(ID_COLUMN)
+        }
+
+    before = byEntry(base)
+    after = byEntry(mine)
+    changed = {id for id in before.keys() | after.keys() if before.get(id) != after.get(id)}
+    return newStock(
+        pd.concat([theirs[~theirs[ID_COLUMN].isin(changed)], mine[mine[ID_COLUMN].isin(changed)]])
+    )
+
+
+def newStock(stock: pd.DataFrame | None = None) -> pd.DataFrame:
+    """
+    Returns the further locations of entries with the columns ``consts.STOCK_COLUMNS`` and their types.
+    Rows without an entry or a location are dropped, empty amounts become 0.
+
+    Parameters
+    ----------
+    stock : The rows, e.g. read from the stock sheet, None for no rows
+    """
+    if stock is None:
+        stock = pd.DataFrame(columns=STOCK_COLUMNS)
+    stock = stock[STOCK_COLUMNS].dropna(subset=[ID_COLUMN, LOCATION_COLUMN])
+    stock = stock[stock[LOCATION_COLUMN].astype(str) != ""]
+    return pd.DataFrame(
+        {
+            ID_COLUMN: stock[ID_COLUMN].astype(int),
+            LOCATION_COLUMN: stock[LOCATION_COLUMN].astype(str),
+            STORED_AMOUNT_COLUMN: pd.to_numeric(stock[STORED_AMOUNT_COLUMN], errors="coerce")
+            .fillna(0)
+            .astype(int),
+        }
+    ).reset_index(drop=True)
+
+
 def parseDBInfo(infoSheet: pd.DataFrame) -> DBInfo:
     version = infoSheet.loc[
         infoSheet[INFO_KEY_COLUMN] == INFO_VERSION_KEY, INFO_VALUE_COLUMN
@@ -254,6 +1259,18 @@ def parseDBInfo(infoSheet: pd.DataFrame) -> DBInfo:
     return DBInfo(version)
 
 
+def visibleHeaders(data: Data, columns: list[str] | None) -> list[str]:
+    """
+    Returns the headers of the table columns that are shown (see ``Settings.columns``):
+    the columns of the database in the given order, followed by the buttons and the count.
+    Columns that are not in the database are skipped.
+    """
+    if columns is None:
+        return list(data.tableHeaders)
+    known = set(data.tableHeaders) - set(BUTTON_HEADERS)
+    return [column for column in dict.fromkeys(columns) if column in known] + BUTTON_HEADERS
+
+
 def validateColumns(data: Data):
     """
     Checks that all required columns are present in the data and no special columns are already present.
@@ -270,21 +1287,34 @@ def validateColumns(data: Data):
     return True
 
 
-def loadIDsAndCount(data: Data, filePath: str):
+def readIDsAndCount(filePath: str) -> dict[int, int] | None:
+    """
+    Reads the scanned IDs with their count from the file, None if it can not be read.
+    Does not need the data, so it can be read while the database is loaded (see the ``startup`` module).
+    """
     try:
-        with open(SCANNED_IDS_FILE_PATH, "r", encoding="utf-8") as f:
+        with open(filePath, "r", encoding="utf-8") as f:
             countOfIdsJson: dict[str, int] = json.load(f)
             countOfIds: dict[int, int] = {}
             for id, count in countOfIdsJson.items():
                 countOfIds[int(id)] = count
-
-            data.anzahlScannedItems = countOfIds
-            data.scannedIDs = list(countOfIds.keys())
+            return countOfIds
     # If the file does not exist, or there is any error parsing it, just ignore it
     # It will be overriden when closing the program
     except Exception as e:
         print(f"[Error] Could not load scanned IDs from file: {e}")
-        pass
+        return None
+
+
+def setIDsAndCount(data: Data, countOfIds: dict[int, int] | None):
+    if countOfIds is None:
+        return
+    data.anzahlScannedItems = countOfIds
+    data.scannedIDs = list(countOfIds.keys())
+
+
+def loadIDsAndCount(data: Data, filePath: str):
+    setIDsAndCount(data, readIDsAndCount(filePath))
 
 
 def saveScannedIDs(data: Data, filePath: str):
@@ -307,6 +1337,26 @@ def newRow(data: Data, id: int) -> Row:
     )
 
 
+def newEmptyRows(data: Data, count: int) -> list[Row]:
+    """
+    Creates rows for new entries with a fresh ID and code from the ``Data.allocator``.
+    All other values are empty. The rows are not written, use ``Row.write()`` for that.
+    """
+    ids = data.allocator.nextIds(count)
+    codes = data.allocator.nextCodes(count)
+    rows: list[Row] = []
+    for id, code in zip(ids, codes):
+        row = Row(["" for _ in data.dataHeaders], data.dataHeaders, 0)
+        row.setValue(ID_COLUMN, id)
+        row.setValue(CODE_COLUMN, code)
+        rows.append(row)
+    return rows
+
+
+def newEmptyRow(data: Data) -> Row:
+    return newEmptyRows(data, 1)[0]
+
+
 def newRowFromIndex(data: Data, index: int) -> Row:
     return newRow(data, data.scannedIDs[index])
 
@@ -318,11 +1368,27 @@ def newRowFromCode(data: Data, code: str) -> Row:
     return newRow(data, id.values[0])
 
 
+def idsForCodes(data: Data, codes: list[str]) -> dict[str, int]:
+    """
+    Looks up the IDs of many codes at once. Codes that are not found are missing in the result.
+    If a code is used by several entries, the first entry is used like in ``newRowFromCode()``.
+    """
+    matches = data.df.loc[data.df[CODE_COLUMN].isin(codes), [CODE_COLUMN, ID_COLUMN]]
+    matches = matches.drop_duplicates(CODE_COLUMN)
+    return dict(zip(matches[CODE_COLUMN], matches[ID_COLUMN].astype(int)))
+
+
 def validateIDs(data: Data):
+    """
+    Removes the scanned IDs that are not in the dataframe anymore.
+    """
+    known = set(data.df[ID_COLUMN].to_list())
+    if all(id in known for id in data.scannedIDs):
+        return
     for id in data.scannedIDs:
-        if id not in data.df[ID_COLUMN].to_list():
-            data.scannedIDs.remove(id)
-            data.anzahlScannedItems.pop(id)
+        if id not in known:
+            data.anzahlScannedItems.pop(id, None)
+    data.scannedIDs[:] = [id for id in data.scannedIDs if id in known]
 
 
 def syncIdsWithCount(data: Data):
@@ -332,14 +1398,19 @@ def syncIdsWithCount(data: Data):
             data.anzahlScannedItems[id] = 1
 
     # Remove all IDs from the anzahlScannedItems dict that are not in the scannedIDs list
-    keys = list(data.anzahlScannedItems.keys())
-    for i in reversed(range(len(data.anzahlScannedItems))):
-        if keys[i] not in data.scannedIDs:
-            data.anzahlScannedItems.pop(keys[i])
+    scanned = set(data.scannedIDs)
+    for id in list(data.anzahlScannedItems.keys()):
+        if id not in scanned:
+            data.anzahlScannedItems.pop(id)
 
 
 def newDfWithScannedIDs(data: Data) -> pd.DataFrame:
-    return data.df[data.df[ID_COLUMN].isin(data.scannedIDs)]  # type: ignore
+    """
+    Returns the rows of the scanned entries in the order of the list, e.g. along the pick route (see the ``pickRoute`` module).
+    """
+    rows = data.df[data.df[ID_COLUMN].isin(data.scannedIDs)].drop_duplicates(ID_COLUMN)
+    order = {id: index for index, id in enumerate(data.scannedIDs)}
+    return rows.iloc[rows[ID_COLUMN].map(order).to_numpy().argsort(kind="stable")]  # type: ignore
 
 
 from typing import List, TypeVar
@@ -351,45 +1422,238 @@ def check_list_type(items: List[T], expected_type: type) -> bool:
     return all(isinstance(item, expected_type) for item in items)
 
 
-def getSearchableStrings(data: Data) -> list[str]:
-    idCol: list[int] = data.df[ID_COLUMN].to_list()
-    strings: list[str] = []
-    for id in idCol:
-        row = newRow(data, id)
-        type = row.getValue(TYPE_COLUMN)
-        dec = row.getValue(DESC_COLUMN)
-        ident = row.getValue(IDENT_COLUMN)
-        if type == "" and dec == "" and ident == "":
-            continue
-        s = f"{id}: {type}, {dec}, {ident}"
-        strings.append(s)  # type: ignore
-    return strings
+def getSearchableStrings(data: Data, ids: set[int] | None = None) -> dict[int, str]:
+    """
+    Returns the strings the search is using, by the id of their entry.
+    Entries without a type, description and identification are left out.
+
+    Parameters
+    ----------
+    data : The data to be searched
+    ids : Only create the strings for these ids, None for all entries
+    """
+    df = data.df if ids is None else data.df[data.df[ID_COLUMN].isin(ids)]
+    parts: list[pd.Series] = [
+        (
+            df[column].astype(str).replace("nan", "")
+            if column in df.columns
+            else pd.Series("", index=df.index)
+        )
+        for column in [TYPE_COLUMN, DESC_COLUMN, IDENT_COLUMN]
+    ]
+    notEmpty = (parts[0] != "") | (parts[1] != "") | (parts[2] != "")
+    strings = (
+        df[ID_COLUMN].astype(str) + ": " + parts[0] + ", " + parts[1] + ", " + parts[2]
+    )
+    return dict(zip(df.loc[notEmpty, ID_COLUMN].tolist(), strings[notEmpty].tolist()))
 
 
 def addLocation(state: State, location: Location):
-    reloadFromFile(state.data, state.settings.filePath)
-    state.data.locations.append(location)
-    saveToExel(state.data, state.settings.filePath)
+    with writeLock(state.settings.filePath):
+        reloadFromFile(state.data, state.settings.filePath)
+        rememberLocations(state.data)
+        state.data.locations.append(location)
+        save(state.data, state.settings.filePath, locations=True)
+    state.data.events.emit(LocationChanged({location.id}))
+
+
+def entriesInLocations(data: Data, ids: set[str]) -> "pd.Series[bool]":
+    """
+    Returns a mask of the entries stored in one of the locations, e.g. all ids of a subtree (see ``location.getSubtreeIds()``).
+    """
+    return data.df[LOCATION_COLUMN].astype(str).isin(ids)
 
 
 def removeLocation(state: State, location: Location):
-    reloadFromFile(state.data, state.settings.filePath)
-    [
-        removeLocation(state, child)
-        for child in getChildren(state.data.locations, location)
-    ]
-    state.data.locations.remove(location)
-    saveToExel(state.data, state.settings.filePath)
+    removeLocationById(state, location.id)
 
 
 def removeLocationById(state: State, id: str):
-    reloadFromFile(state.data, state.settings.filePath)
-    [removeLocation(state, child) for child in getChildren(state.data.locations, id)]
-    state.data.locations = [loc for loc in state.data.locations if loc.id != id]
-    saveToExel(state.data, state.settings.filePath)
+    """
+    Removes the location and all its children of any depth.
+    The entries stored in the removed locations are moved to the parent of the location,
+    or get no location if it was a top level location. The same applies to further locations of entries.
+    Everything is written to the database at once.
+
+    Parameters
+    ----------
+    state : The application state
+    id : The id of the location to remove
+    """
+    data = state.data
+    with writeLock(state.settings.filePath):
+        reloadFromFile(data, state.settings.filePath)
+        rememberLocations(data)
+        parent = getLocation(data.locations, id).parent
+        subtree = getSubtreeIds(data.locations, id)
+
+        mask = entriesInLocations(data, subtree)
+        stockMask = data.stock[LOCATION_COLUMN].isin(subtree)
+        if mask.any():
+            # Remember the loaded values once, so the change can be merged with changes of other users
+            for values in data.df.loc[mask, data.dataHeaders].values.tolist():
+                data.pending.base.setdefault(int(values[headerIndex(data.dataHeaders, ID_COLUMN)]), values)
+            setColumn(data.df, mask, LOCATION_COLUMN, parent or "")
+            for values in data.df.loc[mask, data.dataHeaders].values.tolist():
+                data.pending.rows[int(values[headerIndex(data.dataHeaders, ID_COLUMN)])] = values
+            data.pending.mutations += 1
+        if stockMask.any():
+            if parent is None:
+                data.stock = data.stock[~stockMask].reset_index(drop=True)
+            else:
+                data.stock = data.stock.copy()
+                data.stock.loc[stockMask, LOCATION_COLUMN] = parent
+        data.stockIndex = None
+
+        data.locations = [loc for loc in data.locations if loc.id not in subtree]
+        save(data, state.settings.filePath, locations=True, stock=bool(stockMask.any()))
+    data.events.emit(LocationChanged(subtree))
 
 
 def renameLocation(state: State, location: Location, newName: str):
-    reloadFromFile(state.data, state.settings.filePath)
-    location.name = newName
-    saveToExel(state.data, state.settings.filePath)
+    with writeLock(state.settings.filePath):
+        reloadFromFile(state.data, state.settings.filePath)
+        rememberLocations(state.data)
+        location.name = newName
+        save(state.data, state.settings.filePath, locations=True)
+    state.data.events.emit(LocationChanged({location.id}))
+
+
+def moveLocations(state: State, ids: list[str], parentId: str | None):
+    """
+    Moves the locations with the given ids to the new parent.
+    If parents and their children are moved together, only the top most parents are moved,
+    so the children stay their children (see ``location.keepTopParents()``).
+
+    Parameters
+    ----------
+    state : The application state
+    ids : The ids of the locations to move
+    parentId : The id of the new parent, None to move them to the top level
+    """
+    with writeLock(state.settings.filePath):
+        reloadFromFile(state.data, state.settings.filePath)
+        rememberLocations(state.data)
+        locationsToMove = [getLocation(state.data.locations, id) for id in ids]
+        locationsToMove = keepTopParents(state.data.locations, locationsToMove)
+        for location in locationsToMove:
+            location.parent = parentId
+        save(state.data, state.settings.filePath, locations=True)
+    state.data.events.emit(
+        LocationChanged({location.id for location in locationsToMove})
+    )
+
+
+def __mainLocation(headers: list[str], values: list) -> tuple[str, int]:
+    """
+    Returns the main location of the values of a row and the amount stored there.
+    """
+    location = values[headerIndex(headers, LOCATION_COLUMN)] if LOCATION_COLUMN in headers else ""
+    amount = values[headerIndex(headers, STORED_AMOUNT_COLUMN)] if STORED_AMOUNT_COLUMN in headers else 0
+    location = "" if pd.isna(location) else str(location)
+    amount = 0 if pd.isna(amount) or str(amount) == "" else int(amount)
+    return location, amount
+
+
+def stockIndex(data: Data) -> StockIndex:
+    """
+    Returns where the entries are stored, see ``state.StockIndex``.
+    The index is built once from the rows and the stock sheet and reused until it is dropped.
+    """
+    if data.stockIndex is not None:
+        return data.stockIndex
+    index = StockIndex()
+    # Further locations of deleted entries are ignored until they are dropped on the next write
+    stock = data.stock[data.stock[ID_COLUMN].isin(data.df[ID_COLUMN])]
+    sums = stock.groupby([ID_COLUMN, LOCATION_COLUMN], sort=False)[STORED_AMOUNT_COLUMN].sum()
+    for (id, location), amount in sums.items():
+        index.further.setdefault(int(id), {})[location] = int(amount)
+    df = data.df
+    ids = df[ID_COLUMN].astype(int).tolist()
+    locations = (
+        df[LOCATION_COLUMN].astype(str).replace("nan", "").tolist()
+        if LOCATION_COLUMN in df.columns
+        else [""] * len(ids)
+    )
+    amounts = (
+        pd.to_numeric(df[STORED_AMOUNT_COLUMN], errors="coerce").fillna(0).astype(int).tolist()
+        if STORED_AMOUNT_COLUMN in df.columns
+        else [0] * len(ids)
+    )
+    for id, location, amount in zip(ids, locations, amounts):
+        index.setEntry(id, location, amount)
+    data.stockIndex = index
+    return index
+
+
+def placements(data: Data) -> pd.DataFrame:
+    """
+    Returns every location of every entry with the amount stored there, the main and the further locations,
+    as a dataframe with the columns ``consts.STOCK_COLUMNS``. Entries without a location have an empty location.
+    """
+    df = data.df
+    main = pd.DataFrame(
+        {
+            ID_COLUMN: df[ID_COLUMN].astype(int),
+            LOCATION_COLUMN: (
+                df[LOCATION_COLUMN].astype(str).replace("nan", "")
+                if LOCATION_COLUMN in df.columns
+                else ""
+            ),
+            STORED_AMOUNT_COLUMN: (
+                pd.to_numeric(df[STORED_AMOUNT_COLUMN], errors="coerce").fillna(0).astype(int)
+                if STORED_AMOUNT_COLUMN in df.columns
+                else 0
+            ),
+        }
+    )
+    further = data.stock[data.stock[ID_COLUMN].isin(df[ID_COLUMN])]
+    if further.empty:
+        return main.reset_index(drop=True)
+    return pd.concat([main, further], ignore_index=True)
+
+
+def entriesInSubtree(data: Data, location: Location | str) -> dict[int, int]:
+    """
+    Returns the entries stored in the location or one of its children of any depth, with their amount there.
+    """
+    return stockIndex(data).entriesIn(getSubtreeIds(data.locations, location))
+
+
+def getLocationsText(data: Data, id: int) -> str:
+    """
+    Returns the locations of the entry for displaying.
+    Only the location if the entry has a single one, otherwise every location with its amount.
+    """
+    locations = stockIndex(data).locationsOf(id)
+    if len(locations) == 1:
+        return getLocationString(data.locations, next(iter(locations)))
+    return "; ".join(
+        f"{getLocationString(data.locations, location)} ({amount})"
+        for location, amount in locations.items()
+    )
+
+
+def setFurtherLocations(state: State, id: int, locations: dict[str, int]):
+    """
+    Replaces the further locations of the entry and writes them to the database at once.
+
+    Parameters
+    ----------
+    state : The application state
+    id : The id of the entry
+    locations : The amount stored in each further location by location id
+    """
+    data = state.data
+    with writeLock(state.settings.filePath):
+        reloadFromFile(data, state.settings.filePath)
+        rememberLocations(data)
+        rows = pd.DataFrame(
+            [[id, location, amount] for location, amount in locations.items()],
+            columns=STOCK_COLUMNS,
+        )
+        stock = data.stock[data.stock[ID_COLUMN] != id]
+        data.stock = newStock(pd.concat([stock, rows]) if locations else stock)
+        data.stockIndex = None
+        save(data, state.settings.filePath, stock=True)
+    data.events.emit(RowEdited(id))
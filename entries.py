@@ -1,4 +1,6 @@
-import random
+from typing import Callable
+from PySide6.QtCore import Qt
+from PySide6.QtGui import QCloseEvent
 from PySide6.QtWidgets import (
     QLineEdit,
     QComboBox,
@@ -10,13 +12,18 @@ from PySide6.QtWidgets import (
     QMessageBox,
     QFileDialog,
     QSpinBox,
+    QTableWidget,
+    QTableWidgetItem,
+    QHeaderView,
 )
 import db
 from locationWidget import createLocationPicker
 from qrGenerator import *
 from consts import *
 from location import getLocationString
-from state import Location, State
+from state import Location, State, mainWindow
+
+entryForm: "EntryForm | None" = None
 
 
 def focus(fields: dict[str, QLineEdit | QComboBox | QSpinBox], column: str):
@@ -26,183 +33,324 @@ def focus(fields: dict[str, QLineEdit | QComboBox | QSpinBox], column: str):
     return inner
 
 
-def entryWindow(state: State, row: db.Row):
+class EntryForm(QWidget):
     """
-    Shows the entry window for the given row.
-    Consider using ``addEntryWindow()`` or ``editEntryWindow()`` for ease of use.
+    The window to create, edit and delete an entry.
+
+    The form is created once by ``entryWindow()`` and reused for every entry, so reopening it is instant.
+    It is not modal and does not block: when it is closed, the ``onClosed`` callback of the loaded entry is called.
+    The views are updated by the events of ``db.Row.write()`` and ``db.Row.delete()``.
+
+    Parameters
+    ----------
+    state : The application state
     """
-    assert state.gui is not None
 
-    def saveEntries():
+    def __init__(self, state: State):
+        super().__init__()
+        self.state = state
+        self.headers = list(state.data.dataHeaders)
+        self.row: db.Row | None = None
+        self.onClosed: Callable[[db.Row | None], None] | None = None
+        # The further locations of the entry with their amount, see ``db.setFurtherLocations()``
+        self.furtherTable: QTableWidget | None = None
+        self.setWindowTitle("Eintrag")
+
+        layout = QVBoxLayout()
+
+        fields: dict[str, QLineEdit | QComboBox | QSpinBox] = {}
+        self.fields = fields
+
+        prevInput = None
+
+        for column in self.headers:
+            if column == LOCATION_COLUMN:
+                layout.addWidget(QLabel("Lagerort"))
+                lRow = QHBoxLayout()
+
+                lLineEdit = QLineEdit()
+                lLineEdit.setDisabled(True)
+                lRow.addWidget(lLineEdit)
+
+                btn = QPushButton("🖉")
+                btn.clicked.connect(self.showLocationPicker)
+                lRow.addWidget(btn)
+
+                layout.addLayout(lRow)
+                fields[LOCATION_COLUMN] = lLineEdit
+
+                layout.addWidget(QLabel("Weitere Lagerorte"))
+                furtherTable = QTableWidget(0, 2)
+                furtherTable.setHorizontalHeaderLabels(["Lagerort", STORED_AMOUNT_COLUMN])
+                furtherTable.horizontalHeader().setSectionResizeMode(
+                    0, QHeaderView.ResizeMode.Stretch
+                )
+                furtherTable.verticalHeader().setVisible(False)
+                furtherTable.setMaximumHeight(120)
+                layout.addWidget(furtherTable)
+                self.furtherTable = furtherTable
+
+                fRow = QHBoxLayout()
+                addFurtherButton = QPushButton("Lagerort hinzufügen")
+                addFurtherButton.clicked.connect(self.showFurtherLocationPicker)
+                fRow.addWidget(addFurtherButton)
+                removeFurtherButton = QPushButton("Entfernen")
+                removeFurtherButton.clicked.connect(self.removeFurtherLocation)
+                fRow.addWidget(removeFurtherButton)
+                layout.addLayout(fRow)
+            elif column == ID_COLUMN:
+                continue
+            elif column in (STORED_AMOUNT_COLUMN, MIN_AMOUNT_COLUMN):
+                layout.addWidget(QLabel(column))
+                hbox = QHBoxLayout()
+                spinBox = QSpinBox()
+                spinBox.setMaximum(999999)
+                hbox.addWidget(spinBox)
+                layout.addLayout(hbox)
+                fields[column] = spinBox
+            else:
+                layout.addWidget(QLabel(column))
+                lineedit = QLineEdit()
+                if column in Examples:
+                    lineedit.setPlaceholderText(f"{Examples[column]}")
+                fields[column] = lineedit
+                layout.addWidget(fields[column])
+                if type(prevInput) is QLineEdit:
+                    prevInput.returnPressed.connect(focus(fields, column))
+                prevInput = fields[column]
+
+        editButton = QPushButton("Speichern")
+        editButton.clicked.connect(self.saveEntries)
+        layout.addWidget(editButton)
+
+        if type(prevInput) is QLineEdit:
+            prevInput.returnPressed.connect(self.saveEntries)
+
+        saveQrButton = QPushButton("QR-Code speichern")
+        saveQrButton.clicked.connect(lambda: saveQRCode(fields))
+        layout.addWidget(saveQrButton)
+
+        deleteFromDBButton = QPushButton("Eintrag löschen")
+        deleteFromDBButton.clicked.connect(self.deleteEntry)
+        layout.addWidget(deleteFromDBButton)
+
+        self.setLayout(layout)
+
+    def load(self, row: db.Row, onClosed: Callable[[db.Row | None], None] | None):
+        """
+        Fills the fields with the values of the row.
+        If another entry is still open, it is closed without saving.
+        """
+        self.finish(None)
+        self.row = row
+        self.onClosed = onClosed
+
+        # Loading Entry into fields
+        for column in self.fields:
+            value = row.getValue(column)
+            field = self.fields[column]
+
+            if type(field) == QLineEdit:
+                if column == LOCATION_COLUMN:
+                    field.setText(getLocationString(self.state.data.locations, value))
+                    continue
+                field.setText(value)
+                field.setEnabled(True)
+            elif type(field) == QComboBox:
+                field.clear()
+                field.addItem(value)
+                field.setCurrentText(value)
+                field.setEnabled(True)
+            elif type(field) == QSpinBox:
+                default = 0 if column == MIN_AMOUNT_COLUMN else 1
+                field.setValue(int(value) if value.isdigit() else default)
+                field.setEnabled(True)
+
+        if self.furtherTable is not None:
+            self.furtherTable.setRowCount(0)
+            further = db.stockIndex(self.state.data).further.get(row.id(), {})
+            for location, amount in further.items():
+                self.addFurtherLocation(location, amount)
+
+        self.fields[TYPE_COLUMN].setFocus()
+
+    def finish(self, result: db.Row | None):
+        """
+        Unloads the entry and calls the ``onClosed`` callback with the result.
+        """
+        onClosed = self.onClosed
+        self.row = None
+        self.onClosed = None
+        if onClosed is not None:
+            onClosed(result)
+
+    def saveEntries(self):
         """
         Saves entries to the database and closes the entry window.
-
-        The ``fields`` param hold a dict of Column names to ui
         """
-        for column in fields:
+        row = self.row
+        if row is None:
+            return
+        for column in self.fields:
             if column == LOCATION_COLUMN:
                 continue
-            value = getFieldValue(fields[column])
+            value = getFieldValue(self.fields[column])
             row.setValue(column, value)
-        row.write(state.data, state.settings.filePath)
-        window.close()
-
-    def deleteEntry(row: db.Row):
+        row.write(self.state.data, self.state.settings.filePath)
+        if self.furtherTable is not None:
+            further = self.furtherLocations()
+            if further != db.stockIndex(self.state.data).further.get(row.id(), {}):
+                db.setFurtherLocations(self.state, row.id(), further)
+        self.finish(row)
+        self.close()
+
+    def deleteEntry(self):
         """
-        Deletes the given entry from the database.
+        Deletes the loaded entry from the database.
         """
+        row = self.row
+        if row is None:
+            return
         confirmation = QMessageBox.question(
-            window,
+            self,
             "Löschen Bestätigen",
             "Sind Sie sich sicher, dass sie diesen Eintrag löschen?",
             QMessageBox.StandardButton.Yes,
             QMessageBox.StandardButton.No,
         )
         if confirmation == QMessageBox.StandardButton.Yes:
-            row.delete(state.data, state.settings.filePath)
-            window.close()
-        else:
-            pass
+            row.delete(self.state.data, self.state.settings.filePath)
+            self.finish(None)
+            self.close()
 
-    def showLocationPicker(state: State, row: db.Row):
-        locationWidget: QWidget
+    def showLocationPicker(self):
+        row = self.row
+        if row is None:
+            return
 
         def onLocationPicked(location: Location | None):
             if location is not None:
                 row.setValue(LOCATION_COLUMN, location.id)
-            field = fields[LOCATION_COLUMN]
+            field = self.fields[LOCATION_COLUMN]
             assert isinstance(field, QLineEdit)
-            field.setText(getLocationString(state.data.locations, row.getValue(LOCATION_COLUMN)))
-            locationWidget.close()
+            field.setText(
+                getLocationString(self.state.data.locations, row.getValue(LOCATION_COLUMN))
+            )
 
-        locationWidget = createLocationPicker(state, onLocationPicked)
-        locationWidget.setWindowTitle("Lagerort auswählen")
-        locationWidget.show()
+        self.pickLocation(onLocationPicked)
 
-    window = QWidget()
-    window.setWindowTitle("Eintrag")
-
-    layout = QVBoxLayout()
-
-    fields: dict[str, QLineEdit | QComboBox | QSpinBox] = {}
-
-    prevInput = None
-
-    for column in state.data.dataHeaders:
-        if column == LOCATION_COLUMN:
-            layout.addWidget(QLabel("Lagerort"))
-            lRow = QHBoxLayout()
-
-            lLineEdit = QLineEdit()
-            lLineEdit.setDisabled(True)
-            lRow.addWidget(lLineEdit)
-
-            btn = QPushButton("🖉")
-            btn.clicked.connect(lambda: showLocationPicker(state, row))
-            lRow.addWidget(btn)
-
-            layout.addLayout(lRow)
-            fields[LOCATION_COLUMN] = lLineEdit
-        elif column == ID_COLUMN:
-            continue
-        elif column == STORED_AMOUNT_COLUMN:
-            layout.addWidget(QLabel(column))
-            hbox = QHBoxLayout()
-            spinBox = QSpinBox()
-            spinBox.setMaximum(999999)
-            spinBox.setValue(int(row.getValue(column)) if row.getValue(column).isdigit() else 1)
-            hbox.addWidget(spinBox)
-            layout.addLayout(hbox)
-            fields[column] = spinBox
-        else:
-            layout.addWidget(QLabel(column))
-            lineedit = QLineEdit()
-            if column in Examples:
-                lineedit.setPlaceholderText(f"{Examples[column]}")
-            fields[column] = lineedit
-            layout.addWidget(fields[column])
-            if type(prevInput) is QLineEdit:
-                prevInput.returnPressed.connect(focus(fields, column))
-            prevInput = fields[column]
-
-    editButton = QPushButton("Speichern")
-    editButton.clicked.connect(lambda: saveEntries())
-    layout.addWidget(editButton)
-
-    if type(prevInput) is QLineEdit:
-        prevInput.returnPressed.connect(saveEntries)
-
-    saveQrButton = QPushButton("QR-Code speichern")
-    saveQrButton.clicked.connect(lambda: saveQRCode(fields))
-    layout.addWidget(saveQrButton)
-
-    deleteFromDBButton = QPushButton("Eintrag löschen")
-    deleteFromDBButton.clicked.connect(lambda: deleteEntry(row))
-    layout.addWidget(deleteFromDBButton)
-
-    window.setLayout(layout)
-
-    # Loading Entry into fields
-    for column in fields:
-            
-        value = row.getValue(column)
-        field = fields[column]
-            
-        if type(field) == QLineEdit:
-            if column == LOCATION_COLUMN:
-                field.setText(getLocationString(state.data.locations, value))
-                continue
-            field.setText(value)
-            field.setEnabled(True)
-        elif type(field) == QComboBox:
-            field.addItem(value)
-            field.setCurrentText(value)
-            field.setEnabled(True)
-        elif type(field) == QSpinBox:
-            field.setValue(int(value) if value.isdigit() else 1)
-            field.setEnabled(True)
+    def showFurtherLocationPicker(self):
+        if self.row is None:
+            return
+
+        def onLocationPicked(location: Location | None):
+            if location is not None and location.id not in self.furtherLocations():
+                self.addFurtherLocation(location.id, 1)
 
-    fields[TYPE_COLUMN].setFocus()
+        self.pickLocation(onLocationPicked)
 
-    window.show()
-    while window.isVisible():
-        state.gui.app.processEvents()
+    def pickLocation(self, onPicked: Callable[[Location | None], None]):
+        """
+        Shows the location picker and calls ``onPicked`` with the picked location, None if it was canceled.
+        """
+        locationWidget: QWidget
 
+        def onLocationPicked(location: Location | None):
+            onPicked(location)
+            locationWidget.close()
 
-def editEntryWindow(state: State, id: int):
+        locationWidget = createLocationPicker(self.state, onLocationPicked)
+        # Destroying the picker on close also removes its event subscriptions
+        locationWidget.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
+        locationWidget.setWindowTitle("Lagerort auswählen")
+        locationWidget.show()
+
+    def addFurtherLocation(self, location: str, amount: int):
+        table = self.furtherTable
+        assert table is not None
+        row = table.rowCount()
+        table.insertRow(row)
+        item = QTableWidgetItem(getLocationString(self.state.data.locations, location))
+        item.setData(Qt.ItemDataRole.UserRole, location)
+        item.setFlags(item.flags() & ~Qt.ItemFlag.ItemIsEditable)
+        table.setItem(row, 0, item)
+        spinBox = QSpinBox()
+        spinBox.setMaximum(999999)
+        spinBox.setValue(amount)
+        table.setCellWidget(row, 1, spinBox)
+
+    def removeFurtherLocation(self):
+        table = self.furtherTable
+        assert table is not None
+        if table.currentRow() >= 0:
+            table.removeRow(table.currentRow())
+
+    def furtherLocations(self) -> dict[str, int]:
+        """
+        Returns the amount for each further location in the form by location id.
+        """
+        table = self.furtherTable
+        assert table is not None
+        locations: dict[str, int] = {}
+        for row in range(table.rowCount()):
+            spinBox = table.cellWidget(row, 1)
+            assert isinstance(spinBox, QSpinBox)
+            locations[table.item(row, 0).data(Qt.ItemDataRole.UserRole)] = spinBox.value()
+        return locations
+
+    def closeEvent(self, event: QCloseEvent):
+        # Closed without saving
+        self.finish(None)
+        super().closeEvent(event)
+
+
+def entryWindow(
+    state: State,
+    row: db.Row,
+    onClosed: Callable[[db.Row | None], None] | None = None,
+):
+    """
+    Shows the entry window for the given row and returns immediately.
+    Consider using ``addEntryWindow()`` or ``editEntryWindow()`` for ease of use.
+
+    Parameters
+    ----------
+    state : The application state
+    row : The row to edit
+    onClosed : Called when the window is closed, with the saved row or None if it was not saved
+    """
+    global entryForm
+    # The columns of the form depend on the database, which can change on reload
+    if entryForm is None or entryForm.headers != state.data.dataHeaders:
+        if entryForm is not None:
+            entryForm.finish(None)
+            entryForm.deleteLater()
+        entryForm = EntryForm(state)
+    entryForm.load(row, onClosed)
+    entryForm.show()
+    entryForm.raise_()
+    entryForm.activateWindow()
+
+
+def editEntryWindow(
+    state: State, id: int, onClosed: Callable[[db.Row | None], None] | None = None
+):
     """
     Shows the entry window for the entry with the given id.
     """
-    entryWindow(state, db.newRow(state.data, id))
+    entryWindow(state, db.newRow(state.data, id), onClosed)
 
 
-def addEntryWindow(state: State):
+def addEntryWindow(
+    state: State, onClosed: Callable[[db.Row | None], None] | None = None
+):
     """
     Shows the entry window for a new entry.
     The id is automagically selected and the code is prefilled.
     """
-    ul: list[str] = list(state.data.df[ID_COLUMN])  # type: ignore
-    sorted_list: list[int] = [int(i) for i in ul]
-    sorted_list.sort()
-    next_id = sorted_list[-1] + 1 if not state.data.df.empty else 1
-
-    code = ""
-    while True:
-        code = str(random.randint(0, 9999999999)).zfill(10)
-        shoudBeEmpty = db.newRowFromCode(state.data, code)
-        if shoudBeEmpty.empty():
-            break
-
-    row: db.Row = db.newRow(state.data, sorted_list[0])
-    for column in state.data.dataHeaders:
-        if column == CODE_COLUMN:
-            row.setValue(column, code)
-        elif column == ID_COLUMN:
-            row.setValue(column, next_id)
-        else:
-            row.setValue(column, "")
+    row = db.newEmptyRow(state.data)
     row.scanCount = 1
-    entryWindow(state, row)
+    entryWindow(state, row, onClosed)
 
 
 def getFieldValue(field: QLineEdit | QComboBox | QSpinBox) -> str:
@@ -223,7 +371,7 @@ def saveQRCode(fields: dict[str, QLineEdit | QComboBox | QSpinBox]):
     assert type(code_field) == QLineEdit
     code = code_field.text()
     if not code:
-        QMessageBox.warning(window(), "Warnung", "Kein Code zum Speichern vorhanden!")  # type: ignore
+        QMessageBox.warning(mainWindow(), "Warnung", "Kein Code zum Speichern vorhanden!")  # type: ignore
         return
 
     # Todo: Use the fileActions module
@@ -234,6 +382,6 @@ def saveQRCode(fields: dict[str, QLineEdit | QComboBox | QSpinBox]):
     if file_name:
         data_matrix = generate_data_matrix(code)
         data_matrix.save(file_name, scale=10)
-        QMessageBox.information(window(), "Erfolg", f"QR-Code gespeichert als {file_name}")  # type: ignore
+        QMessageBox.information(mainWindow(), "Erfolg", f"QR-Code gespeichert als {file_name}")  # type: ignore
 
 
@@ -0,0 +1,239 @@
+from dataclasses import dataclass, field
+import os
+from PySide6.QtWidgets import (
+    QComboBox,
+    QDialog,
+    QFileDialog,
+    QFormLayout,
+    QHBoxLayout,
+    QLabel,
+    QMessageBox,
+    QPushButton,
+    QTableWidget,
+    QTableWidgetItem,
+    QVBoxLayout,
+)
+import pandas as pd
+
+from consts import CODE_COLUMN, ID_COLUMN, IDENT_COLUMN
+import db
+from state import Data, State, mainWindow
+
+# Rows shown in the preview of the import dialog
+PREVIEW_ROWS = 100
+
+
+@dataclass
+class ImportPlan:
+    """
+    What an import would change, created by ``entryImport.planImport()``.
+
+    Parameters
+    ----------
+    newRows : The rows that will be added, with the columns of ``Data.dataHeaders``.
+        IDs and missing codes are assigned when the plan is committed.
+    duplicates : The rows that already exist in the database or earlier in the file, they are skipped.
+        The column ``ID`` holds the ID of the existing entry if there is one.
+    unmappedColumns : The columns of the file that are not imported
+    """
+
+    newRows: pd.DataFrame
+    duplicates: pd.DataFrame
+    unmappedColumns: list[str] = field(default_factory=list)
+
+
+def readImportFile(path: str) -> pd.DataFrame:
+    """
+    Reads a CSV or Excel file with new entries. All values are read as strings.
+    The separator of CSV files is detected automatically.
+
+    Throws a ValueError if the file could not be read.
+    """
+    try:
+        if path.lower().endswith(".csv"):
+            df = pd.read_csv(path, dtype=str, sep=None, engine="python", keep_default_na=False)  # type: ignore
+        else:
+            df = pd.read_excel(path, dtype=str, keep_default_na=False)  # type: ignore
+    except Exception as e:
+        raise ValueError(f"Datei konnte nicht gelesen werden: {e}")
+    df.columns = [str(column).strip() for column in df.columns]
+    return df
+
+
+def guessMapping(columns: list[str], dataHeaders: list[str]) -> dict[str, str]:
+    """
+    Maps the columns of the database to the columns of the file with the same name, ignoring the case.
+    The ID column is never mapped, because IDs are always assigned by the database.
+    """
+    byName = {column.lower(): column for column in columns}
+    return {
+        header: byName[header.lower()]
+        for header in dataHeaders
+        if header != ID_COLUMN and header.lower() in byName
+    }
+
+
+def mapColumns(
+    df: pd.DataFrame, dataHeaders: list[str], mapping: dict[str, str]
+) -> pd.DataFrame:
+    """
+    Creates a dataframe with the columns of the database from the columns of the file.
+
+    Parameters
+    ----------
+    df : The contents of the file
+    dataHeaders : The columns of the database
+    mapping : Column of the database -> column of the file. Unmapped columns are left empty.
+    """
+    mapped = pd.DataFrame(index=df.index)
+    for header in dataHeaders:
+        source = mapping.get(header)
+        if source is not None and source in df.columns:
+            mapped[header] = df[source].astype(str).str.strip()
+        else:
+            mapped[header] = ""
+    return mapped
+
+
+def planImport(data: Data, df: pd.DataFrame, mapping: dict[str, str]) -> ImportPlan:
+    """
+    Splits the rows of the file into new rows and duplicates.
+
+    A row is a duplicate if its code or its identification (ignoring case) is already used in the database
+    or by an earlier row of the file. Both are checked with hash joins instead of searching per row.
+    """
+    mapped = mapColumns(df, data.dataHeaders, mapping)
+
+    codes = mapped[CODE_COLUMN]
+    existing = data.df.assign(**{CODE_COLUMN: data.df[CODE_COLUMN].astype(str)})
+    codeToId = existing.drop_duplicates(CODE_COLUMN).set_index(CODE_COLUMN)[ID_COLUMN]
+    matchedId = codes.where(codes != "").map(codeToId)
+    duplicate = matchedId.notna() | ((codes != "") & codes.duplicated())
+
+    if IDENT_COLUMN in data.dataHeaders:
+        idents = mapped[IDENT_COLUMN].str.lower()
+        existingIdents = existing[IDENT_COLUMN].astype(str).str.strip().str.lower()
+        identToId = (
+            existing.assign(**{IDENT_COLUMN: existingIdents})
+            .loc[lambda rows: ~rows[IDENT_COLUMN].isin(["", "nan"])]
+            .drop_duplicates(IDENT_COLUMN)
+            .set_index(IDENT_COLUMN)[ID_COLUMN]
+        )
+        matchedId = matchedId.fillna(idents.where(idents != "").map(identToId))
+        duplicate |= matchedId.notna() | ((idents != "") & idents.duplicated())
+
+    duplicates = mapped[duplicate].copy()
+    duplicates[ID_COLUMN] = matchedId[duplicate].astype("Int64")
+    return ImportPlan(
+        newRows=mapped[~duplicate].reset_index(drop=True),
+        duplicates=duplicates.reset_index(drop=True),
+        unmappedColumns=[
+            column for column in df.columns if column not in mapping.values()
+        ],
+    )
+
+
+def commitImport(data: Data, plan: ImportPlan, path: str) -> list[int]:
+    """
+    Adds the new rows of the plan to the database with a single write.
+    Returns the IDs of the new entries.
+    """
+    if plan.newRows.empty:
+        return []
+    return db.addRows(data, plan.newRows, path)
+
+
+def fillPreviewTable(table: QTableWidget, rows: pd.DataFrame, headers: list[str]):
+    shown = rows.head(PREVIEW_ROWS)
+    table.clear()
+    table.setRowCount(len(shown))
+    table.setColumnCount(len(headers))
+    table.setHorizontalHeaderLabels(headers)
+    for row, values in enumerate(shown[headers].astype(str).values.tolist()):
+        for column, value in enumerate(values):
+            table.setItem(row, column, QTableWidgetItem(value if value != "<NA>" else ""))
+
+
+def showImportDialog(state: State):
+    """
+    Asks for a CSV or Excel file and shows a preview of the import.
+    The columns of the file can be assigned to the columns of the database before importing.
+    """
+    path, _ = QFileDialog.getOpenFileName(
+        mainWindow(),
+        "Einträge importieren",
+        "",
+        "Tabellen (*.csv *.xlsx)",
+    )
+    if path == "":
+        return
+    try:
+        df = readImportFile(path)
+    except ValueError as e:
+        QMessageBox.warning(mainWindow(), "Fehler", e.args[0])
+        return
+
+    headers = [header for header in state.data.dataHeaders if header != ID_COLUMN]
+    mapping = guessMapping(list(df.columns), state.data.dataHeaders)
+    plan = planImport(state.data, df, mapping)
+
+    diag = QDialog(mainWindow())
+    diag.setWindowTitle(f"Import: {os.path.basename(path)}")
+    diag.resize(900, 600)
+    layout = QVBoxLayout()
+
+    # Assignment of the columns
+    mappingLayout = QFormLayout()
+    selectors: dict[str, QComboBox] = {}
+    for header in headers:
+        selector = QComboBox()
+        selector.addItem("")
+        selector.addItems(list(df.columns))
+        selector.setCurrentText(mapping.get(header, ""))
+        mappingLayout.addRow(header, selector)
+        selectors[header] = selector
+    layout.addLayout(mappingLayout)
+
+    summary = QLabel()
+    layout.addWidget(summary)
+    previewTable = QTableWidget()
+    layout.addWidget(previewTable)
+
+    def updatePreview():
+        nonlocal plan
+        mapping.clear()
+        for header, selector in selectors.items():
+            if selector.currentText() != "":
+                mapping[header] = selector.currentText()
+        plan = planImport(state.data, df, mapping)
+        summary.setText(
+            f"{len(plan.newRows)} neue Einträge, "
+            f"{len(plan.duplicates)} bereits vorhanden (werden übersprungen). "
+            f"Vorschau der ersten {PREVIEW_ROWS} neuen Einträge:"
+        )
+        fillPreviewTable(previewTable, plan.newRows, headers)
+        importButton.setDisabled(plan.newRows.empty)
+
+    buttonLayout = QHBoxLayout()
+    buttonLayout.addStretch(1)
+    cancelButton = QPushButton("Abbrechen")
+    buttonLayout.addWidget(cancelButton)
+    importButton = QPushButton("Importieren")
+    buttonLayout.addWidget(importButton)
+    layout.addLayout(buttonLayout)
+
+    def confirm():
+        ids = commitImport(state.data, plan, state.settings.filePath)
+        diag.accept()
+        QMessageBox.information(
+            mainWindow(), "Erfolg", f"{len(ids)} Einträge importiert."
+        )
+
+    for selector in selectors.values():
+        selector.currentTextChanged.connect(updatePreview)
+    cancelButton.clicked.connect(diag.reject)
+    importButton.clicked.connect(confirm)
+
+    diag.setLayout(layout)
+    updatePreview()
+    diag.exec()
@@ -0,0 +1,180 @@
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Callable, TypeVar
+
+# The state module holds the EventBus in the Data struct, so it can only be imported for type checking
+if TYPE_CHECKING:
+    from state import DataDiff, RowConflict
+
+
+@dataclass
+class ScanAdded:
+    """An entry was added to the list of scanned IDs (appended at the end)."""
+
+    id: int
+
+
+@dataclass
+class CountChanged:
+    """The scan count of an entry in the list of scanned IDs changed."""
+
+    id: int
+
+
+@dataclass
+class ScanRemoved:
+    """
+    An entry was removed from the list of scanned IDs.
+
+    Parameters
+    ----------
+    id : The id of the entry
+    index : The index the entry had in the list of scanned IDs
+    """
+
+    id: int
+    index: int
+
+
+@dataclass
+class ScansCleared:
+    """All entries were removed from the list of scanned IDs."""
+
+
+@dataclass
+class ScansReordered:
+    """The order of the list of scanned IDs changed, e.g. it was sorted along the pick route."""
+
+
+@dataclass
+class RowEdited:
+    """The values of an entry were changed or a new entry was created."""
+
+    id: int
+
+
+@dataclass
+class RowsAdded:
+    """Many new entries were added at once, e.g. by an import."""
+
+    ids: set[int]
+
+
+@dataclass
+class RowsEdited:
+    """The values of many entries were changed at once, e.g. by a stock-taking."""
+
+    ids: set[int]
+
+
+@dataclass
+class RowDeleted:
+    """An entry was deleted from the database."""
+
+    id: int
+
+
+@dataclass
+class LocationChanged:
+    """
+    Locations were added, removed, renamed or moved.
+
+    Parameters
+    ----------
+    ids : The ids of the changed locations
+    """
+
+    ids: set[str] = field(default_factory=set)
+
+
+@dataclass
+class DataReloaded:
+    """The data was reloaded from the database, only emitted if something changed."""
+
+    diff: "DataDiff"
+
+
+@dataclass
+class SaveConflicts:
+    """Entries were changed by this and another user at the same time, see ``state.RowConflict``."""
+
+    conflicts: "list[RowConflict]"
+
+
+@dataclass
+class ModeChanged:
+    """The multiplier, the delete mode, the stock-taking mode or the sorting of the list changed."""
+
+
+@dataclass
+class ColumnsChanged:
+    """The shown columns of the list or their order changed, see ``state.Settings.columns``."""
+
+
+@dataclass
+class InventoryCounted:
+    """The counted pieces of an entry changed during a stock-taking, see ``state.InventorySession``."""
+
+    id: int
+
+
+@dataclass
+class ScanProcessed:
+    """
+    A scanned entry was processed by ``scanCommands.addItems()``, e.g. for the scan log.
+
+    Parameters
+    ----------
+    id : The id of the entry
+    quantity : The change of the scan count or the counted pieces, negative if pieces were removed
+    mode : "add", "delete" (removed from the list), "count" or "uncount" (during a stock-taking)
+    station : The host name of this computer or the address of the scanner that sent the code
+    """
+
+    id: int
+    quantity: int
+    mode: str
+    station: str
+
+
+E = TypeVar("E")
+
+
+class EventBus:
+    """
+    Notifies subscribers about changes to the ``State`` and ``Data``.
+
+    Views subscribe to the events they need and only redo the work for that change,
+    instead of every handler redrawing everything.
+
+    Example
+    -------
+    >>> unsubscribe = data.events.subscribe(ScanAdded, lambda event: print(event.id))
+    >>> data.events.emit(ScanAdded(42))
+    42
+    >>> unsubscribe()
+    """
+
+    def __init__(self) -> None:
+        self.__subscribers: dict[type, list[Callable[[Any], None]]] = {}
+
+    def subscribe(
+        self, eventType: type[E], callback: Callable[[E], None]
+    ) -> Callable[[], None]:
+        """
+        Calls the callback for every emitted event of the given type.
+
+        Returns a function that removes the subscription again.
+        """
+        callbacks = self.__subscribers.setdefault(eventType, [])
+        callbacks.append(callback)
+
+        def unsubscribe():
+            if callback in callbacks:
+                callbacks.remove(callback)
+
+        return unsubscribe
+
+    def emit(self, event: object):
+        # Copy, so callbacks can unsubscribe while the event is handled
+        for callback in list(self.__subscribers.get(type(event), [])):
+            callback(event)
@@ -4,7 +4,7 @@ from PySide6.QtWidgets import * #type: ignore
 
 from consts import ID_COLUMN, COUNT_COLUMN
 import db
-from state import Settings, State, mainWindow
+from state import Data, Settings, State, mainWindow
 
 def select_folder_dialog():
     """
@@ -38,6 +38,9 @@ def saveScannedToExcel(state: State):
     saveFolderPath = select_folder_dialog()
     if saveFolderPath == "":  # if no folder was selected, return
         return
+    if state.data.projected:
+        # The shopping list has all columns, they might not be loaded yet (see the ``lazyLoad`` module)
+        db.reloadFromFile(state.data, state.settings.filePath)
     filteredDf = db.newDfWithScannedIDs(state.data)
     filteredDf[COUNT_COLUMN] = filteredDf[ID_COLUMN].map(state.data.anzahlScannedItems)  # type: ignore
     outputFilePath = os.path.join(saveFolderPath, "Einkaufsliste.xlsx")
@@ -48,7 +51,17 @@ def saveScannedToExcel(state: State):
     return
 
 
-def showSelectFileDialog(settings: Settings, title: str, message: str):
+def showSelectFileDialog(settings: Settings, title: str, message: str, error: str | None = None) -> Data:
+    """
+    Asks for a valid excel file until one is loaded and returns its data. Each chosen file is only read once.
+
+    Parameters
+    ----------
+    settings : The settings, the file path is changed to the chosen file
+    title : The title of the dialog
+    message : The text above the file path
+    error : Why the file in the settings could not be loaded, it is read again if None
+    """
 
     diag = QDialog(mainWindow())
     diag.setWindowTitle(title)
@@ -100,9 +113,12 @@ def showSelectFileDialog(settings: Settings, title: str, message: str):
         diag.reject()
         sys.exit()
 
+    loaded: Data | None = None
+
     def confirm():
+        nonlocal loaded
         try:
-            db.newDataFromExel(settings.filePath)
+            loaded = db.loadData(settings.filePath)
         except ValueError as e:
             info.setText(e.args[0])
             return
@@ -119,10 +135,17 @@ def showSelectFileDialog(settings: Settings, title: str, message: str):
     diag.setLayout(layout)
 
     # Dialogfeld anzeigen
-    confirm()
-    diag.adjustSize()
-    diag.exec()
-    return db.newDataFromExel(settings.filePath)
+    if error is None:
+        confirm()
+    else:
+        info.setText(error)
+    if loaded is None:
+        diag.adjustSize()
+        diag.exec()
+    if loaded is None:
+        # Closed without a valid file, the same as cancel
+        sys.exit()
+    return loaded
 
 
 def loadValideExcel(settings: Settings):
@@ -140,6 +163,6 @@ def loadValideExcel(settings: Settings):
     The data struct
     """
     try:
-        return db.newDataFromExel(settings.filePath)
-    except ValueError:
-        return showSelectFileDialog(settings, "Exel-Datei auswählen", "Bitte wählen Sie eine gültige Excel-Datei aus.")
+        return db.loadData(settings.filePath)
+    except ValueError as e:
+        return showSelectFileDialog(settings, "Exel-Datei auswählen", "Bitte wählen Sie eine gültige Excel-Datei aus.", e.args[0])
@@ -0,0 +1,151 @@
+from dataclasses import dataclass, field
+import sys
+from PySide6.QtWidgets import QMessageBox, QWidget
+import pandas as pd
+
+from consts import CODE_COLUMN, ID_COLUMN, LOCATION_COLUMN
+from state import Data, Location
+
+
+@dataclass
+class IntegrityReport:
+    """
+    The problems found in the data by ``integrity.checkIntegrity()``.
+
+    Parameters
+    ----------
+    duplicateIDs : IDs that are used by more than one entry
+    duplicateCodes : Codes that are used by more than one entry, scanning them only finds the first entry
+    danglingPositions : IDs of the entries whose location does not exist
+    orphanLocations : Ids of the locations whose parent does not exist
+    cyclicLocations : Ids of the locations that are (indirectly) their own parent
+    """
+
+    duplicateIDs: list[int] = field(default_factory=list)
+    duplicateCodes: list[str] = field(default_factory=list)
+    danglingPositions: list[int] = field(default_factory=list)
+    orphanLocations: list[str] = field(default_factory=list)
+    cyclicLocations: list[str] = field(default_factory=list)
+
+    def ok(self) -> bool:
+        return not (
+            self.duplicateIDs
+            or self.duplicateCodes
+            or self.danglingPositions
+            or self.orphanLocations
+            or self.cyclicLocations
+        )
+
+    def summary(self, limit: int = 10) -> str:
+        """
+        Returns a readable description of all problems.
+        Only the first ``limit`` values of each problem are listed.
+        """
+
+        def listed(values: list[int] | list[str]) -> str:
+            text = ", ".join(str(value) for value in values[:limit])
+            if len(values) > limit:
+                text += f", ... (+{len(values) - limit})"
+            return text
+
+        lines: list[str] = []
+        if self.duplicateIDs:
+            lines.append(f"Doppelte IDs: {listed(self.duplicateIDs)}")
+        if self.duplicateCodes:
+            lines.append(f"Doppelte Codes: {listed(self.duplicateCodes)}")
+        if self.danglingPositions:
+            lines.append(
+                f"Einträge mit nicht vorhandenem Lagerort (IDs): {listed(self.danglingPositions)}"
+            )
+        if self.orphanLocations:
+            lines.append(
+                f"Lagerorte mit nicht vorhandenem Überort: {listed(self.orphanLocations)}"
+            )
+        if self.cyclicLocations:
+            lines.append(
+                f"Lagerorte, die sich selbst enthalten: {listed(self.cyclicLocations)}"
+            )
+        if not lines:
+            return "Keine Probleme gefunden."
+        return "\n".join(lines)
+
+
+def checkIntegrity(data: Data) -> IntegrityReport:
+    """
+    Checks the data for problems that the column validation (``db.validateColumns()``) does not find.
+
+    The entries are checked with vectorized operations, so this is fast enough to run on every load.
+    """
+    report = IntegrityReport()
+    df = data.df
+
+    ids = df[ID_COLUMN]
+    report.duplicateIDs = ids[ids.duplicated()].unique().tolist()
+
+    codes = df[CODE_COLUMN].astype(str)
+    codes = codes[~codes.isin(["", "nan"])]
+    report.duplicateCodes = codes[codes.duplicated()].unique().tolist()
+
+    locationIds = {location.id for location in data.locations}
+    if LOCATION_COLUMN in df.columns:
+        positions = df[LOCATION_COLUMN].astype(str)
+        dangling = ~positions.isin(["", "nan"]) & ~positions.isin(locationIds)
+        report.danglingPositions = ids[dangling].tolist()
+
+    report.orphanLocations = [
+        location.id
+        for location in data.locations
+        if location.parent is not None and location.parent not in locationIds
+    ]
+    report.cyclicLocations = findCycles(data.locations)
+    return report
+
+
+def findCycles(locations: list[Location]) -> list[str]:
+    """
+    Returns the ids of all locations that are part of a parent cycle.
+    Every location is visited once, so this runs in linear time.
+    """
+    parents = {location.id: location.parent for location in locations}
+    # 0: not visited, 1: on the current path, 2: done
+    visited: dict[str, int] = {}
+    cyclic: list[str] = []
+    for start in parents:
+        path: list[str] = []
+        current: str | None = start
+        while current is not None and current in parents and visited.get(current, 0) == 0:
+            visited[current] = 1
+            path.append(current)
+            current = parents[current]
+        if current is not None and visited.get(current) == 1:
+            # The path ran into itself, everything from there on is the cycle
+            cyclic.extend(path[path.index(current) :])
+        for id in path:
+            visited[id] = 2
+    return cyclic
+
+
+def showIntegrityReport(report: IntegrityReport, parent: QWidget | None = None):
+    """
+    Warns the user about the problems in the report. Does nothing if there are none.
+    """
+    if report.ok():
+        return
+    QMessageBox.warning(
+        parent,
+        "Probleme in der Datenbank",
+        "In der Excel-Datei wurden Probleme gefunden:\n\n"
+        + report.summary()
+        + "\n\nBitte korrigieren Sie die Einträge, da sonst z.B. beim Scannen falsche Einträge gefunden werden können.",
+    )
+
+
+if __name__ == "__main__":
+    import db
+
+    if len(sys.argv) != 2:
+        print("Verwendung: python integrity.py <Pfad zur Excel-Datei oder Server-Adresse>")
+        sys.exit(2)
+    report = checkIntegrity(db.loadData(sys.argv[1]))
+    print(report.summary(limit=100))
+    sys.exit(0 if report.ok() else 1)
@@ -0,0 +1,176 @@
+from PySide6.QtCore import Qt
+from PySide6.QtWidgets import (
+    QHBoxLayout,
+    QHeaderView,
+    QLabel,
+    QMessageBox,
+    QPushButton,
+    QTableWidget,
+    QTableWidgetItem,
+    QVBoxLayout,
+    QWidget,
+)
+
+from consts import DESC_COLUMN, ID_COLUMN, STORED_AMOUNT_COLUMN, TYPE_COLUMN
+import db
+from events import InventoryCounted, ModeChanged
+from state import InventorySession, State, mainWindow
+
+INVENTORY_COLUMNS = ["ID", "Eintrag", "Bisher", "Gezählt", "Differenz"]
+
+
+def startInventory(state: State):
+    """
+    Starts a stock-taking: from now on scans count the pieces of the entries instead of adding them to the list.
+    """
+    if state.inventory is None:
+        state.setInventory(InventorySession())
+
+
+def countItem(state: State, id: int, quantity: int):
+    """
+    Counts pieces of the entry in the running stock-taking, negative quantities remove counted pieces.
+    The first count of an entry remembers its stored amount, so the difference can be shown.
+    """
+    session = state.inventory
+    assert session is not None
+    if id not in session.counted:
+        rows = state.data.df.loc[state.data.df[ID_COLUMN] == id, STORED_AMOUNT_COLUMN]
+        session.stored[id] = int(rows.iloc[0]) if not rows.empty and str(rows.iloc[0]).isdigit() else 0
+        session.counted[id] = 0
+    session.counted[id] = max(0, session.counted[id] + quantity)
+    state.data.events.emit(InventoryCounted(id))
+
+
+def commitInventory(state: State) -> int:
+    """
+    Ends the stock-taking and writes the counted amounts of all changed entries at once.
+    Returns the number of changed entries.
+    """
+    session = state.inventory
+    assert session is not None
+    changes = session.changes()
+    state.setInventory(None)
+    if changes:
+        db.setStoredAmounts(state.data, changes, state.settings.filePath)
+    return len(changes)
+
+
+def discardInventory(state: State):
+    """
+    Ends the stock-taking without changing anything.
+    """
+    state.setInventory(None)
+
+
+def finishInventory(state: State):
+    """
+    Asks whether the counted amounts of the running stock-taking are saved, discarded or the counting continues.
+    """
+    session = state.inventory
+    if session is None:
+        return
+    changes = session.changes()
+    answer = QMessageBox.question(
+        mainWindow(),
+        "Inventur beenden",
+        f"{len(session.counted)} Einträge gezählt, bei {len(changes)} weicht die Stückzahl ab.\n"
+        "Sollen die gezählten Stückzahlen gespeichert werden?",
+        QMessageBox.StandardButton.Save
+        | QMessageBox.StandardButton.Discard
+        | QMessageBox.StandardButton.Cancel,
+        QMessageBox.StandardButton.Save,
+    )
+    if answer == QMessageBox.StandardButton.Save:
+        commitInventory(state)
+    elif answer == QMessageBox.StandardButton.Discard:
+        discardInventory(state)
+
+
+def toggleInventory(state: State):
+    if state.inventory is None:
+        startInventory(state)
+    else:
+        finishInventory(state)
+
+
+def createInventoryPanel(state: State) -> QWidget:
+    """
+    Creates the panel with the running differences of the stock-taking, only visible while it runs.
+    The subscriptions are removed when the panel is destroyed.
+    """
+    panel = QWidget()
+    layout = QVBoxLayout()
+    layout.setContentsMargins(0, 0, 0, 0)
+    panel.setLayout(layout)
+
+    headerLayout = QHBoxLayout()
+    summary = QLabel()
+    summary.setStyleSheet("font-weight: bold;")
+    headerLayout.addWidget(summary)
+    headerLayout.addStretch(1)
+    saveButton = QPushButton("Inventur speichern")
+    saveButton.clicked.connect(lambda: commitInventory(state))
+    headerLayout.addWidget(saveButton)
+    discardButton = QPushButton("Verwerfen")
+    discardButton.clicked.connect(lambda: discardInventory(state))
+    headerLayout.addWidget(discardButton)
+    layout.addLayout(headerLayout)
+
+    table = QTableWidget(0, len(INVENTORY_COLUMNS))
+    table.setHorizontalHeaderLabels(INVENTORY_COLUMNS)
+    table.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)
+    table.verticalHeader().setVisible(False)
+    table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+    table.setMaximumHeight(200)
+    layout.addWidget(table)
+
+    # Table row of every counted entry
+    rows: dict[int, int] = {}
+
+    def updateSummary():
+        session = state.inventory
+        if session is None:
+            return
+        summary.setText(
+            f"Inventur: {len(session.counted)} Einträge gezählt, {len(session.changes())} Abweichungen"
+        )
+
+    def onCounted(event: InventoryCounted):
+        session = state.inventory
+        if session is None:
+            return
+        if event.id not in rows:
+            rows[event.id] = table.rowCount()
+            table.insertRow(table.rowCount())
+            row = db.newRow(state.data, event.id)
+            name = ", ".join(
+                value
+                for value in [row.getValue(TYPE_COLUMN), row.getValue(DESC_COLUMN)]
+                if value != ""
+            )
+            table.setItem(rows[event.id], 0, QTableWidgetItem(str(event.id)))
+            table.setItem(rows[event.id], 1, QTableWidgetItem(name))
+        stored = session.stored[event.id]
+        counted = session.counted[event.id]
+        for column, value in [(2, stored), (3, counted), (4, counted - stored)]:
+            item = QTableWidgetItem(f"{value:+d}" if column == 4 and value != 0 else str(value))
+            item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+            table.setItem(rows[event.id], column, item)
+        table.scrollToItem(table.item(rows[event.id], 0))
+        updateSummary()
+
+    def onModeChanged(_: ModeChanged):
+        if state.inventory is None:
+            table.setRowCount(0)
+            rows.clear()
+        updateSummary()
+        panel.setVisible(state.inventory is not None)
+
+    unsubscribers = [
+        state.data.events.subscribe(InventoryCounted, onCounted),
+        state.data.events.subscribe(ModeChanged, onModeChanged),
+    ]
+    panel.destroyed.connect(lambda: [unsubscribe() for unsubscribe in unsubscribers])
+    panel.setVisible(state.inventory is not None)
+    return panel
@@ -0,0 +1,385 @@
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+import argparse
+import base64
+import hashlib
+import os
+import sys
+from xml.sax.saxutils import escape
+from PySide6.QtCore import QRectF, Qt
+from PySide6.QtGui import (
+    QFont,
+    QGuiApplication,
+    QImage,
+    QPageSize,
+    QPainter,
+    QPdfWriter,
+)
+from PySide6.QtWidgets import (
+    QApplication,
+    QFileDialog,
+    QInputDialog,
+    QMessageBox,
+    QWidget,
+)
+import pandas as pd
+
+from consts import (
+    CODE_COLUMN,
+    DESC_COLUMN,
+    ID_COLUMN,
+    LABEL_CACHE_DIR,
+    LABEL_COLUMNS,
+    LABEL_ROWS,
+    TYPE_COLUMN,
+)
+from location import getLocationFromNames
+from locationWidget import createLocationPicker
+from qrGenerator import generate_data_matrix
+from state import Data, Location, State, mainWindow
+
+# A4 in mm
+PAGE_WIDTH = 210.0
+PAGE_HEIGHT = 297.0
+PAGE_MARGIN = 10.0
+# Below this amount of missing symbols, starting worker processes takes longer than rendering
+MIN_SYMBOLS_FOR_POOL = 50
+
+
+@dataclass
+class Label:
+    """
+    The contents of one label on a sheet.
+
+    Parameters
+    ----------
+    code : The code encoded in the symbol
+    lines : The text printed next to the symbol
+    """
+
+    code: str
+    lines: list[str]
+
+
+def selectByLocation(data: Data, location: Location | str) -> list[int]:
+    """
+    Returns the IDs of all entries stored in the location or anywhere below it, as main or further location
+    (see ``db.entriesInSubtree()``), in the order of the entries.
+    """
+    # Not imported at the top, so the worker processes do not load the database module
+    import db
+
+    ids = db.entriesInSubtree(data, location).keys()
+    return data.df.loc[data.df[ID_COLUMN].isin(ids), ID_COLUMN].drop_duplicates().tolist()
+
+
+def labelsForIds(data: Data, ids: list[int]) -> list[Label]:
+    """
+    Creates the labels for the entries in the order of the given IDs.
+    """
+    rows = data.df.drop_duplicates(ID_COLUMN).set_index(ID_COLUMN)
+    rows = rows.loc[[id for id in ids if id in rows.index]]
+    texts = [
+        (
+            rows[column].astype(str).replace("nan", "")
+            if column in rows.columns
+            else pd.Series("", index=rows.index)
+        )
+        for column in [TYPE_COLUMN, DESC_COLUMN, CODE_COLUMN]
+    ]
+    return [
+        Label(code, [typ, desc, code])
+        for typ, desc, code in zip(*(text.tolist() for text in texts))
+        if code != ""
+    ]
+
+
+def symbolPath(code: str, cacheDir: str = LABEL_CACHE_DIR) -> str:
+    """The path of the cached symbol for the code, named by the hash of the code."""
+    name = hashlib.sha1(code.encode("utf-8")).hexdigest()
+    return os.path.join(cacheDir, f"{name}.png")
+
+
+def renderSymbol(code: str, path: str):
+    """
+    Renders the symbol for the code to a PNG file.
+    Runs in the worker processes, so it must not use any Qt objects.
+    """
+    # Write to a temporary file first, so other processes never read half written symbols
+    tmpPath = f"{path}.{os.getpid()}.tmp"
+    generate_data_matrix(code).save(tmpPath, kind="png", scale=10, border=1)
+    os.replace(tmpPath, path)
+
+
+def renderSymbols(codes: list[str], cacheDir: str = LABEL_CACHE_DIR) -> dict[str, str]:
+    """
+    Makes sure a symbol is cached for every code and returns the paths by code.
+    Missing symbols are rendered in parallel worker processes.
+    """
+    os.makedirs(cacheDir, exist_ok=True)
+    paths = {code: symbolPath(code, cacheDir) for code in codes}
+    missing = [code for code, path in paths.items() if not os.path.exists(path)]
+    if len(missing) < MIN_SYMBOLS_FOR_POOL:
+        for code in missing:
+            renderSymbol(code, paths[code])
+    else:
+        with ProcessPoolExecutor() as pool:
+            # Consume the results, so errors of the workers are raised here
+            list(
+                pool.map(
+                    renderSymbol,
+                    missing,
+                    [paths[code] for code in missing],
+                    chunksize=32,
+                )
+            )
+    return paths
+
+
+def paginate(labels: list[Label], columns: int, rows: int) -> list[list[Label]]:
+    perPage = columns * rows
+    return [labels[i : i + perPage] for i in range(0, len(labels), perPage)]
+
+
+def cellRect(index: int, columns: int, rows: int) -> tuple[float, float, float, float]:
+    """Returns x, y, width and height in mm of the label with the index on its page."""
+    width = (PAGE_WIDTH - 2 * PAGE_MARGIN) / columns
+    height = (PAGE_HEIGHT - 2 * PAGE_MARGIN) / rows
+    return (
+        PAGE_MARGIN + (index % columns) * width,
+        PAGE_MARGIN + (index // columns) * height,
+        width,
+        height,
+    )
+
+
+def writeSvgPages(
+    pages: list[list[Label]], symbols: dict[str, str], path: str, columns: int, rows: int
+) -> list[str]:
+    """
+    Writes one SVG file per page, numbered if there is more than one page.
+    The symbols are embedded, so the files can be printed on any computer.
+    """
+    stem, extension = os.path.splitext(path)
+    encoded: dict[str, str] = {}
+    written: list[str] = []
+    for pageNumber, page in enumerate(pages, start=1):
+        parts = [
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{PAGE_WIDTH}mm" height="{PAGE_HEIGHT}mm" '
+            f'viewBox="0 0 {PAGE_WIDTH} {PAGE_HEIGHT}">'
+        ]
+        for index, label in enumerate(page):
+            x, y, width, height = cellRect(index, columns, rows)
+            size = height - 2
+            if label.code not in encoded:
+                with open(symbols[label.code], "rb") as f:
+                    encoded[label.code] = base64.b64encode(f.read()).decode("ascii")
+            parts.append(
+                f'<image x="{x + 1:.2f}" y="{y + 1:.2f}" width="{size:.2f}" height="{size:.2f}" '
+                f'style="image-rendering:pixelated" href="data:image/png;base64,{encoded[label.code]}"/>'
+            )
+            for line, text in enumerate(label.lines):
+                parts.append(
+                    f'<text x="{x + size + 2:.2f}" y="{y + 4 + line * 3.5:.2f}" font-size="2.8" '
+                    f'font-family="sans-serif">{escape(text[:30])}</text>'
+                )
+        parts.append("</svg>")
+        pagePath = path if len(pages) == 1 else f"{stem}_{pageNumber}{extension}"
+        with open(pagePath, "w", encoding="utf-8") as f:
+            f.write("\n".join(parts))
+        written.append(pagePath)
+    return written
+
+
+def paintPage(
+    painter: QPainter,
+    page: list[Label],
+    symbols: dict[str, str],
+    dotsPerMm: float,
+    columns: int,
+    rows: int,
+):
+    font = QFont("sans-serif")
+    font.setPixelSize(max(1, int(2.8 * dotsPerMm)))
+    painter.setFont(font)
+    for index, label in enumerate(page):
+        x, y, width, height = cellRect(index, columns, rows)
+        size = height - 2
+        painter.drawImage(
+            QRectF((x + 1) * dotsPerMm, (y + 1) * dotsPerMm, size * dotsPerMm, size * dotsPerMm),
+            QImage(symbols[label.code]),
+        )
+        textRect = QRectF(
+            (x + size + 2) * dotsPerMm,
+            (y + 1) * dotsPerMm,
+            (width - size - 3) * dotsPerMm,
+            size * dotsPerMm,
+        )
+        painter.drawText(
+            textRect,
+            int(Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignTop),
+            "\n".join(text[:30] for text in label.lines),
+        )
+
+
+def writePdf(
+    pages: list[list[Label]], symbols: dict[str, str], path: str, columns: int, rows: int
+) -> list[str]:
+    writer = QPdfWriter(path)
+    writer.setPageSize(QPageSize(QPageSize.PageSizeId.A4))
+    writer.setResolution(300)
+    dotsPerMm = 300 / 25.4
+    painter = QPainter(writer)
+    for pageNumber, page in enumerate(pages):
+        if pageNumber > 0:
+            writer.newPage()
+        paintPage(painter, page, symbols, dotsPerMm, columns, rows)
+    painter.end()
+    return [path]
+
+
+def writePngPages(
+    pages: list[list[Label]], symbols: dict[str, str], path: str, columns: int, rows: int
+) -> list[str]:
+    stem, extension = os.path.splitext(path)
+    dotsPerMm = 150 / 25.4
+    written: list[str] = []
+    for pageNumber, page in enumerate(pages, start=1):
+        image = QImage(
+            int(PAGE_WIDTH * dotsPerMm),
+            int(PAGE_HEIGHT * dotsPerMm),
+            QImage.Format.Format_RGB32,
+        )
+        image.fill(Qt.GlobalColor.white)
+        painter = QPainter(image)
+        paintPage(painter, page, symbols, dotsPerMm, columns, rows)
+        painter.end()
+        pagePath = path if len(pages) == 1 else f"{stem}_{pageNumber}{extension}"
+        image.save(pagePath)
+        written.append(pagePath)
+    return written
+
+
+def writeLabelSheets(
+    labels: list[Label],
+    path: str,
+    columns: int = LABEL_COLUMNS,
+    rows: int = LABEL_ROWS,
+    cacheDir: str = LABEL_CACHE_DIR,
+) -> list[str]:
+    """
+    Lays out the labels on printable A4 sheets.
+    The format is chosen by the file extension: .pdf (one file, multiple pages), .svg or .png (one file per page).
+    PDF and PNG need a running QGuiApplication.
+
+    Returns
+    -------
+    The paths of the written files
+    """
+    symbols = renderSymbols([label.code for label in labels], cacheDir)
+    pages = paginate(labels, columns, rows)
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".svg":
+        return writeSvgPages(pages, symbols, path, columns, rows)
+    if extension == ".pdf":
+        return writePdf(pages, symbols, path, columns, rows)
+    if extension == ".png":
+        return writePngPages(pages, symbols, path, columns, rows)
+    raise ValueError(f"Unbekanntes Format '{extension}', erlaubt sind .pdf, .svg und .png")
+
+
+def showLabelDialog(state: State):
+    """
+    Asks which entries should get labels (the scanned entries or a location with all its children)
+    and where the sheets should be saved, then writes them.
+    """
+    source, ok = QInputDialog.getItem(
+        mainWindow(),
+        "Etiketten drucken",
+        "Etiketten erstellen für:",
+        ["Gescannte Einträge", "Lagerort (inkl. Unterorte)"],
+        editable=False,
+    )
+    if not ok:
+        return
+
+    def save(ids: list[int]):
+        if len(ids) == 0:
+            QMessageBox.information(mainWindow(), "Etiketten", "Keine Einträge ausgewählt.")
+            return
+        path, _ = QFileDialog.getSaveFileName(
+            mainWindow(),
+            "Etiketten speichern",
+            "Etiketten.pdf",
+            "PDF (*.pdf);;SVG (*.svg);;PNG (*.png)",
+        )
+        if path == "":
+            return
+        QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
+        try:
+            written = writeLabelSheets(labelsForIds(state.data, ids), path)
+        finally:
+            QApplication.restoreOverrideCursor()
+        QMessageBox.information(
+            mainWindow(), "Erfolg", f"{len(ids)} Etiketten gespeichert unter {written[0]}"
+        )
+
+    if source == "Gescannte Einträge":
+        save(list(state.data.scannedIDs))
+        return
+
+    picker: QWidget
+
+    def onPicked(location: Location | None):
+        picker.close()
+        if location is not None:
+            save(selectByLocation(state.data, location))
+
+    picker = createLocationPicker(state, onPicked)
+    picker.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
+    picker.setWindowTitle("Lagerort für Etiketten auswählen")
+    picker.show()
+
+
+def main(args: list[str]):
+    import db
+
+    parser = argparse.ArgumentParser(
+        prog="labels.py",
+        description="Erzeugt Etikettenbögen mit Codes für viele Einträge.",
+    )
+    parser.add_argument("database", help="Pfad zur Excel-Datei")
+    parser.add_argument("output", help="Ausgabedatei (.pdf, .svg oder .png)")
+    parser.add_argument(
+        "--location", help='Lagerort inkl. Unterorte, z.B. "Keller > Regal 1"'
+    )
+    parser.add_argument("--ids", help="Komma-getrennte IDs, z.B. 1,2,3")
+    parser.add_argument("--columns", type=int, default=LABEL_COLUMNS)
+    parser.add_argument("--rows", type=int, default=LABEL_ROWS)
+    options = parser.parse_args(args)
+
+    data = db.loadData(options.database)
+    if options.location:
+        location = getLocationFromNames(
+            data.locations, [name.strip() for name in options.location.split(">")]
+        )
+        if location is None:
+            print(f"Lagerort '{options.location}' nicht gefunden")
+            sys.exit(1)
+        ids = selectByLocation(data, location)
+    elif options.ids:
+        ids = [int(id) for id in options.ids.split(",")]
+    else:
+        ids = data.df[ID_COLUMN].tolist()
+
+    # Painting text and images needs an application, also without a window
+    app = QGuiApplication.instance() or QGuiApplication(sys.argv[:1])
+    written = writeLabelSheets(
+        labelsForIds(data, ids), options.output, options.columns, options.rows
+    )
+    print(f"{len(ids)} Etiketten gespeichert: {', '.join(written)}")
+    del app
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
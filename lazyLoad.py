@@ -0,0 +1,141 @@
+import os
+import pickle
+import threading
+from PySide6.QtCore import QObject, Signal
+from PySide6.QtWidgets import QMessageBox
+
+from consts import DESC_COLUMN, STARTUP_CACHE_FILE
+import db
+import remoteBackend
+from state import Data, Settings, State, mainWindow
+
+# Changed when the contents of the cache change, older caches are not used
+CACHE_VERSION = 1
+
+
+def scanColumns(settings: Settings) -> list[str]:
+    """
+    Returns the columns loaded before the scan view opens, besides ``db.KEY_COLUMNS``:
+    the columns shown in the list (``Settings.columns``), only the description if all columns are shown.
+    """
+    return settings.columns if settings.columns is not None else [DESC_COLUMN]
+
+
+def readCache(filePath: str, columns: list[str], cachePath: str = STARTUP_CACHE_FILE) -> Data | None:
+    """
+    Returns the data of the startup cache with only the given columns (``Data.projected``),
+    None if there is no cache for this file, the file changed since the cache was written or the columns differ.
+    """
+    try:
+        with open(cachePath, "rb") as file:
+            cache = pickle.load(file)
+    except Exception:
+        # Missing, broken or written by another version of the program
+        return None
+    if (
+        not isinstance(cache, dict)
+        or cache.get("version") != CACHE_VERSION
+        or cache.get("columns") != columns
+        or cache.get("stamp") is None
+        or cache.get("stamp") != db.fileStamp(filePath)
+    ):
+        return None
+    data = db.newDataFromContents(cache["df"], cache["locations"], cache["info"], cache["stock"])
+    data.fileStamp = cache["stamp"]
+    data.projected = True
+    return data
+
+
+def writeCache(data: Data, columns: list[str], cachePath: str = STARTUP_CACHE_FILE):
+    """
+    Writes the given columns and ``db.KEY_COLUMNS`` of the data to the startup cache, with the stamp of the file it was read from.
+    Does nothing for projected data or data that was not read from a file.
+    Throws an OSError if the cache can not be written.
+    """
+    if data.projected or data.fileStamp is None:
+        return
+    wanted = set(db.KEY_COLUMNS + columns)
+    headers = [header for header in data.dataHeaders if header in wanted]
+    cache = {
+        "version": CACHE_VERSION,
+        "columns": columns,
+        "stamp": data.fileStamp,
+        "df": data.df[headers].copy(),
+        "locations": data.locations,
+        "info": data.info,
+        "stock": data.stock,
+    }
+    temporary = f"{cachePath}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as file:
+        pickle.dump(cache, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary, cachePath)
+
+
+def loadScanReady(settings: Settings) -> Data | None:
+    """
+    Loads only the columns needed to scan (see ``scanColumns()``), from the startup cache if it matches the file.
+    Returns None for a sync server, which always sends all columns.
+    The other columns are loaded afterwards by the ``DetailLoader``.
+    Throws a ValueError if the file could not be read or if the columns are invalid.
+    """
+    if remoteBackend.isRemote(settings.filePath):
+        return None
+    columns = scanColumns(settings)
+    data = readCache(settings.filePath, columns)
+    if data is not None:
+        return data
+    return db.newDataFromExel(settings.filePath, columns)
+
+
+class DetailLoader(QObject):
+    """
+    Loads all columns of the excel file in a background thread, while the scan view already works with the
+    columns needed for scanning (``Data.projected``, see ``loadScanReady()``).
+    The loaded data is applied in the main thread with ``db.applyLoadedData()``,
+    the views update with the ``events.DataReloaded`` event. Afterwards the startup cache is written.
+
+    If the data is saved before the details arrive, ``db.flush()`` loads them itself and the result of the thread is dropped.
+
+    Parameters
+    ----------
+    state : The application state, its data is completed
+    """
+
+    loaded = Signal(object)
+
+    def __init__(self, state: State):
+        super().__init__()
+        self.state = state
+        self.filePath = state.settings.filePath
+        self.loaded.connect(self.apply)
+        self.thread = threading.Thread(target=self.run, name="DetailLoader", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def run(self):
+        # Emitted from the thread, Qt queues the call of ``apply()`` into the main thread
+        try:
+            data = db.newDataFromExel(self.filePath)
+            print(f"[Memory] {db.memoryReport(data.df)}")
+            self.loaded.emit(data)
+        except Exception as e:
+            self.loaded.emit(e)
+
+    def apply(self, result: Data | Exception):
+        data = self.state.data
+        if not data.projected or self.state.settings.filePath != self.filePath:
+            # Already loaded by a save or another file was chosen in the meantime
+            return
+        if isinstance(result, Exception):
+            QMessageBox.warning(
+                mainWindow(),
+                "Fehler",
+                f"Die weiteren Spalten konnten nicht geladen werden: {result}",
+            )
+            return
+        db.applyLoadedData(data, result)
+        try:
+            writeCache(data, scanColumns(self.state.settings))
+        except OSError as e:
+            print(f"Error writing startup cache: {e}")
@@ -30,6 +30,48 @@ def serializeLocations(locatios: list[Location]) -> pd.DataFrame:
     }
     return pd.DataFrame(data)
 
+def mergeLocations(base: list[Location], mine: list[Location], theirs: list[Location]) -> list[Location]:
+    """
+    Merges the locations changed by one user with the locations changed by others in the meantime,
+    both changed from the same locations (base). Like the rows (see ``db.applyChanges()``), only the locations
+    this user added, renamed, moved or removed are taken from it, everything else is kept from the others.
+    If both changed the same location, the change of this user is kept.
+    Locations whose parent was removed by the other side are moved to the top level.
+
+    Parameters
+    ----------
+    base : The locations before this user changed them
+    mine : The locations changed by this user
+    theirs : The current locations, possibly changed by others
+    """
+    def values(location: Location) -> tuple[str, str | None]:
+        return (location.name, location.parent)
+
+    baseById = {location.id: location for location in base}
+    mineById = {location.id: location for location in mine}
+    merged: list[Location] = []
+    for location in theirs:
+        old = baseById.get(location.id)
+        new = mineById.get(location.id)
+        if old is not None and new is None:
+            # Removed by this user
+            continue
+        if new is not None and (old is None or values(new) != values(old)):
+            merged.append(Location(new.name, new.id, new.parent, location.expanded))
+        else:
+            merged.append(location)
+    ids = {location.id for location in merged}
+    for location in mine:
+        old = baseById.get(location.id)
+        if location.id not in ids and (old is None or values(location) != values(old)):
+            # Added by this user, or changed by this user and removed by the others
+            merged.append(location)
+            ids.add(location.id)
+    for location in merged:
+        if location.parent is not None and location.parent not in ids:
+            location.parent = None
+    return merged
+
 def keepTopParents(allLocations: list[Location], selectedLocations: list[Location]) -> list[Location]:
     """
     Returns a copy of the selected locations with only the top most parents.
@@ -93,7 +135,11 @@ def getLocationFromPath(locations: list[Location], path: list[int], parent: Loca
 def getLocationString(locations: list[Location], uid: str) -> str:
     if uid == "":
         return ""
-    strings = getLocationStrings(locations, uid)
+    try:
+        strings = getLocationStrings(locations, uid)
+    except ValueError:
+        # The location was deleted, see ``integrity.checkIntegrity()``
+        return "? (Lagerort nicht gefunden)"
     return " > ".join(strings)
 
 
@@ -118,7 +164,7 @@ def getLocationFromNames(
     if section is not None:
         if len(namePath) == 1:
             return section
-        return getLocationFromNames(locations, namePath[1:], parent)
+        return getLocationFromNames(locations, namePath[1:], section)
     return None
 
 def newLocation(name: str, parent: str | None) -> Location:
@@ -131,6 +177,26 @@ def getChildren(locations: list[Location], parent: Location | str | None) -> lis
         parent = getLocation(locations, parent)
     return [loc for loc in locations if loc.parent and loc.parent == parent.id]
 
+def getSubtreeIds(locations: list[Location], root: Location | str) -> set[str]:
+    """
+    Returns the ids of the root and all its children of any depth.
+    Builds a children lookup once, so this runs in linear time.
+    """
+    rootId = root if isinstance(root, str) else root.id
+    children: dict[str, list[str]] = {}
+    for location in locations:
+        if location.parent is not None:
+            children.setdefault(location.parent, []).append(location.id)
+    subtree: set[str] = set()
+    stack = [rootId]
+    while stack:
+        id = stack.pop()
+        if id in subtree:
+            continue
+        subtree.add(id)
+        stack.extend(children.get(id, []))
+    return subtree
+
 def sortLocations(locations: list[Location], parent: Location | None = None):
     
     def sortComparator(x1: Location, x2: Location):
@@ -144,6 +210,37 @@ def sortLocations(locations: list[Location], parent: Location | None = None):
         out.extend(sortLocations(locations, loc))
     return out
 
+def treeOrder(locations: list[Location]) -> tuple[list[str], dict[str, str]]:
+    """
+    Returns the ids of all locations in the order of the tree, depth first and sorted by name,
+    so every location comes after its parent, and the path of every location with the names of all its parents.
+    Same order as ``sortLocations()``, but in a single pass. Locations containing themselves
+    (see ``integrity.checkIntegrity()``) are left out.
+    """
+    children: dict[str | None, list[Location]] = {}
+    for location in sorted(locations, key=lambda location: location.name.lower()):
+        children.setdefault(location.parent, []).append(location)
+
+    order: list[str] = []
+    paths: dict[str, str] = {}
+    stack: list[tuple[Location, str]] = [(location, "") for location in reversed(children.get(None, []))]
+    while stack:
+        location, parentPath = stack.pop()
+        if location.id in paths:
+            continue
+        paths[location.id] = f"{parentPath} > {location.name}" if parentPath else location.name
+        order.append(location.id)
+        stack.extend((child, paths[location.id]) for child in reversed(children.get(location.id, [])))
+    return order, paths
+
+def locationRanks(locations: list[Location]) -> dict[str, int]:
+    """
+    Returns the position of every location in the order of the tree (see ``treeOrder()``) by location id.
+    Sorting by the rank orders entries along the pick route, from location to location like in the tree view.
+    """
+    order, _ = treeOrder(locations)
+    return {id: rank for rank, id in enumerate(order)}
+
 def isDuplicateNameWithinParent(
     locations: list[Location],
     name: str,
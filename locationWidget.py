@@ -21,15 +21,15 @@ from PySide6.QtCore import (
     QMimeData,
     QPersistentModelIndex,
 )
-from location import getChildren, getLocation, isDuplicateNameWithinParent, keepTopParents, newLocation, sortLocations
+from events import DataReloaded, LocationChanged
+from location import getChildren, getLocation, getSubtreeIds, isDuplicateNameWithinParent, newLocation, sortLocations
 from state import *
 import db
 
 
 class CustomTreeModel(QStandardItemModel):
-    def __init__(self, state: State, onUpdate: Callable[[], None]):
+    def __init__(self, state: State):
         super().__init__()
-        self.onUpdate = onUpdate
         self.state = state
 
     def supportedDropActions(self):
@@ -87,18 +87,14 @@ class CustomTreeModel(QStandardItemModel):
                 return False
 
 
-        # Reloading from File refreshes all references. 
-        # After that line references to location object are invalide
-        # They need to be retrieved by their ids
-        db.reloadFromFile(self.state.data, self.state.settings.filePath)
-        locationsToMove = [getLocation(self.state.data.locations, id) for id in locationIdsToMove]
-        locationsToMove = keepTopParents(self.state.data.locations, locationsToMove)
-        for location in locationsToMove:
-            location.parent = None if parentLocation is None else parentLocation.id
-        db.saveToExel(self.state.data, self.state.settings.filePath)
+        # Expand the target before moving, the tree is redrawn by the LocationChanged event
         if parentLocation:
-            getLocation(self.state.data.locations, parentLocation.id).expanded = True
-        self.onUpdate()
+            parentLocation.expanded = True
+        db.moveLocations(
+            self.state,
+            locationIdsToMove,
+            None if parentLocation is None else parentLocation.id,
+        )
         return True
 
     def flags(self, index: QModelIndex | QPersistentModelIndex):
@@ -121,20 +117,34 @@ def getLocationFromQIndex(locations: list[Location], model: QStandardItemModel,
 def createLocationTree(
     parentItem: QStandardItem | QStandardItemModel,
     locations: list[Location],
-    parent: Location | None = None
+    parent: Location | None = None,
+    index: StockIndex | None = None,
 ):
-    """Recursive function to add sub-locations to the tree view."""
+    """
+    Recursive function to add sub-locations to the tree view.
+    If the stock index is given, the amount of entries stored directly in each location is shown.
+    """
     for location in getChildren(locations, parent):
         locationItem = QStandardItem(location.name)
+        if index is not None:
+            count = len(index.byLocation.get(location.id, {}))
+            if count > 0:
+                locationItem.setText(f"{location.name} ({count})")
+                locationItem.setToolTip(f"{count} Einträge")
         locationItem.setEditable(False)
         # Store the location id as hidden data
         locationItem.setData(location.id, Qt.ItemDataRole.UserRole)
         parentItem.appendRow(locationItem)
-        createLocationTree(locationItem, locations, location)
+        createLocationTree(locationItem, locations, location, index)
 
 
-def updateTreeView(locations: list[Location], treeView: QTreeView, expandLock: Lock):
-    """Function to update the tree view with storage locations."""
+def updateTreeView(
+    locations: list[Location],
+    treeView: QTreeView,
+    expandLock: Lock,
+    index: StockIndex | None = None,
+):
+    """Function to update the tree view with storage locations, see ``createLocationTree()``."""
     locations = sortLocations(locations)
 
     treeModel = treeView.model()
@@ -142,7 +152,7 @@ def updateTreeView(locations: list[Location], treeView: QTreeView, expandLock: L
     treeModel.removeRows(0, treeModel.rowCount())  # Clear model
 
     # Add storage locations as a hierarchical structure (nested)
-    createLocationTree(treeModel, locations)
+    createLocationTree(treeModel, locations, index=index)
     with expandLock:
         restoreExpandedState(locations, treeView, treeModel)
 
@@ -206,7 +216,7 @@ def createTreeView(
     locationWidget.setLayout(locationLayout)
 
     treeView = QTreeView()
-    treeModel = CustomTreeModel(state, lambda: updateTreeView(state.data.locations, treeView, expandLock))
+    treeModel = CustomTreeModel(state)
     treeView.setModel(treeModel)
     # Header for Tree View
     treeView.setAnimated(True)
@@ -259,7 +269,6 @@ def createTreeView(
                 db.addLocation(state, newLocation(newName, None))
             else:
                 db.addLocation(state, newLocation(newName, location.id))
-            updateTreeView(state.data.locations, treeView, expandLock)
 
         addButton.clicked.connect(onAddNewLocation)
 
@@ -267,8 +276,22 @@ def createTreeView(
             location = getCurrentSelectedLocation(state.data.locations, treeView)
             if location is None:
                 return
+            subtree = getSubtreeIds(state.data.locations, location)
+            count = len(db.entriesInSubtree(state.data, location))
+            question = f"Lagerort '{location.name}'"
+            if len(subtree) > 1:
+                question += f" und {len(subtree) - 1} Unterorte"
+            question += " löschen?"
+            if count > 0:
+                if location.parent is None:
+                    question += f"\n\n{count} Teilen wird der Lagerort entfernt."
+                else:
+                    parent = getLocation(state.data.locations, location.parent)
+                    question += f"\n\n{count} Teile werden nach {parent.name} verschoben."
+            answer = QMessageBox.question(locationWidget, "Lagerort löschen", question)
+            if answer != QMessageBox.StandardButton.Yes:
+                return
             db.removeLocation(state, location)
-            updateTreeView(state.data.locations, treeView, expandLock)
 
         deleteButton.clicked.connect(onDeleteLocation)
 
@@ -291,7 +314,6 @@ def createTreeView(
                 )
                 return
             db.renameLocation(state, location, newName)
-            updateTreeView(state.data.locations, treeView, expandLock)
 
         renameButton.clicked.connect(onRenameLocation)
 
@@ -326,7 +348,26 @@ def createTreeView(
 
     # --- Update Tree View with Nested Structure ---
 
-    updateTreeView(state.data.locations, treeView, expandLock)
+    def update():
+        # The picker shows what is stored in each location
+        index = db.stockIndex(state.data) if mode == "picker" else None
+        updateTreeView(state.data.locations, treeView, expandLock, index)
+
+    update()
+
+    # Redraw the tree whenever the locations change, until the widget is destroyed
+    unsubscribers = [
+        state.data.events.subscribe(LocationChanged, lambda _: update()),
+        state.data.events.subscribe(
+            DataReloaded,
+            lambda event: (
+                event.diff.locationsChanged()
+                or (mode == "picker" and (event.diff.rowsChanged() or event.diff.stockChanged))
+            )
+            and update(),
+        ),
+    ]
+    locationWidget.destroyed.connect(lambda: [unsubscribe() for unsubscribe in unsubscribers])
 
     treeView.expanded.connect(lambda: captureExpandedState(state.data.locations, treeView, treeModel, expandLock))
     treeView.collapsed.connect(lambda: captureExpandedState(state.data.locations, treeView, treeModel, expandLock))
@@ -1,4 +1,5 @@
 from PySide6.QtGui import QIcon
+import multiprocessing
 import sys
 from entries import *
 from consts import *
@@ -8,37 +9,90 @@ from manualDisplay import *
 from state import *
 import fileActions as files
 from scanView import createScanView
+from saveScheduler import SaveScheduler
+from reorder import ReorderWatcher
+from pickRoute import PickRoute
+from scanLog import ScanLog
+import lazyLoad
+from startup import Startup, loadDatabase
+import scanServer
+from integrity import checkIntegrity, showIntegrityReport
 
 
 def main():
     # Application Window
     app = QApplication(sys.argv)
+    startup = Startup("assets/logo.png")
     w = QMainWindow()
     w.setWindowTitle("Logistic.01")
     w.setWindowIcon(QIcon("assets/logo.png"))
     setWindow(w)
 
-    settings: Settings = readSettings()
-    
+    settings: Settings = startup.run("Einstellungen", readSettings)
 
     # Entry Point
-    data: Data = files.loadValideExcel(settings)
-    if settings.persistScannedIDs:
-        db.loadIDsAndCount(data, SCANNED_IDS_FILE_PATH)
+    # The database and the list of the last session are read at the same time, each file only once
+    loadingData = startup.start("Datenbank", loadDatabase, settings)
+    loadingIDs = (
+        startup.start("Gescannte Liste", db.readIDsAndCount, SCANNED_IDS_FILE_PATH)
+        if settings.persistScannedIDs
+        else None
+    )
+    try:
+        data: Data = startup.wait(loadingData)
+    except ValueError as e:
+        startup.hide()
+        data = files.showSelectFileDialog(
+            settings, "Exel-Datei auswählen", "Bitte wählen Sie eine gültige Excel-Datei aus.", e.args[0]
+        )
+    integrityReport = startup.run("Prüfung", checkIntegrity, data)
+    if loadingIDs is not None:
+        db.setIDsAndCount(data, startup.wait(loadingIDs))
         db.validateIDs(data)
 
     state = State(data, None, settings, multiplier=1, delMode=False)
+    saveScheduler = SaveScheduler(state)
+    # Before the scan view is created, so the entries below their minimum stock are listed right away
+    reorderWatcher = ReorderWatcher(state.data)
+    # Before the scan view is created as well, so new scans are in place before the table shows them
+    pickRoute = PickRoute(state)
+    # Shown once the splash screen is closed
+    warnings: list[str] = []
+    try:
+        scanLog = startup.run("Scan-Protokoll", ScanLog, state.data)
+    except OSError as e:
+        warnings.append(f"Scan-Protokoll konnte nicht geöffnet werden: {e}")
+    try:
+        startup.run("Scan-Server", scanServer.applySettings, state)
+    except OSError as e:
+        warnings.append(f"Scan-Server konnte nicht gestartet werden: {e}")
 
-    rootWidget = createScanView(state, app, w)
+    rootWidget = startup.run("Oberfläche", createScanView, state, app, w)
     w.setCentralWidget(rootWidget)
 
     w.showMaximized()
+    startup.finish(w)
+    # The other columns arrive while the scan view can already be used
+    if state.data.projected:
+        detailLoader = lazyLoad.DetailLoader(state)
+        detailLoader.start()
+    for warning in warnings:
+        QMessageBox.warning(w, "Fehler", warning)
+    showIntegrityReport(integrityReport, w)
     app.exec()
 
+    scanServer.stopServer()
+    saveScheduler.flush()
+    try:
+        lazyLoad.writeCache(state.data, lazyLoad.scanColumns(state.settings))
+    except OSError as e:
+        print(f"Error writing startup cache: {e}")
     writeSettings(state.settings)
     if settings.persistScannedIDs:
         db.saveScannedIDs(state.data, SCANNED_IDS_FILE_PATH)
 
 
 if __name__ == "__main__":
+    # Needed for the worker processes of the label generator in the packaged exe
+    multiprocessing.freeze_support()
     main()
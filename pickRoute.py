@@ -0,0 +1,140 @@
+from bisect import bisect_right
+
+import db
+from events import (
+    DataReloaded,
+    LocationChanged,
+    ModeChanged,
+    RowEdited,
+    RowsEdited,
+    ScanAdded,
+    ScanRemoved,
+    ScansCleared,
+    ScansReordered,
+)
+from location import locationRanks
+from state import State
+
+
+class PickRoute:
+    """
+    Sorts the list of scanned entries along the pick route while ``Settings.sortByLocation`` is set,
+    so the list can be collected or restocked in one walk through the locations, in the order of the tree view.
+    Entries stored in several locations are sorted by the first of their locations on the route,
+    entries without a location come last. Entries in the same location keep the order they were scanned in.
+    When the sorting is turned off, the list is back in the order it was scanned in.
+
+    The rank of every location and the sort key of every listed entry are computed once and reused,
+    so placing a new scan is a binary search and does not sort the list again.
+    The keys are only computed again for edited entries, and all of them after the locations changed.
+
+    Must be created before the scan view, so new scans are placed before the table shows them.
+
+    Parameters
+    ----------
+    state : The application state
+    """
+
+    def __init__(self, state: State):
+        self.state = state
+        data = state.data
+        self.ranks = locationRanks(data.locations)
+        # Sort keys of the listed entries by id, see ``key()``
+        self.keys: dict[int, tuple[int, int]] = {}
+        # When the entries were scanned, to restore the order of the scans
+        self.sequence: dict[int, int] = {id: number for number, id in enumerate(data.scannedIDs)}
+        self.nextSequence = len(self.sequence)
+        self.sorted = False
+
+        data.events.subscribe(ScanAdded, self.onScanAdded)
+        data.events.subscribe(ScanRemoved, lambda event: self.forget(event.id))
+        data.events.subscribe(ScansCleared, lambda _: self.clear())
+        data.events.subscribe(RowEdited, lambda event: self.onEdited({event.id}))
+        data.events.subscribe(RowsEdited, lambda event: self.onEdited(event.ids))
+        data.events.subscribe(LocationChanged, lambda _: self.onLocationsChanged())
+        data.events.subscribe(DataReloaded, self.onDataReloaded)
+        data.events.subscribe(ModeChanged, lambda _: self.onModeChanged())
+        self.sort()
+
+    def key(self, id: int) -> tuple[int, int]:
+        """
+        Returns the rank of the first location of the entry on the route and when it was scanned.
+        """
+        if id not in self.keys:
+            ranks = [
+                self.ranks[location]
+                for location in db.stockIndex(self.state.data).locationsOf(id)
+                if location in self.ranks
+            ]
+            self.keys[id] = (
+                min(ranks, default=len(self.ranks)),
+                self.sequence.get(id, self.nextSequence),
+            )
+        return self.keys[id]
+
+    def sort(self):
+        """
+        Sorts the whole list along the route or by the order of the scans, depending on the settings.
+        """
+        data = self.state.data
+        self.sorted = self.state.settings.sortByLocation
+        if self.sorted:
+            ordered = sorted(data.scannedIDs, key=self.key)
+        else:
+            ordered = sorted(
+                data.scannedIDs, key=lambda id: self.sequence.get(id, self.nextSequence)
+            )
+        if ordered != data.scannedIDs:
+            data.scannedIDs[:] = ordered
+            data.events.emit(ScansReordered())
+
+    def onScanAdded(self, event: ScanAdded):
+        data = self.state.data
+        if event.id not in self.sequence:
+            self.sequence[event.id] = self.nextSequence
+            self.nextSequence += 1
+        self.keys.pop(event.id, None)
+        if not self.sorted:
+            return
+        # The new entry was appended, the entries before it are already sorted
+        data.scannedIDs.remove(event.id)
+        index = bisect_right(data.scannedIDs, self.key(event.id), key=self.key)
+        data.scannedIDs.insert(index, event.id)
+
+    def onModeChanged(self):
+        if self.sorted != self.state.settings.sortByLocation:
+            self.sort()
+
+    def forget(self, id: int):
+        self.keys.pop(id, None)
+        self.sequence.pop(id, None)
+
+    def clear(self):
+        self.keys.clear()
+        self.sequence.clear()
+
+    def onEdited(self, ids: set[int]):
+        listed = ids & set(self.state.data.scannedIDs)
+        if not listed:
+            return
+        for id in listed:
+            self.keys.pop(id, None)
+        if self.sorted:
+            self.sort()
+
+    def onLocationsChanged(self):
+        self.ranks = locationRanks(self.state.data.locations)
+        self.keys.clear()
+        if self.sorted:
+            self.sort()
+
+    def onDataReloaded(self, event: DataReloaded):
+        diff = event.diff
+        if diff.locationsChanged():
+            self.ranks = locationRanks(self.state.data.locations)
+        if diff.structural or diff.locationsChanged() or diff.stockChanged:
+            self.keys.clear()
+        else:
+            for id in diff.changedIDs | diff.removedIDs:
+                self.keys.pop(id, None)
+        self.sort()
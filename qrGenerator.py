@@ -1,6 +1,8 @@
 import sys
 import segno
 
+from scanPayload import ScanItem, encodePayload, parseItem
+
 def generate_data_matrix(data: str):
     """
     Generates a Data Matrix code
@@ -12,6 +14,15 @@ def generate_data_matrix(data: str):
     # code for saving: data_matrix.save(filename, scale=10)
     return data_matrix
 
+def generate_item_code(items: list[ScanItem]):
+    """
+    Generates a code that adds all items with their quantities with a single scan, e.g. for a kit.
+
+    param items: the entries and their quantities
+    return: Micro QR Code if the payload fits, otherwise a normal QR Code
+    """
+    return segno.make(encodePayload(items))
+
 if __name__ == "__main__":
     name = input("Namen des QR-Codes eingeben: ")
     match len(sys.argv):
@@ -25,4 +36,11 @@ if __name__ == "__main__":
             filehandle.save(name, scale=10)
             print(f"QR-Code für '{sys.argv[1]}' gespeichert als {name}")
         case _:
-            print("Ungültige Anzahl an Argumenten")
+            # Kit: python qrGenerator.py [code]*[Anzahl] [code]*[Anzahl] ...
+            items = [parseItem(arg) for arg in sys.argv[1:]]
+            if None in items:
+                print("Ungültige Angabe, Format: [code]*[Anzahl]")
+                sys.exit(1)
+            filehandle = generate_item_code(items)  # type: ignore
+            filehandle.save(name, scale=10)
+            print(f"QR-Code für {len(items)} Einträge gespeichert als {name}")
@@ -0,0 +1,155 @@
+import http.client
+import json
+import threading
+from typing import Any
+from urllib.parse import quote, urlsplit
+
+# Paths starting with this are the address of a sync server instead of an excel file
+REMOTE_PREFIX = "http://"
+
+
+def isRemote(path: str) -> bool:
+    """
+    Returns whether the path is the address of a sync server (see the ``syncServer`` module).
+    """
+    return path.startswith(REMOTE_PREFIX)
+
+
+class RemoteBackend:
+    """
+    Client for a sync server, used by the ``db`` module when the file path is the address of a server.
+
+    The connection is kept open and reused for every request.
+    The version of the last loaded snapshot is remembered, so reloading without changes on the server
+    costs a single small request.
+
+    Parameters
+    ----------
+    url : The address of the server, e.g. "http://192.168.0.10:8770"
+    timeout : Seconds to wait for an answer
+    """
+
+    def __init__(self, url: str, timeout: float = 30):
+        address = urlsplit(url)
+        if address.hostname is None:
+            raise ValueError(f"Ungültige Server-Adresse: {url}")
+        self.host = address.hostname
+        self.port = address.port or 80
+        self.timeout = timeout
+        # Version of the data this client has seen last, -1 if it has not loaded anything yet
+        self.version = -1
+        self.connection: http.client.HTTPConnection | None = None
+        # The save scheduler and the scan server can use the backend at the same time
+        self.lock = threading.Lock()
+
+    def request(
+        self, method: str, path: str, body: Any = None, headers: dict[str, str] = {}
+    ) -> tuple[int, Any]:
+        """
+        Sends a request and returns the status and the decoded JSON answer (None if there is none).
+        A broken connection is reopened once, e.g. after the server was restarted.
+
+        Throws a ValueError if the server can not be reached.
+        """
+        payload = None if body is None else json.dumps(body).encode("utf-8")
+        sendHeaders = dict(headers)
+        if payload is not None:
+            sendHeaders["Content-Type"] = "application/json"
+        with self.lock:
+            for attempt in range(2):
+                if self.connection is None:
+                    self.connection = http.client.HTTPConnection(
+                        self.host, self.port, timeout=self.timeout
+                    )
+                try:
+                    self.connection.request(method, path, payload, sendHeaders)
+                    response = self.connection.getresponse()
+                    content = response.read()
+                    break
+                except (OSError, http.client.HTTPException) as e:
+                    self.connection.close()
+                    self.connection = None
+                    if attempt == 1:
+                        raise ValueError(f"Server {self.host}:{self.port} nicht erreichbar: {e}")
+        answer = json.loads(content) if content else None
+        if response.status >= 400 and response.status != 404:
+            message = answer.get("error") if isinstance(answer, dict) else None
+            raise ValueError(f"Server-Fehler {response.status}: {message}")
+        return response.status, answer
+
+    def fetchSnapshot(self, onlyIfChanged: bool = True) -> dict[str, Any] | None:
+        """
+        Loads all data from the server, see ``syncServer.SyncStore.snapshot()``.
+        Returns None if ``onlyIfChanged`` is set and nothing changed since the last snapshot.
+        """
+        headers = {}
+        if onlyIfChanged and self.version >= 0:
+            headers["If-None-Match"] = str(self.version)
+        status, answer = self.request("GET", "/data", headers=headers)
+        if status == 304:
+            return None
+        self.version = answer["version"]
+        return answer
+
+    def pushRows(
+        self,
+        headers: list[str],
+        rows: list[list[Any]],
+        deleted: list[int],
+        base: dict[int, list[Any] | None],
+    ) -> list[dict[str, Any]]:
+        """
+        Sends changed and new rows, the ids of deleted rows and the values the rows had when they were loaded
+        to the server. The server merges them with the changes of other clients.
+        Returns the conflicts, in the format of ``state.RowConflict``.
+        """
+        answer = self.__push(
+            "/rows", {"headers": headers, "rows": rows, "deleted": deleted, "base": base}
+        )
+        return answer.get("conflicts", [])
+
+    def pushLocations(self, locations: list[dict[str, Any]], base: list[dict[str, Any]] | None):
+        """
+        Sends the changed locations and the locations before the change to the server, in the format of
+        ``location.serializeLocations()``. The server merges them with the changes of other clients
+        (see ``location.mergeLocations()``), without a base they replace the locations on the server.
+        """
+        self.__push("/locations", {"locations": locations, "base": base})
+
+    def pushStock(self, rows: list[list[Any]], base: list[list[Any]] | None):
+        """
+        Sends the further locations of entries and the ones before the change to the server,
+        rows with the columns ``consts.STOCK_COLUMNS``. Merged like the locations, see ``db.mergeStock()``.
+        """
+        self.__push("/stock", {"rows": rows, "base": base})
+
+    def lookup(self, code: str) -> list[Any] | None:
+        """
+        Returns the values of the entry with the code, None if there is none.
+        """
+        status, answer = self.request("GET", f"/lookup?code={quote(code)}")
+        if status == 404:
+            return None
+        return answer["row"]
+
+    def __push(self, path: str, body: dict[str, Any]) -> dict[str, Any]:
+        body["baseVersion"] = self.version
+        _, answer = self.request("POST", path, body)
+        # If nobody else changed something in between, the local data matches the new version.
+        # Otherwise the old version is kept, so the next reload loads the changes of the others.
+        if answer["previousVersion"] == self.version:
+            self.version = answer["version"]
+        return answer
+
+
+backends: dict[str, RemoteBackend] = {}
+
+
+def connect(url: str) -> RemoteBackend:
+    """
+    Returns the backend for the server, every server has one connection that is reused.
+    """
+    url = url.rstrip("/")
+    if url not in backends:
+        backends[url] = RemoteBackend(url)
+    return backends[url]
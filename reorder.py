@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+
+from consts import ID_COLUMN, MIN_AMOUNT_COLUMN, STORED_AMOUNT_COLUMN
+from events import DataReloaded, RowDeleted, RowEdited, RowsAdded, RowsEdited, ScanAdded
+from state import Data
+
+
+def numbers(df: pd.DataFrame, column: str) -> np.ndarray:
+    """
+    Returns the values of the column as numbers, values that are not a number are 0.
+    Edited rows store their values as text, so the column is converted only if it is not numeric already.
+    """
+    if column not in df.columns:
+        return np.zeros(len(df), dtype=np.int64)
+    values = df[column]
+    if not pd.api.types.is_numeric_dtype(values):
+        values = pd.to_numeric(values, errors="coerce")
+    return values.fillna(0).to_numpy(dtype=np.int64)
+
+
+def storedAmounts(data: Data) -> np.ndarray:
+    """
+    Returns the pieces of every entry in the order of the data, including the pieces in further locations (``Data.stock``).
+    """
+    df = data.df
+    stored = numbers(df, STORED_AMOUNT_COLUMN)
+    if not data.stock.empty:
+        further = data.stock.groupby(ID_COLUMN)[STORED_AMOUNT_COLUMN].sum()
+        ids = df[ID_COLUMN].to_numpy(dtype=np.int64)
+        stored = stored + further.reindex(ids, fill_value=0).to_numpy(dtype=np.int64)
+    return stored
+
+
+def belowMinimum(data: Data) -> "pd.Series[int]":
+    """
+    Returns the entries with less pieces than their minimum stock (``consts.MIN_AMOUNT_COLUMN``)
+    and how many are missing to reach it, by entry id.
+    The pieces in further locations (``Data.stock``) are counted as well.
+
+    All entries are compared at once, so this takes a few milliseconds even for 100k entries.
+    """
+    df = data.df
+    if MIN_AMOUNT_COLUMN not in df.columns:
+        return pd.Series(dtype=np.int64)
+    ids = df[ID_COLUMN].to_numpy(dtype=np.int64)
+    minimum = numbers(df, MIN_AMOUNT_COLUMN)
+    missing = minimum - storedAmounts(data)
+    below = (minimum > 0) & (missing > 0)
+    return pd.Series(missing[below], index=ids[below])
+
+
+class ReorderWatcher:
+    """
+    Puts the entries below their minimum stock on the list of scanned entries, which is exported as the shopping list.
+    The count is the amount missing to reach the minimum stock.
+
+    The entries are checked on creation and after every change of the data (edit, import, stock-taking, delete, reload).
+    Entries added by the watcher are updated when the missing amount changes and removed again when they are restocked.
+    Entries scanned by the user, or whose count the user changed, are never changed.
+    Entries the user removed from the list are not added again until they were restocked.
+
+    Parameters
+    ----------
+    data : The data to watch
+    """
+
+    def __init__(self, data: Data):
+        self.data = data
+        # The count suggested for every entry added by the watcher
+        self.suggested: dict[int, int] = {}
+        # Entries removed from the list by the user, while they are below their minimum stock
+        self.dismissed: set[int] = set()
+        for eventType in [RowEdited, RowsEdited, RowsAdded, RowDeleted, DataReloaded]:
+            data.events.subscribe(eventType, lambda _: self.update())
+        self.update()
+
+    def update(self):
+        """
+        Checks all entries and updates the list of scanned entries.
+        """
+        data = self.data
+        missing = belowMinimum(data)
+        suggestions = dict(zip(missing.index.tolist(), missing.tolist()))
+
+        for id, count in list(self.suggested.items()):
+            if data.scanCount(id) != count:
+                # Changed or removed by the user
+                del self.suggested[id]
+                if id not in data.scannedIDs:
+                    self.dismissed.add(id)
+            elif id not in suggestions:
+                del self.suggested[id]
+                data.removeId(id)
+
+        for id, count in suggestions.items():
+            if id in self.suggested:
+                data.setScanCount(id, count)
+                self.suggested[id] = count
+            elif id not in data.scannedIDs and id not in self.dismissed:
+                data.scannedIDs.append(id)
+                data.anzahlScannedItems[id] = count
+                self.suggested[id] = count
+                data.events.emit(ScanAdded(id))
+        self.dismissed &= suggestions.keys()
@@ -0,0 +1,244 @@
+import argparse
+import os
+import sys
+from PySide6.QtCore import Qt
+from PySide6.QtWidgets import (
+    QFileDialog,
+    QHBoxLayout,
+    QHeaderView,
+    QMessageBox,
+    QPushButton,
+    QSpacerItem,
+    QSizePolicy,
+    QTreeWidget,
+    QTreeWidgetItem,
+    QVBoxLayout,
+    QWidget,
+)
+import pandas as pd
+
+from consts import (
+    ID_COLUMN,
+    LOCATION_COLUMN,
+    LOCATION_ID_COLUMN,
+    LOCATION_NAME_COLUMN,
+    LOCATION_PARENT_COLUMN,
+    STORED_AMOUNT_COLUMN,
+)
+import db
+from location import treeOrder
+from state import Data, State, mainWindow
+
+# Columns of the report, the location id and parent are only needed to show it as a tree
+REPORT_PATH_COLUMN = "Lagerort"
+REPORT_ENTRIES_COLUMN = "Einträge"
+REPORT_AMOUNT_COLUMN = "Stückzahl"
+REPORT_TOTAL_ENTRIES_COLUMN = "Einträge inkl. Unterorte"
+REPORT_TOTAL_AMOUNT_COLUMN = "Stückzahl inkl. Unterorte"
+REPORT_EXPORT_COLUMNS = [
+    REPORT_PATH_COLUMN,
+    REPORT_ENTRIES_COLUMN,
+    REPORT_AMOUNT_COLUMN,
+    REPORT_TOTAL_ENTRIES_COLUMN,
+    REPORT_TOTAL_AMOUNT_COLUMN,
+]
+REPORT_COLUMNS = [LOCATION_ID_COLUMN, LOCATION_PARENT_COLUMN, LOCATION_NAME_COLUMN] + REPORT_EXPORT_COLUMNS
+
+NO_LOCATION = "(ohne Lagerort)"
+UNKNOWN_LOCATION = "? (Lagerort nicht gefunden)"
+
+
+def locationReport(data: Data) -> pd.DataFrame:
+    """
+    Computes how many entries and pieces are stored in every location, directly and including all its children.
+
+    The amounts per location are computed with a single groupby over all locations of all entries
+    (see ``db.placements()``), then they are added up from the children to the parents in one pass over the tree.
+    Apart from sorting the names, this takes linear time in the rows plus the locations.
+    An entry stored in several children is counted once per child in the totals of the parent.
+
+    Parameters
+    ----------
+    data : The data to report on
+
+    Returns
+    -------
+    One row per location in the order of the tree (``REPORT_COLUMNS``), the path contains the names of all parents.
+    Entries without a location or with a deleted location are in extra rows at the end.
+    """
+    placed = db.placements(data)
+    direct = placed.groupby(LOCATION_COLUMN).agg(
+        entries=(ID_COLUMN, "nunique"), amount=(STORED_AMOUNT_COLUMN, "sum")
+    )
+    directEntries: dict[str, int] = direct["entries"].to_dict()
+    directAmounts: dict[str, int] = direct["amount"].to_dict()
+
+    order, paths = treeOrder(data.locations)
+    names = {location.id: location.name for location in data.locations}
+    parents = {location.id: location.parent for location in data.locations}
+
+    totalEntries = {id: directEntries.get(id, 0) for id in order}
+    totalAmounts = {id: directAmounts.get(id, 0) for id in order}
+    for id in reversed(order):
+        parent = parents[id]
+        if parent in totalEntries:
+            totalEntries[parent] += totalEntries[id]
+            totalAmounts[parent] += totalAmounts[id]
+
+    rows = [
+        [
+            id,
+            parents[id] or "",
+            names[id],
+            paths[id],
+            directEntries.get(id, 0),
+            directAmounts.get(id, 0),
+            totalEntries[id],
+            totalAmounts[id],
+        ]
+        for id in order
+    ]
+    known = set(names)
+    unknown = placed[~placed[LOCATION_COLUMN].isin(known) & (placed[LOCATION_COLUMN] != "")]
+    for name, rowsOfLocation in [
+        (NO_LOCATION, placed[placed[LOCATION_COLUMN] == ""]),
+        (UNKNOWN_LOCATION, unknown),
+    ]:
+        if rowsOfLocation.empty:
+            continue
+        entries = int(rowsOfLocation[ID_COLUMN].nunique())
+        amount = int(rowsOfLocation[STORED_AMOUNT_COLUMN].sum())
+        rows.append(["", "", name, name, entries, amount, entries, amount])
+    return pd.DataFrame(rows, columns=REPORT_COLUMNS)
+
+
+def writeReport(report: pd.DataFrame, path: str):
+    """
+    Writes the report to an excel (.xlsx) or CSV (.csv) file, depending on the extension.
+    Throws a ValueError for other extensions.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    report = report[REPORT_EXPORT_COLUMNS]
+    if extension == ".xlsx":
+        report.to_excel(path, index=False)  # type: ignore
+    elif extension == ".csv":
+        # Semicolons and a BOM, so Excel opens it correctly with German settings
+        report.to_csv(path, index=False, sep=";", encoding="utf-8-sig")
+    else:
+        raise ValueError(f"Unbekanntes Dateiformat: {extension}")
+
+
+def fillReportTree(tree: QTreeWidget, report: pd.DataFrame):
+    """
+    Shows the report as a tree, every location below its parent.
+    """
+    tree.clear()
+    items: dict[str, QTreeWidgetItem] = {}
+    for row in report.to_dict("records"):
+        values = [
+            row[LOCATION_NAME_COLUMN],
+            str(row[REPORT_ENTRIES_COLUMN]),
+            str(row[REPORT_AMOUNT_COLUMN]),
+            str(row[REPORT_TOTAL_ENTRIES_COLUMN]),
+            str(row[REPORT_TOTAL_AMOUNT_COLUMN]),
+        ]
+        parent = items.get(row[LOCATION_PARENT_COLUMN])
+        item = QTreeWidgetItem(parent, values) if parent is not None else QTreeWidgetItem(values)
+        for column in range(1, len(values)):
+            item.setTextAlignment(column, Qt.AlignmentFlag.AlignRight)
+        if parent is None:
+            tree.addTopLevelItem(item)
+        if row[LOCATION_ID_COLUMN] != "":
+            items[row[LOCATION_ID_COLUMN]] = item
+    tree.expandAll()
+
+
+def showReport(state: State):
+    """
+    Shows how many entries and pieces are stored in every location in a new window, with an export to excel or CSV.
+    """
+    report = locationReport(state.data)
+
+    window = QWidget(mainWindow(), Qt.WindowType.Window)
+    window.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
+    window.setWindowTitle("Bestand je Lagerort")
+    window.resize(700, 500)
+    layout = QVBoxLayout()
+    window.setLayout(layout)
+
+    tree = QTreeWidget()
+    tree.setHeaderLabels(
+        [
+            REPORT_PATH_COLUMN,
+            REPORT_ENTRIES_COLUMN,
+            REPORT_AMOUNT_COLUMN,
+            REPORT_TOTAL_ENTRIES_COLUMN,
+            REPORT_TOTAL_AMOUNT_COLUMN,
+        ]
+    )
+    tree.header().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+    layout.addWidget(tree)
+    fillReportTree(tree, report)
+
+    buttonLayout = QHBoxLayout()
+    buttonLayout.addItem(
+        QSpacerItem(20, 0, QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Minimum)
+    )
+    refreshButton = QPushButton("Aktualisieren")
+    buttonLayout.addWidget(refreshButton)
+    exportButton = QPushButton("Exportieren")
+    buttonLayout.addWidget(exportButton)
+    layout.addLayout(buttonLayout)
+
+    def refresh():
+        nonlocal report
+        report = locationReport(state.data)
+        fillReportTree(tree, report)
+
+    def export():
+        path, _ = QFileDialog.getSaveFileName(
+            window, "Bestand exportieren", "Bestand.xlsx", "Excel (*.xlsx);;CSV (*.csv)"
+        )
+        if path == "":
+            return
+        try:
+            writeReport(report, path)
+        except (ValueError, OSError) as e:
+            QMessageBox.warning(window, "Fehler", f"Bestand konnte nicht gespeichert werden: {e}")
+            return
+        QMessageBox.information(window, "Erfolg", f"Bestand gespeichert unter {path}")
+
+    refreshButton.clicked.connect(refresh)
+    exportButton.clicked.connect(export)
+    window.show()
+
+
+def main(args: list[str]):
+    parser = argparse.ArgumentParser(
+        prog="reports.py",
+        description="Zeigt, wie viele Einträge und Teile in jedem Lagerort (inkl. Unterorte) liegen.",
+    )
+    parser.add_argument("database", help="Pfad zur Excel-Datei")
+    parser.add_argument("output", nargs="?", help="Ausgabedatei (.xlsx oder .csv), sonst Ausgabe in der Konsole")
+    options = parser.parse_args(args)
+
+    try:
+        # Only the locations and amounts are needed
+        report = locationReport(db.loadData(options.database, columns=[]))
+    except ValueError as e:
+        print(f"[Error] {e.args[0]}")
+        return 1
+    if options.output is None:
+        print(report[REPORT_EXPORT_COLUMNS].to_string(index=False))
+        return 0
+    try:
+        writeReport(report, options.output)
+    except ValueError as e:
+        print(f"[Error] {e.args[0]}")
+        return 1
+    print(f"Bestand gespeichert unter {options.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,68 @@
+from PySide6.QtCore import QTimer
+from PySide6.QtWidgets import QMessageBox
+
+from consts import SAVE_IDLE_MS
+import db
+from events import SaveConflicts
+from state import RowConflict, State, mainWindow
+
+
+class SaveScheduler:
+    """
+    Coalesces writes to the database.
+
+    ``db.Row.write()`` and ``db.Row.delete()`` only mark the data as dirty.
+    The scheduler writes all pending changes at once, after ``idleMs`` milliseconds without a new change.
+    ``db.markDirty()`` flushes earlier if too many changes are pending (``consts.SAVE_MAX_MUTATIONS``).
+    Call ``SaveScheduler.flush()`` before exiting or when the changes need to be visible to other users right away.
+    Conflicts with changes of other users found while writing are shown to the user.
+
+    Parameters
+    ----------
+    state : The application state, the file path is read from its settings on every flush
+    idleMs : Milliseconds without a change before the pending changes are written
+    """
+
+    def __init__(self, state: State, idleMs: int = SAVE_IDLE_MS):
+        self.state = state
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(idleMs)
+        self.timer.timeout.connect(self.flush)
+        state.data.pending.onDirty = self.timer.start
+        state.data.events.subscribe(
+            SaveConflicts, lambda event: showSaveConflicts(event.conflicts)
+        )
+
+    def flush(self):
+        """
+        Writes all pending changes to the database.
+        If writing fails (e.g. the file is opened by another program), it is tried again after the idle window.
+        """
+        self.timer.stop()
+        try:
+            db.flush(self.state.data, self.state.settings.filePath)
+        except Exception as e:
+            print(f"[Error] Could not write pending changes: {e}")
+            self.timer.start()
+
+
+def showSaveConflicts(conflicts: list[RowConflict]):
+    """
+    Tells the user which entries were also changed by another user.
+    """
+    lines: list[str] = []
+    for conflict in conflicts:
+        if conflict.deletedByOthers:
+            lines.append(f"ID {conflict.id}: von jemand anderem gelöscht, Ihre Änderung wurde wieder hinzugefügt")
+        elif conflict.deletedHere:
+            lines.append(f"ID {conflict.id}: von jemand anderem geändert, wurde aber von Ihnen gelöscht")
+        else:
+            lines.append(f"ID {conflict.id}: {', '.join(conflict.columns)}")
+    QMessageBox.warning(
+        mainWindow(),
+        "Gleichzeitige Änderungen",
+        "Folgende Einträge wurden gleichzeitig von jemand anderem geändert. "
+        "Ihre Werte wurden gespeichert, bitte prüfen Sie die Einträge:\n\n"
+        + "\n".join(lines),
+    )
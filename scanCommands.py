@@ -0,0 +1,206 @@
+from dataclasses import dataclass, field
+import os
+from typing import Callable
+import webbrowser
+from PySide6.QtWidgets import QMessageBox
+
+import db
+from events import ScanProcessed
+import inventory
+from scanLog import localStation
+from scanPayload import ScanItem, parsePayload
+from state import State, mainWindow
+
+
+@dataclass
+class ScanCommand:
+    """
+    A special code that is handled by ``scanCommands.dispatch()``, registered with ``scanCommand()``.
+
+    Parameters
+    ----------
+    name : Name of the command, shown in error messages
+    matches : Returns true if the scanned code is this command
+    run : Executes the command for the scanned code
+    remote : Whether the command can be scanned at other stations (see the ``scanServer`` module)
+    """
+
+    name: str
+    matches: Callable[[str], bool]
+    run: Callable[[State, str], None]
+    remote: bool = True
+
+
+@dataclass
+class ScanResult:
+    """
+    What a scanned code did, returned by ``scanCommands.dispatch()``.
+
+    Parameters
+    ----------
+    command : Name of the special code that was executed, None if the code contained entries
+    ids : IDs of the scanned entries
+    missing : Codes without an entry
+    error : Why the code could not be handled
+    """
+
+    command: str | None = None
+    ids: list[int] = field(default_factory=list)
+    missing: list[str] = field(default_factory=list)
+    error: str | None = None
+
+
+# The commands are tried in the order they are registered, the first matching one is executed
+commands: list[ScanCommand] = []
+
+
+def scanCommand(
+    name: str, exact: str | None = None, prefix: str | None = None, remote: bool = True
+) -> Callable[[Callable[[State, str], None]], Callable[[State, str], None]]:
+    """
+    Registers the decorated function as a special code.
+
+    Parameters
+    ----------
+    name : Name of the command
+    exact : The command matches only this code
+    prefix : The command matches every code starting with this prefix, the function gets the rest of the code
+    remote : Whether the command can be scanned at other stations
+    """
+
+    def register(run: Callable[[State, str], None]) -> Callable[[State, str], None]:
+        if exact is not None:
+            commands.append(ScanCommand(name, lambda code: code == exact, run, remote))
+        elif prefix is not None:
+            commands.append(
+                ScanCommand(
+                    name,
+                    lambda code: code.startswith(prefix),
+                    lambda state, code: run(state, code[len(prefix) :]),
+                    remote,
+                )
+            )
+        else:
+            raise ValueError("Either exact or prefix has to be given")
+        return run
+
+    return register
+
+
+def dispatch(
+    state: State, code: str, interactive: bool = True, station: str | None = None
+) -> ScanResult:
+    """
+    Executes the special code that matches the scanned code,
+    otherwise the code is treated as a payload of entries (see ``scanPayload.parsePayload()``).
+
+    Parameters
+    ----------
+    state : State of the application
+    code : The scanned code
+    interactive : Whether problems are shown in a message box. Codes from other stations are not interactive,
+        their problems are only returned and special codes with ``remote=False`` are refused.
+    station : Where the code was scanned, for the scan log. None for this computer.
+    """
+    code = code.strip()
+    if code == "":
+        return ScanResult(error="Leerer Code")
+    for command in commands:
+        if command.matches(code):
+            result = ScanResult(command=command.name)
+            if not interactive and not command.remote:
+                result.error = f"'{command.name}' kann nur am Gerät selbst gescannt werden"
+                return result
+            try:
+                command.run(state, code)
+            except ValueError as e:
+                result.error = f"Code '{code}' ungültig ({command.name}): {e}"
+                if interactive:
+                    QMessageBox.warning(mainWindow(), "Warnung", result.error)  # type: ignore
+            return result
+    return addItems(state, parsePayload(code), interactive, station)
+
+
+@scanCommand("Multiplikator", prefix="multby")
+def setMultiplier(state: State, number: str):
+    state.setMultiplier(int(number))
+
+
+# Because of a typo when creating the QR-Code
+scanCommand("Multiplikator", prefix="multbz")(setMultiplier)
+
+
+@scanCommand("Löschmodus", exact="delete")
+def toggleDelMode(state: State, code: str):
+    state.setDelMode(not state.delMode)
+
+
+# Finishing asks whether the counted amounts are saved, so it can only be scanned at the station itself
+@scanCommand("Inventur", exact="inventory", remote=False)
+def toggleInventory(state: State, code: str):
+    inventory.toggleInventory(state)
+
+
+@scanCommand("easterEgg", exact="easterEgg", remote=False)
+def easterEgg(state: State, code: str):
+    os.system("shutdown -s")
+
+
+@scanCommand("easterEgg2", exact="easterEgg2", remote=False)
+def easterEgg2(state: State, code: str):
+    webbrowser.open("https://www.youtube.com/watch?v=xvFZjo5PgG0")
+
+
+def addItems(
+    state: State, items: list[ScanItem], interactive: bool = True, station: str | None = None
+) -> ScanResult:
+    """
+    Adds the quantity times the multiplier of every item to the list of scanned IDs,
+    or removes the items in delete mode.
+    During a stock-taking the pieces are counted instead (see the ``inventory`` module), delete mode subtracts them.
+    All codes are looked up at once. Codes that are not found are reported in a single warning.
+    Every processed item is announced with an ``events.ScanProcessed`` for the scan log.
+    """
+    if station is None:
+        station = localStation()
+    result = ScanResult()
+    ids = db.idsForCodes(state.data, [item.code for item in items])
+    for item in items:
+        id = ids.get(item.code)
+        if id is None:
+            continue
+        if state.inventory is not None:
+            quantity = item.quantity * state.multiplier
+            inventory.countItem(state, id, -quantity if state.delMode else quantity)
+            result.ids.append(id)
+            state.data.events.emit(
+                ScanProcessed(
+                    id,
+                    -quantity if state.delMode else quantity,
+                    "uncount" if state.delMode else "count",
+                    station,
+                )
+            )
+            continue
+        dataRow = db.newRow(state.data, id)
+        before = dataRow.scanCount
+        if state.delMode:
+            dataRow.scanCount = 0
+        else:
+            dataRow.scanCount += item.quantity * state.multiplier
+        dataRow.writeNoValues(state.data)
+        result.ids.append(id)
+        state.data.events.emit(
+            ScanProcessed(
+                id, dataRow.scanCount - before, "delete" if state.delMode else "add", station
+            )
+        )
+
+    result.missing = [item.code for item in items if item.code not in ids]
+    if result.missing and interactive:
+        QMessageBox.warning(
+            mainWindow(),
+            "Warnung",
+            f"Eintrag '{', '.join(result.missing)}' nicht gefunden!",  # type: ignore
+        )
+    return result
@@ -0,0 +1,251 @@
+import os
+import socket
+import time
+import numpy as np
+import pandas as pd
+
+from consts import ID_COLUMN, SCAN_LOG_DIR, SCAN_LOG_KEEP_DAYS, SCAN_LOG_SEGMENT_ROWS
+from events import ScanProcessed
+from state import Data
+
+# Columns of the loaded log, the time is in seconds since 1970 (UTC)
+TIME_COLUMN = "Zeit"
+QUANTITY_COLUMN = "Anzahl"
+MODE_COLUMN = "Modus"
+STATION_COLUMN = "Station"
+LOG_COLUMNS = [TIME_COLUMN, ID_COLUMN, QUANTITY_COLUMN, MODE_COLUMN, STATION_COLUMN]
+
+# See ``events.ScanProcessed``, the index is stored in the segments
+MODES = ["add", "delete", "count", "uncount"]
+
+JOURNAL_FILE = "journal.csv"
+SEGMENT_PREFIX = "scans-"
+SEGMENT_EXTENSION = ".npz"
+
+
+def localStation() -> str:
+    """
+    Returns the name of the station for codes scanned at this computer.
+    """
+    return socket.gethostname()
+
+
+def month(timestamp: int) -> str:
+    return time.strftime("%Y-%m", time.localtime(timestamp))
+
+
+def segmentRange(fileName: str) -> tuple[int, int] | None:
+    """
+    Returns the time of the first and last scan in a segment from its file name (``scans-[first]-[last].npz``),
+    None if it is not the name of a segment.
+    """
+    if not fileName.startswith(SEGMENT_PREFIX) or not fileName.endswith(SEGMENT_EXTENSION):
+        return None
+    parts = fileName[len(SEGMENT_PREFIX) : -len(SEGMENT_EXTENSION)].split("-")
+    try:
+        return int(parts[0]), int(parts[1])
+    except (IndexError, ValueError):
+        return None
+
+
+def readJournal(path: str) -> pd.DataFrame:
+    """
+    Reads the journal with the scans that are not compacted yet. Broken lines, e.g. from a crash while writing, are skipped.
+    """
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=LOG_COLUMNS)
+    journal = pd.read_csv(
+        path,
+        sep=";",
+        names=LOG_COLUMNS,
+        dtype={MODE_COLUMN: str, STATION_COLUMN: str},
+        keep_default_na=False,
+        on_bad_lines="skip",
+        encoding="utf-8",
+    )
+    for column in [TIME_COLUMN, ID_COLUMN, QUANTITY_COLUMN]:
+        journal[column] = pd.to_numeric(journal[column], errors="coerce")
+    journal = journal.dropna(subset=[TIME_COLUMN, ID_COLUMN, QUANTITY_COLUMN])
+    return journal[journal[MODE_COLUMN].isin(MODES)].astype(
+        {TIME_COLUMN: np.int64, ID_COLUMN: np.int64, QUANTITY_COLUMN: np.int32}
+    )
+
+
+class ScanLog:
+    """
+    Writes every processed scan (``events.ScanProcessed``) with its time to the scan log, for the consumption analytics.
+
+    New scans are appended as a line to a small CSV journal, so nothing is lost if the program crashes.
+    When the journal reaches ``consts.SCAN_LOG_SEGMENT_ROWS`` scans or a new month starts, it is compacted into a segment:
+    a compressed numpy file with one array per column (about 4 bytes per scan), named after the time of its first and last scan.
+    Segments with only scans older than ``consts.SCAN_LOG_KEEP_DAYS`` days are deleted.
+    Loading a year of scans (``loadScans()``) reads a few segments and takes well under a second.
+
+    Parameters
+    ----------
+    data : The data whose scans are logged
+    directory : The directory of the journal and the segments
+    """
+
+    def __init__(self, data: Data, directory: str = SCAN_LOG_DIR):
+        self.directory = directory
+        self.journalPath = os.path.join(directory, JOURNAL_FILE)
+        os.makedirs(directory, exist_ok=True)
+        journal = readJournal(self.journalPath)
+        self.journalRows = len(journal)
+        self.journalMonth = month(int(journal[TIME_COLUMN].iloc[0])) if len(journal) else None
+        if self.journalMonth is not None and self.journalMonth != month(int(time.time())):
+            self.rotate()
+        self.prune()
+        data.events.subscribe(
+            ScanProcessed,
+            lambda event: self.record(event.id, event.quantity, event.mode, event.station),
+        )
+
+    def record(self, id: int, quantity: int, mode: str, station: str, timestamp: int | None = None):
+        """
+        Appends a scan to the journal and compacts the journal first if it is full or from an earlier month.
+        """
+        if timestamp is None:
+            timestamp = int(time.time())
+        if self.journalRows >= SCAN_LOG_SEGMENT_ROWS or (
+            self.journalMonth is not None and self.journalMonth != month(timestamp)
+        ):
+            self.rotate()
+        station = station.replace(";", ",").replace("\n", " ")
+        with open(self.journalPath, "a", encoding="utf-8", newline="") as file:
+            file.write(f"{timestamp};{id};{quantity};{mode};{station}\n")
+        self.journalRows += 1
+        if self.journalMonth is None:
+            self.journalMonth = month(timestamp)
+
+    def rotate(self):
+        """
+        Compacts the journal into a new segment and starts an empty journal.
+        """
+        journal = readJournal(self.journalPath)
+        if not journal.empty:
+            writeSegment(self.directory, journal)
+        if os.path.exists(self.journalPath):
+            os.remove(self.journalPath)
+        self.journalRows = 0
+        self.journalMonth = None
+        self.prune()
+
+    def prune(self, now: int | None = None):
+        """
+        Deletes the segments that only contain scans older than ``consts.SCAN_LOG_KEEP_DAYS`` days.
+        """
+        oldest = (int(time.time()) if now is None else now) - SCAN_LOG_KEEP_DAYS * 86400
+        for fileName in os.listdir(self.directory):
+            timeRange = segmentRange(fileName)
+            if timeRange is not None and timeRange[1] < oldest:
+                os.remove(os.path.join(self.directory, fileName))
+
+
+def writeSegment(directory: str, scans: pd.DataFrame) -> str:
+    """
+    Writes the scans (``LOG_COLUMNS``) to a new segment and returns its path.
+    The file is written under a temporary name first, so readers never see half a segment.
+    """
+    times = scans[TIME_COLUMN].to_numpy(dtype=np.int64)
+    stationCodes, stations = pd.factorize(scans[STATION_COLUMN].astype(str))
+    name = f"{SEGMENT_PREFIX}{times.min()}-{times.max()}"
+    path = os.path.join(directory, name + SEGMENT_EXTENSION)
+    number = 1
+    while os.path.exists(path):
+        number += 1
+        path = os.path.join(directory, f"{name}-{number}{SEGMENT_EXTENSION}")
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as file:
+        np.savez_compressed(
+            file,
+            time=times,
+            id=scans[ID_COLUMN].to_numpy(dtype=np.int64),
+            quantity=scans[QUANTITY_COLUMN].to_numpy(dtype=np.int32),
+            mode=pd.Categorical(scans[MODE_COLUMN], categories=MODES).codes.astype(np.int8),
+            station=stationCodes.astype(np.int16),
+            stations=np.array(stations, dtype=str),
+        )
+    os.replace(temporary, path)
+    return path
+
+
+def loadScans(directory: str = SCAN_LOG_DIR, since: int | None = None) -> pd.DataFrame:
+    """
+    Loads all scans of the scan log, from the segments and the journal.
+
+    Parameters
+    ----------
+    directory : The directory of the scan log
+    since : Only scans at or after this time (seconds since 1970), segments with only older scans are not read
+
+    Returns
+    -------
+    The scans ordered by segment with the columns ``LOG_COLUMNS``, the mode and station are categorical.
+    """
+    times: list[np.ndarray] = []
+    ids: list[np.ndarray] = []
+    quantities: list[np.ndarray] = []
+    modes: list[np.ndarray] = []
+    stationCodes: list[np.ndarray] = []
+    stations: dict[str, int] = {}
+
+    def add(time: np.ndarray, id: np.ndarray, quantity: np.ndarray, mode: np.ndarray, station: np.ndarray, names: list[str]):
+        # The station codes of every segment are translated to the codes of all loaded stations
+        translation = np.array([stations.setdefault(name, len(stations)) for name in names], dtype=np.int16)
+        times.append(time)
+        ids.append(id)
+        quantities.append(quantity)
+        modes.append(mode)
+        stationCodes.append(translation[station] if len(translation) else station)
+
+    fileNames = sorted(os.listdir(directory)) if os.path.isdir(directory) else []
+    for fileName in fileNames:
+        timeRange = segmentRange(fileName)
+        if timeRange is None or (since is not None and timeRange[1] < since):
+            continue
+        with np.load(os.path.join(directory, fileName)) as segment:
+            add(
+                segment["time"],
+                segment["id"],
+                segment["quantity"],
+                segment["mode"],
+                segment["station"],
+                segment["stations"].tolist(),
+            )
+
+    journal = readJournal(os.path.join(directory, JOURNAL_FILE))
+    if not journal.empty:
+        codes, names = pd.factorize(journal[STATION_COLUMN].astype(str))
+        add(
+            journal[TIME_COLUMN].to_numpy(dtype=np.int64),
+            journal[ID_COLUMN].to_numpy(dtype=np.int64),
+            journal[QUANTITY_COLUMN].to_numpy(dtype=np.int32),
+            pd.Categorical(journal[MODE_COLUMN], categories=MODES).codes.astype(np.int8),
+            codes,
+            list(names),
+        )
+
+    if not times:
+        return pd.DataFrame(
+            {
+                TIME_COLUMN: np.array([], dtype=np.int64),
+                ID_COLUMN: np.array([], dtype=np.int64),
+                QUANTITY_COLUMN: np.array([], dtype=np.int32),
+                MODE_COLUMN: pd.Categorical([], categories=MODES),
+                STATION_COLUMN: pd.Categorical([]),
+            }
+        )
+    scans = pd.DataFrame(
+        {
+            TIME_COLUMN: np.concatenate(times),
+            ID_COLUMN: np.concatenate(ids),
+            QUANTITY_COLUMN: np.concatenate(quantities),
+            MODE_COLUMN: pd.Categorical.from_codes(np.concatenate(modes), categories=MODES),
+            STATION_COLUMN: pd.Categorical.from_codes(np.concatenate(stationCodes), categories=list(stations)),
+        }
+    )
+    if since is not None:
+        scans = scans[scans[TIME_COLUMN] >= since].reset_index(drop=True)
+    return scans
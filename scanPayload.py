@@ -0,0 +1,99 @@
+from dataclasses import dataclass
+import re
+from urllib.parse import parse_qs, urlsplit
+
+# Separates the code from the quantity in a payload, e.g. "0123456789*5"
+QUANTITY_SEPARATOR = "*"
+# Separates the items of a kit, e.g. "0123456789*5;9876543210*2"
+ITEM_SEPARATOR = ";"
+# Marks a kit, so a single code with a quantity can not be confused with a kit
+KIT_PREFIX = "kit:"
+
+
+@dataclass
+class ScanItem:
+    """
+    An entry and how many of it were scanned with one code.
+
+    Parameters
+    ----------
+    code : The code of the entry
+    quantity : How often the entry counts, multiplied with the multiplier of the state
+    """
+
+    code: str
+    quantity: int = 1
+
+
+def parsePayload(payload: str) -> list[ScanItem]:
+    """
+    Parses the entries and quantities from a scanned code.
+
+    Supported formats
+    -----------------
+    - ``[code]``: The entry once
+    - ``[code]*[quantity]``: The entry *[quantity]* times
+    - ``kit:[code]*[quantity];[code]*[quantity];...``: Several entries at once, e.g. a bill of materials.
+      The quantity can be left out for every item.
+    - An URL with the query parameters ``code`` and ``qty`` (both can be repeated, they are paired in order)
+      or ``kit`` with the format above, e.g. ``https://example.com/scan?code=0123456789&qty=5``
+
+    Everything that is not a valid payload is treated as a plain code, so codes containing
+    the separators still work.
+    """
+    if "://" in payload:
+        items = parseUrl(payload)
+        if items:
+            return items
+        return [ScanItem(payload)]
+    if payload.startswith(KIT_PREFIX):
+        items = [
+            parseItem(item)
+            for item in payload[len(KIT_PREFIX) :].split(ITEM_SEPARATOR)
+            if item.strip() != ""
+        ]
+        return [item for item in items if item is not None]
+    item = parseItem(payload)
+    return [item if item is not None else ScanItem(payload)]
+
+
+def parseItem(text: str) -> ScanItem | None:
+    """
+    Parses ``[code]`` or ``[code]*[quantity]``. Returns None if the quantity is not a positive number.
+    """
+    text = text.strip()
+    code, separator, quantity = text.rpartition(QUANTITY_SEPARATOR)
+    if separator == "":
+        return ScanItem(text)
+    if not re.fullmatch(r"\d+", quantity) or int(quantity) == 0 or code == "":
+        return None
+    return ScanItem(code, int(quantity))
+
+
+def parseUrl(url: str) -> list[ScanItem]:
+    query = parse_qs(urlsplit(url).query)
+    if "kit" in query:
+        return parsePayload(KIT_PREFIX + ITEM_SEPARATOR.join(query["kit"]))
+    codes = query.get("code", [])
+    quantities = query.get("qty", [])
+    items: list[ScanItem] = []
+    for i, code in enumerate(codes):
+        quantity = quantities[i] if i < len(quantities) else "1"
+        item = parseItem(f"{code}{QUANTITY_SEPARATOR}{quantity}")
+        if item is not None:
+            items.append(item)
+    return items
+
+
+def encodePayload(items: list[ScanItem]) -> str:
+    """
+    Creates the payload for a code that adds the given entries, the inverse of ``parsePayload()``.
+    """
+    if len(items) == 1:
+        item = items[0]
+        if item.quantity == 1:
+            return item.code
+        return f"{item.code}{QUANTITY_SEPARATOR}{item.quantity}"
+    return KIT_PREFIX + ITEM_SEPARATOR.join(
+        f"{item.code}{QUANTITY_SEPARATOR}{item.quantity}" for item in items
+    )
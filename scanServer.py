@@ -0,0 +1,207 @@
+from concurrent.futures import Future, TimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+from typing import Any
+from urllib.parse import parse_qs, urlsplit
+from PySide6.QtCore import QObject, Signal
+
+from consts import ID_COLUMN, LOCATION_COLUMN, SCAN_SERVER_TIMEOUT_S
+from location import getLocationString
+import scanCommands
+from state import State
+
+
+class ScanBridge(QObject):
+    """
+    Hands codes from the server threads to the main thread.
+
+    The signal is emitted in a server thread, Qt queues the call of ``handle()`` into the event loop of the
+    main thread, so the codes are processed one after another like the codes from the input bar.
+    The result is passed back with the future.
+    """
+
+    scanned = Signal(str, str, object)
+
+    def __init__(self, state: State):
+        super().__init__()
+        self.state = state
+        self.scanned.connect(self.handle)
+
+    def handle(self, code: str, station: str, future: "Future[dict[str, Any]]"):
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            result = scanCommands.dispatch(self.state, code, interactive=False, station=station)
+            future.set_result(describeResult(self.state, result))
+        except Exception as e:
+            future.set_exception(e)
+
+
+def describeResult(state: State, result: scanCommands.ScanResult) -> dict[str, Any]:
+    """
+    Creates the answer for a scan, with the values of the scanned entries and their scan count.
+    """
+    entries: list[dict[str, Any]] = []
+    df = state.data.df
+    rows = (
+        df[df[ID_COLUMN].isin(result.ids)]
+        .drop_duplicates(ID_COLUMN)
+        .set_index(ID_COLUMN, drop=False)
+    )
+    for id in dict.fromkeys(result.ids):
+        values = {
+            header: ("" if str(value) == "nan" else str(value))
+            for header, value in zip(state.data.dataHeaders, rows.loc[id].values)
+        }
+        if LOCATION_COLUMN in values:
+            values[LOCATION_COLUMN] = getLocationString(
+                state.data.locations, values[LOCATION_COLUMN]
+            )
+        values["Anzahl"] = state.data.scanCount(id)
+        entries.append(values)
+    return {
+        "ok": result.error is None and not result.missing,
+        "command": result.command,
+        "entries": entries,
+        "missing": result.missing,
+        "error": result.error,
+    }
+
+
+class ScanRequestHandler(BaseHTTPRequestHandler):
+    """
+    ``GET /scan?code=[code]`` or ``POST /scan`` with the code as the body (plain text or ``{"code": ...}``).
+    Answers with JSON, see ``describeResult()``.
+    """
+
+    # Keeps the connection open for the next scan of the same scanner
+    protocol_version = "HTTP/1.1"
+    server: "ScanHTTPServer"
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path != "/scan":
+            self.reply(404, {"ok": False, "error": "Unbekannter Pfad"})
+            return
+        codes = parse_qs(url.query).get("code", [])
+        if not codes:
+            self.reply(400, {"ok": False, "error": "Parameter 'code' fehlt"})
+            return
+        self.scan(codes[0])
+
+    def do_POST(self):
+        if urlsplit(self.path).path != "/scan":
+            self.reply(404, {"ok": False, "error": "Unbekannter Pfad"})
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length).decode("utf-8", errors="replace")
+        if self.headers.get("Content-Type", "").startswith("application/json"):
+            try:
+                body = str(json.loads(body).get("code", ""))
+            except (ValueError, AttributeError):
+                self.reply(400, {"ok": False, "error": "Ungültiges JSON"})
+                return
+        self.scan(body)
+
+    def scan(self, code: str):
+        future: "Future[dict[str, Any]]" = Future()
+        self.server.bridge.scanned.emit(code, self.client_address[0], future)
+        try:
+            answer = future.result(timeout=SCAN_SERVER_TIMEOUT_S)
+        except TimeoutError:
+            future.cancel()
+            self.reply(503, {"ok": False, "error": "Das Programm ist beschäftigt"})
+            return
+        except Exception as e:
+            self.reply(500, {"ok": False, "error": str(e)})
+            return
+        if answer["error"] is not None:
+            status = 400
+        elif answer["missing"] and not answer["entries"]:
+            status = 404
+        else:
+            status = 200
+        self.reply(status, answer)
+
+    def reply(self, status: int, answer: dict[str, Any]):
+        body = json.dumps(answer, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any):
+        pass
+
+
+class ScanHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], bridge: ScanBridge):
+        super().__init__(address, ScanRequestHandler)
+        self.bridge = bridge
+
+
+class ScanServer:
+    """
+    Accepts scanned codes from other devices (handheld or phone scanners) over HTTP.
+
+    Every connection is handled in its own thread, the codes are processed in the main thread
+    by ``scanCommands.dispatch()``, the same as codes from the input bar.
+    Must be created in the main thread.
+
+    Parameters
+    ----------
+    state : The application state
+    host : The address to listen on, "127.0.0.1" only accepts scans from this computer, "0.0.0.0" from the network
+    port : The port to listen on
+    """
+
+    def __init__(self, state: State, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.bridge = ScanBridge(state)
+        self.httpServer = ScanHTTPServer((host, port), self.bridge)
+        self.thread = threading.Thread(
+            target=self.httpServer.serve_forever, name="ScanServer", daemon=True
+        )
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.httpServer.shutdown()
+        self.httpServer.server_close()
+        self.thread.join()
+
+
+activeServer: ScanServer | None = None
+
+
+def applySettings(state: State):
+    """
+    Starts, restarts or stops the scan server to match the settings. A port of 0 disables the server.
+
+    Throws an OSError if the port can not be used.
+    """
+    global activeServer
+    host = "0.0.0.0" if state.settings.scanServerPublic else "127.0.0.1"
+    port = state.settings.scanServerPort
+    if activeServer is not None:
+        if activeServer.host == host and activeServer.port == port:
+            return
+        activeServer.stop()
+        activeServer = None
+    if port == 0:
+        return
+    activeServer = ScanServer(state, host, port)
+    activeServer.start()
+
+
+def stopServer():
+    global activeServer
+    if activeServer is not None:
+        activeServer.stop()
+        activeServer = None
@@ -0,0 +1,592 @@
+from dataclasses import dataclass, field
+from typing import Any, Callable
+import webbrowser
+from PySide6.QtCore import (
+    QAbstractItemModel,
+    QAbstractProxyModel,
+    QAbstractTableModel,
+    QEvent,
+    QModelIndex,
+    QPersistentModelIndex,
+    Qt,
+)
+from PySide6.QtGui import QMouseEvent, QPainter
+from PySide6.QtWidgets import (
+    QAbstractItemView,
+    QApplication,
+    QSpinBox,
+    QStyle,
+    QStyledItemDelegate,
+    QStyleOptionButton,
+    QStyleOptionViewItem,
+    QTableView,
+    QWidget,
+)
+
+from consts import (
+    COUNT_COLUMN,
+    DELETE_COLUMN,
+    EDIT_COLUMN,
+    ID_COLUMN,
+    LOCATION_COLUMN,
+    URL_DATASHEET_COLUMN,
+    URL_ORDER_COLUMN,
+)
+import db
+from entries import editEntryWindow
+from state import State
+
+ModelIndex = QModelIndex | QPersistentModelIndex
+
+# Columns drawn as buttons by the delegates, they have no text
+BUTTON_COLUMNS = {EDIT_COLUMN: "✏️", DELETE_COLUMN: "🗑"}
+# Text of the URL columns, the URL itself is the tooltip
+LINK_TEXTS = {URL_DATASHEET_COLUMN: "🗏 Link öffnen", URL_ORDER_COLUMN: "🛒 Link öffnen"}
+
+SortKey = tuple[int, float, str]
+
+
+def sortKey(text: str) -> SortKey:
+    """
+    Returns the key to sort a cell by: numbers by their value before texts, texts without case.
+    """
+    try:
+        return (0, float(text.replace(",", ".")), "")
+    except ValueError:
+        return (1, 0.0, text.lower())
+
+
+@dataclass
+class CachedRow:
+    """
+    The texts of one row of the scan table, computed once when the row is first shown, sorted or filtered
+    and dropped when the entry changes (see ``ScanTableModel.invalidate()``).
+
+    Parameters
+    ----------
+    texts : The displayed text of every column, empty for the buttons and the count
+    toolTips : The URL of the URL columns by column
+    sortKeys : The key of every column to sort by, see ``sortKey()``
+    filterText : The lower-cased texts of all columns, for the quick filter
+    """
+
+    texts: list[str]
+    toolTips: dict[int, str] = field(default_factory=dict)
+    sortKeys: list[SortKey] = field(default_factory=list)
+    filterText: str = ""
+
+
+class ScanTableModel(QAbstractTableModel):
+    """
+    The entries in the list of scanned IDs (``Data.scannedIDs``), one row per entry in the order of the list.
+    Only the columns chosen in the settings are shown (see ``db.visibleHeaders()``), hidden columns are never converted to text.
+
+    The texts of the rows are cached by entry id (see ``CachedRow``), so scrolling, sorting and filtering
+    do not read the dataframe again. Rows missing in the cache are read together with one lookup.
+    The scan view tells the model about changes to the data, see ``scanView.subscribeScanView()``.
+
+    Parameters
+    ----------
+    state : The application state
+    """
+
+    def __init__(self, state: State):
+        super().__init__()
+        self.state = state
+        self.headers = db.visibleHeaders(state.data, state.settings.columns)
+        self.cache: dict[int, CachedRow] = {}
+
+    # Qt model interface
+
+    def rowCount(self, parent: ModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.state.data.scannedIDs)
+
+    def columnCount(self, parent: ModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.headers)
+
+    def headerData(self, section: int, orientation: Qt.Orientation, role: int = Qt.ItemDataRole.DisplayRole) -> Any:
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal:
+            return self.headers[section] if section < len(self.headers) else None
+        return str(section + 1)
+
+    def data(self, index: ModelIndex, role: int = Qt.ItemDataRole.DisplayRole) -> Any:
+        if not index.isValid() or index.row() >= self.rowCount():
+            return None
+        header = self.headers[index.column()]
+        if header == COUNT_COLUMN and role in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.EditRole):
+            count = self.state.data.scanCount(self.idAt(index.row()))
+            return count if role == Qt.ItemDataRole.EditRole else str(count)
+        if role == Qt.ItemDataRole.DisplayRole:
+            return self.cachedRow(index.row()).texts[index.column()]
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return self.cachedRow(index.row()).toolTips.get(index.column())
+        return None
+
+    def flags(self, index: ModelIndex) -> Qt.ItemFlag:
+        flags = super().flags(index)
+        if index.isValid() and self.headers[index.column()] == COUNT_COLUMN:
+            flags |= Qt.ItemFlag.ItemIsEditable
+        return flags
+
+    def setData(self, index: ModelIndex, value: Any, role: int = Qt.ItemDataRole.EditRole) -> bool:
+        if role != Qt.ItemDataRole.EditRole or self.headers[index.column()] != COUNT_COLUMN:
+            return False
+        # Emits CountChanged, which updates the cell
+        self.state.data.setScanCount(self.idAt(index.row()), int(value))
+        return True
+
+    # Cached texts
+
+    def idAt(self, row: int) -> int:
+        return self.state.data.scannedIDs[row]
+
+    def cachedRow(self, row: int) -> CachedRow:
+        id = self.idAt(row)
+        if id not in self.cache:
+            self.fillCache()
+        return self.cache[id]
+
+    def sortKey(self, row: int, column: int) -> SortKey:
+        if self.headers[column] == COUNT_COLUMN:
+            return (0, float(self.state.data.scanCount(self.idAt(row))), "")
+        return self.cachedRow(row).sortKeys[column]
+
+    def filterText(self, row: int) -> str:
+        return self.cachedRow(row).filterText
+
+    def fillCache(self):
+        """
+        Computes the texts of all listed entries that are not cached, with a single lookup in the dataframe.
+        """
+        data = self.state.data
+        missing = [id for id in data.scannedIDs if id not in self.cache]
+        if not missing:
+            return
+        headers = self.headers
+        # Only the shown columns are converted to text
+        shown = [ID_COLUMN] + [header for header in headers if header in data.dataHeaders]
+        rows = data.df.loc[data.df[ID_COLUMN].isin(missing), shown].drop_duplicates(ID_COLUMN)
+        valuesById: dict[int, dict[str, str]] = {}
+        for values in rows.astype(str).values.tolist():
+            row = dict(zip(shown, values))
+            valuesById[int(row[ID_COLUMN])] = row
+        for id in missing:
+            values = valuesById.get(id, {})
+            texts: list[str] = []
+            toolTips: dict[int, str] = {}
+            for column, header in enumerate(headers):
+                value = values.get(header, "")
+                value = "" if value == "nan" else value
+                if header in BUTTON_COLUMNS or header == COUNT_COLUMN:
+                    texts.append("")
+                elif header == LOCATION_COLUMN:
+                    texts.append(db.getLocationsText(data, id) if values else "")
+                elif header in LINK_TEXTS and value != "":
+                    texts.append(LINK_TEXTS[header])
+                    toolTips[column] = value
+                else:
+                    texts.append(value)
+            # The URLs are searched instead of the link texts
+            searched = [toolTips.get(column, text) for column, text in enumerate(texts)]
+            self.cache[id] = CachedRow(
+                texts,
+                toolTips,
+                [sortKey(text) for text in texts],
+                " ".join([str(id)] + searched).lower(),
+            )
+
+    def invalidate(self, ids: set[int] | None = None):
+        """
+        Drops the cached texts of the entries, of all entries if no ids are given.
+        """
+        if ids is None:
+            self.cache.clear()
+            return
+        for id in ids:
+            self.cache.pop(id, None)
+
+    # Changes of the list, called by the scan view
+
+    def scanAdded(self, id: int):
+        row = self.state.data.scannedIDs.index(id)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.endInsertRows()
+
+    def scanRemoved(self, id: int, row: int):
+        self.beginRemoveRows(QModelIndex(), row, row)
+        self.cache.pop(id, None)
+        self.endRemoveRows()
+
+    def countChanged(self, id: int):
+        if id not in self.state.data.scannedIDs:
+            return
+        row = self.state.data.scannedIDs.index(id)
+        column = self.headers.index(COUNT_COLUMN)
+        self.dataChanged.emit(self.index(row, column), self.index(row, column))
+
+    def rowsEdited(self, ids: set[int]):
+        """
+        Shows the new values of the edited entries, only their rows are read again.
+        """
+        self.invalidate(ids)
+        last = self.columnCount() - 1
+        for row, id in enumerate(self.state.data.scannedIDs):
+            if id in ids:
+                self.dataChanged.emit(self.index(row, 0), self.index(row, last))
+
+    def reset(self, ids: set[int] | None = None):
+        """
+        Shows the list again from the start, e.g. after it was reordered or reloaded.
+        The texts of the given entries, or all if None, are read again.
+        """
+        self.beginResetModel()
+        db.validateIDs(self.state.data)
+        db.syncIdsWithCount(self.state.data)
+        headers = db.visibleHeaders(self.state.data, self.state.settings.columns)
+        if headers != self.headers:
+            self.headers = headers
+            ids = None
+        self.invalidate(ids)
+        self.endResetModel()
+
+
+class ScanProxyModel(QAbstractProxyModel):
+    """
+    Sorts and filters the rows of the ``ScanTableModel`` for the scan table.
+
+    The order of the rows is computed in Python with the cached sort keys of the model
+    (sorting 10k rows takes a few milliseconds, comparing them one by one through Qt would take seconds).
+    Added or changed rows are put in place with a binary search, without sorting all rows again.
+    Without a sort column the rows are in the order of the list, e.g. along the pick route (see the ``pickRoute`` module).
+
+    Parameters
+    ----------
+    model : The model of all scanned entries
+    """
+
+    def __init__(self, model: ScanTableModel):
+        super().__init__()
+        self.scanModel = model
+        # Source row of every shown row
+        self.rows: list[int] = []
+        self.sortColumn = -1
+        self.descending = False
+        self.words: list[str] = []
+        self.setSourceModel(model)
+        model.modelAboutToBeReset.connect(self.beginResetModel)
+        model.modelReset.connect(self.sourceReset)
+        model.rowsInserted.connect(self.sourceRowsInserted)
+        model.rowsAboutToBeRemoved.connect(self.sourceRowsAboutToBeRemoved)
+        model.rowsRemoved.connect(self.sourceRowsRemoved)
+        model.dataChanged.connect(self.sourceDataChanged)
+        self.rebuild()
+
+    # Qt proxy interface
+
+    def rowCount(self, parent: ModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent: ModelIndex = QModelIndex()) -> int:
+        return self.scanModel.columnCount()
+
+    def index(self, row: int, column: int, parent: ModelIndex = QModelIndex()) -> QModelIndex:
+        if parent.isValid() or not (0 <= row < len(self.rows) and 0 <= column < self.columnCount()):
+            return QModelIndex()
+        return self.createIndex(row, column)
+
+    def parent(self, index: ModelIndex = QModelIndex()) -> QModelIndex:  # type: ignore
+        return QModelIndex()
+
+    def mapToSource(self, proxyIndex: ModelIndex) -> QModelIndex:
+        if not proxyIndex.isValid() or proxyIndex.row() >= len(self.rows):
+            return QModelIndex()
+        return self.scanModel.index(self.rows[proxyIndex.row()], proxyIndex.column())
+
+    def mapFromSource(self, sourceIndex: ModelIndex) -> QModelIndex:
+        if not sourceIndex.isValid():
+            return QModelIndex()
+        row = self.position(sourceIndex.row())
+        return self.createIndex(row, sourceIndex.column()) if row is not None else QModelIndex()
+
+    def headerData(self, section: int, orientation: Qt.Orientation, role: int = Qt.ItemDataRole.DisplayRole) -> Any:
+        if orientation == Qt.Orientation.Vertical:
+            return str(section + 1) if role == Qt.ItemDataRole.DisplayRole else None
+        return self.scanModel.headerData(section, orientation, role)
+
+    def sort(self, column: int, order: Qt.SortOrder = Qt.SortOrder.AscendingOrder):
+        """
+        Sorts the rows by the column, a column of -1 shows them in the order of the list again.
+        """
+        self.layoutAboutToBeChanged.emit()
+        oldIndexes = self.persistentIndexList()
+        sourceIndexes = [self.mapToSource(index) for index in oldIndexes]
+        self.sortColumn = column
+        self.descending = order == Qt.SortOrder.DescendingOrder
+        self.rows = self.ordered(self.rows)
+        self.changePersistentIndexList(
+            oldIndexes, [self.mapFromSource(index) for index in sourceIndexes]
+        )
+        self.layoutChanged.emit()
+
+    # Sorting and filtering
+
+    def setFilterText(self, text: str):
+        """
+        Only shows the rows that contain all words of the text, without case.
+        """
+        words = text.lower().split()
+        if words == self.words:
+            return
+        self.words = words
+        self.beginResetModel()
+        self.rebuild()
+        self.endResetModel()
+
+    def accepts(self, sourceRow: int) -> bool:
+        if not self.words:
+            return True
+        text = self.scanModel.filterText(sourceRow)
+        return all(word in text for word in self.words)
+
+    def key(self, sourceRow: int) -> SortKey:
+        return self.scanModel.sortKey(sourceRow, self.sortColumn)
+
+    def ordered(self, rows: list[int]) -> list[int]:
+        if self.sortColumn < 0:
+            return sorted(rows)
+        # Stable, rows with the same key stay in the order of the list
+        return sorted(rows, key=self.key, reverse=self.descending)
+
+    def rebuild(self):
+        self.scanModel.fillCache()
+        self.rows = self.ordered(
+            [row for row in range(self.scanModel.rowCount()) if self.accepts(row)]
+        )
+
+    def sourceReset(self):
+        if self.sortColumn >= self.columnCount():
+            # The column was hidden
+            self.sortColumn = -1
+        self.rebuild()
+        self.endResetModel()
+
+    def position(self, sourceRow: int) -> int | None:
+        """
+        Returns the shown row of the source row, None if it is filtered out.
+        Only compares the source rows and not their sort keys: while a row is removed,
+        ``Data.scannedIDs`` is already shorter and the source rows no longer match their entries.
+        """
+        if self.sortColumn < 0:
+            index = self.insertPosition(sourceRow)
+            return index if index < len(self.rows) and self.rows[index] == sourceRow else None
+        try:
+            return self.rows.index(sourceRow)
+        except ValueError:
+            return None
+
+    def insertPosition(self, sourceRow: int) -> int:
+        """
+        Returns where the source row belongs in the shown rows, with a binary search.
+        """
+        low, high = 0, len(self.rows)
+        if self.sortColumn < 0:
+            while low < high:
+                middle = (low + high) // 2
+                if self.rows[middle] < sourceRow:
+                    low = middle + 1
+                else:
+                    high = middle
+            return low
+        key = self.key(sourceRow)
+        while low < high:
+            middle = (low + high) // 2
+            other = self.key(self.rows[middle])
+            if (other >= key) if self.descending else (other <= key):
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def insertSourceRow(self, sourceRow: int):
+        if not self.accepts(sourceRow):
+            return
+        row = self.insertPosition(sourceRow)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.rows.insert(row, sourceRow)
+        self.endInsertRows()
+
+    def removeSourceRow(self, sourceRow: int):
+        row = self.position(sourceRow)
+        if row is None:
+            return
+        self.beginRemoveRows(QModelIndex(), row, row)
+        self.rows.pop(row)
+        self.endRemoveRows()
+
+    # Changes of the source model
+
+    def sourceRowsInserted(self, parent: ModelIndex, first: int, last: int):
+        count = last - first + 1
+        self.rows = [row + count if row >= first else row for row in self.rows]
+        for sourceRow in range(first, last + 1):
+            self.insertSourceRow(sourceRow)
+
+    def sourceRowsAboutToBeRemoved(self, parent: ModelIndex, first: int, last: int):
+        for sourceRow in range(first, last + 1):
+            self.removeSourceRow(sourceRow)
+
+    def sourceRowsRemoved(self, parent: ModelIndex, first: int, last: int):
+        count = last - first + 1
+        self.rows = [row - count if row > last else row for row in self.rows]
+
+    def sourceDataChanged(self, topLeft: ModelIndex, bottomRight: ModelIndex, roles: list[int] = []):
+        sortChanged = topLeft.column() <= self.sortColumn <= bottomRight.column()
+        for sourceRow in range(topLeft.row(), bottomRight.row() + 1):
+            row = self.position(sourceRow)
+            if self.words or sortChanged:
+                # The row might be filtered out or belong to another place now
+                if row is None:
+                    self.insertSourceRow(sourceRow)
+                    continue
+                self.rows.pop(row)
+                stays = self.accepts(sourceRow) and self.insertPosition(sourceRow) == row
+                self.rows.insert(row, sourceRow)
+                if not stays:
+                    self.removeSourceRow(sourceRow)
+                    self.insertSourceRow(sourceRow)
+                    continue
+            if row is not None:
+                self.dataChanged.emit(
+                    self.index(row, topLeft.column()), self.index(row, bottomRight.column()), roles
+                )
+
+
+def idOfIndex(state: State, index: ModelIndex) -> int:
+    """
+    Returns the id of the entry in the row of the index of the scan table.
+    """
+    model = index.model()
+    if isinstance(model, QAbstractProxyModel):
+        index = model.mapToSource(index)
+    return state.data.scannedIDs[index.row()]
+
+
+class ButtonDelegate(QStyledItemDelegate):
+    """
+    Draws a button in every cell of a column and calls the action with the id of the entry when it is clicked.
+
+    The buttons are only painted, not created as widgets, so the table stays fast with thousands of rows.
+
+    Parameters
+    ----------
+    state : The application state
+    text : The text of the button
+    action : Called with the id of the entry of the clicked row
+    parent : The table
+    """
+
+    def __init__(self, state: State, text: str, action: Callable[[int], None], parent: QWidget):
+        super().__init__(parent)
+        self.state = state
+        self.text = text
+        self.action = action
+
+    def paint(self, painter: QPainter, option: QStyleOptionViewItem, index: ModelIndex):
+        button = QStyleOptionButton()
+        button.rect = option.rect.adjusted(2, 2, -2, -2)  # type: ignore
+        button.text = self.text
+        button.state = QStyle.StateFlag.State_Enabled | QStyle.StateFlag.State_Raised
+        style = option.widget.style() if option.widget is not None else QApplication.style()  # type: ignore
+        style.drawControl(QStyle.ControlElement.CE_PushButton, button, painter)
+
+    def editorEvent(
+        self, event: QEvent, model: QAbstractItemModel, option: QStyleOptionViewItem, index: ModelIndex
+    ) -> bool:
+        if (
+            event.type() == QEvent.Type.MouseButtonRelease
+            and isinstance(event, QMouseEvent)
+            and event.button() == Qt.MouseButton.LeftButton
+            and option.rect.contains(event.position().toPoint())  # type: ignore
+        ):
+            self.action(idOfIndex(self.state, index))
+            return True
+        return False
+
+
+class CounterDelegate(QStyledItemDelegate):
+    """
+    Edits the scan count with a spin box. Every change is applied right away, like the counter before.
+    """
+
+    def __init__(self, state: State, parent: QWidget):
+        super().__init__(parent)
+        self.state = state
+
+    def createEditor(self, parent: QWidget, option: QStyleOptionViewItem, index: ModelIndex) -> QWidget:
+        id = idOfIndex(self.state, index)
+        spinBox = QSpinBox(parent)
+        spinBox.setRange(1, 999999)
+        spinBox.setValue(self.state.data.scanCount(id) or 1)
+        spinBox.valueChanged.connect(lambda value: self.state.data.setScanCount(id, value))
+        return spinBox
+
+    def setEditorData(self, editor: QWidget, index: ModelIndex):
+        count = index.data(Qt.ItemDataRole.EditRole)
+        if isinstance(editor, QSpinBox) and isinstance(count, int) and editor.value() != count:
+            # Without blocking, the spinBox would report the change back
+            editor.blockSignals(True)
+            editor.setValue(count)
+            editor.blockSignals(False)
+
+    def setModelData(self, editor: QWidget, model: QAbstractItemModel, index: ModelIndex):
+        # Already applied with every change of the value
+        pass
+
+
+def openLink(model: ScanTableModel, index: QModelIndex):
+    """
+    Opens the URL of a clicked URL cell in the browser.
+    """
+    header = model.headers[index.column()]
+    url = index.data(Qt.ItemDataRole.ToolTipRole)
+    if header in LINK_TEXTS and url:
+        webbrowser.open(url)
+
+
+def createTable(state: State) -> tuple[QTableView, ScanTableModel, ScanProxyModel]:
+    """
+    Creates the table of the scanned entries with its model and the proxy model that sorts and filters it.
+    Clicking a header sorts by the column, the third click shows the order of the list again.
+    """
+    model = ScanTableModel(state)
+    proxy = ScanProxyModel(model)
+    table = QTableView()
+    table.setModel(proxy)
+    table.horizontalHeader().setSortIndicatorClearable(True)
+    table.horizontalHeader().setSortIndicator(-1, Qt.SortOrder.AscendingOrder)
+    table.setSortingEnabled(True)
+    table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+    # Only the count is editable, a click on it opens the spin box
+    table.setEditTriggers(
+        QAbstractItemView.EditTrigger.CurrentChanged
+        | QAbstractItemView.EditTrigger.SelectedClicked
+        | QAbstractItemView.EditTrigger.DoubleClicked
+    )
+    table.clicked.connect(lambda index: openLink(model, index))
+
+    delegates = {
+        EDIT_COLUMN: ButtonDelegate(state, BUTTON_COLUMNS[EDIT_COLUMN], lambda id: editEntryWindow(state, id), table),
+        DELETE_COLUMN: ButtonDelegate(state, BUTTON_COLUMNS[DELETE_COLUMN], state.data.removeId, table),
+        COUNT_COLUMN: CounterDelegate(state, table),
+    }
+
+    def placeDelegates():
+        # The columns move when other columns are shown or hidden
+        for column, header in enumerate(model.headers):
+            table.setItemDelegateForColumn(column, delegates.get(header))  # type: ignore
+
+    placeDelegates()
+    model.modelReset.connect(placeDelegates)
+    return table, model, proxy
@@ -1,16 +1,18 @@
 import sys
 from consts import *
 import db
-from entries import addEntryWindow, editEntryWindow
-from location import getLocationString
+from entries import addEntryWindow
+from consumption import showConsumption
+from inventory import createInventoryPanel
+from entryImport import showImportDialog
+from labels import showLabelDialog
 from manualDisplay import createManualView
+import scanCommands
 import search
-from typing import Callable
-import webbrowser
-from PySide6.QtCore import QModelIndex, QPersistentModelIndex
+from scanTable import ScanTableModel, createTable
+from PySide6.QtCore import Qt
 from PySide6.QtWidgets import (
-    QTableWidget,
-    QTableWidgetItem,
+    QTableView,
     QLineEdit,
     QVBoxLayout,
     QHBoxLayout,
@@ -20,10 +22,21 @@ from PySide6.QtWidgets import (
     QMessageBox,
     QSpacerItem,
     QSizePolicy,
-    QStyledItemDelegate,
-    QStyleOptionViewItem,
     QSpinBox,
 )
+from events import (
+    ColumnsChanged,
+    CountChanged,
+    DataReloaded,
+    LocationChanged,
+    ModeChanged,
+    RowEdited,
+    RowsEdited,
+    ScanAdded,
+    ScanRemoved,
+    ScansCleared,
+    ScansReordered,
+)
 from settings import createSettings
 from state import *
 import os
@@ -31,73 +44,34 @@ import fileActions as files
 
 
 def addIdListener(state: State, id: int):
-    assert state.gui is not None
     state.data.addId(id)
-    updateMenuBar(state.data, state.gui.menuBar)
-    updateTable(state, state.gui.table)
 
 
 def readCodeListener(state: State):
     assert state.gui is not None
-    addIdForCode(state, state.gui.inputBar.text.text())
-    updateInputBar(state, state.gui.inputBar)
-    updateMenuBar(state.data, state.gui.menuBar)
-    updateTable(state, state.gui.table)
+    code = state.gui.inputBar.text.text()
+    state.gui.inputBar.text.clear()
+    addIdForCode(state, code)
 
 
 def addIdForCode(state: State, code: str):
     """
     Gets the id associated with the code and adds it to the list of scanned IDs.
-    Additionally, it handles special codes.
+    Additionally, it handles special codes and codes with quantities, see the ``scanCommands`` module.
 
-    To show the new entry in the table, call ``main.updateTable()``
-
-    Special Codes
-    -------------
-    - ``multby[number]``: Set the multiplier to *[number]*
-    - ``multbz[number]``: Set the multiplier to *[number]* (because of a typo when creating the QR-Code)
-    - ``delete``: Toggles delete mode -> Scanned Codes are removed from the list of scanned IDs.
-    - everything not matching a special code is treated as a normal code
+    The views are updated by the events emitted by the state and data (see the ``events`` module).
 
     Parameters
     ----------
     state : State of the application
-        Example ``multbz10``
     code : The code that was scanned
+        Example ``multbz10`` or ``0123456789*5``
     """
-
-    # Secial Codes
-    if code.startswith("multbz"):
-        state.multiplier = int(code.split("multbz")[1])
-    if code.startswith("multby"):
-        state.multiplier = int(code.split("multby")[1])
-    elif code == "delete":
-        state.delMode = not state.delMode
-    elif code == "easterEgg":
-        os.system("shutdown -s")
-    elif code == "easterEgg2":
-        webbrowser.open("https://www.youtube.com/watch?v=xvFZjo5PgG0")
-    else:
-        dataRow: db.Row = db.newRowFromCode(state.data, code)
-        if dataRow.empty():
-            QMessageBox.warning(
-                mainWindow(),
-                "Warnung",
-                f"Eintrag '{code}' nicht gefunden!",  # type: ignore
-            )
-            return
-        if state.delMode:
-            dataRow.scanCount = 0
-            dataRow.writeNoValues(state.data)
-        else:
-            dataRow.scanCount += state.multiplier
-            dataRow.writeNoValues(state.data)
+    scanCommands.dispatch(state, code)
 
 
 def clearTable(state: State):
-    assert state.gui is not None
     db.clearScanned(state.data)
-    updateTable(state, state.gui.table)
 
 
 def showSettings(state: State):
@@ -108,8 +82,10 @@ def showSettings(state: State):
 
 def reloadData(state: State):
     assert state.gui is not None
+    # Write own changes first, so other users see them after their next reload
+    db.flush(state.data, state.settings.filePath)
+    # The table is updated by the DataReloaded event
     db.reloadFromFile(state.data, state.settings.filePath)
-    updateTable(state, state.gui.table)
 
 
 def showScannView(state: State):
@@ -124,210 +100,8 @@ def showHelp(state: State):
     )
 
 
-def updateTable(state: State, table: QTableWidget):
-    """
-    Redraws the Table with the entries with the IDs in 'scannedIDs' and the columns with the headers in 'headers'
-    Handles special columns like the URLs and the Edit Buttons
-
-    Parameters
-    ----------
-    data : Data to be displayed in the table
-    table : The Table the entries are going to be displayed in (mutated)
-    """
-    data = state.data
-    db.validateIDs(data)
-    # Row and Columns of the Table
-    table.clear()
-    table.setRowCount(data.rowCount())
-    table.setColumnCount(data.columnCount())
-    table.setHorizontalHeaderLabels(data.tableHeaders)
-
-    db.syncIdsWithCount(data)
-
-    for row in range(data.rowCount()):
-        # Get the row of the dataframe that corresponds to the current row in the table
-        dataRow: db.Row = db.newRowFromIndex(data, row)
-
-        for column, header in enumerate(data.tableHeaders):
-            if header == EDIT_COLUMN:
-                # Logic to display the Edit Button
-                item = QTableWidgetItem()
-                table.setItem(row, column, item)
-                table.openPersistentEditor(item)
-            elif header == DELETE_COLUMN:
-                item = QTableWidgetItem()
-                table.setItem(row, column, item)
-                table.openPersistentEditor(item)
-            elif header == COUNT_COLUMN:
-                item = QTableWidgetItem()
-                item.setText(str(dataRow.scanCount))
-                table.setItem(row, column, item)
-                table.openPersistentEditor(item)
-            elif header == LOCATION_COLUMN:
-                item = QTableWidgetItem()
-                item.setText(
-                    getLocationString(
-                        state.data.locations,
-                        dataRow.getValue(LOCATION_COLUMN),
-                    )
-                )
-                table.setItem(row, column, item)
-            else:
-                value = dataRow.getValue(header)
-                # Logic to display a cickable url
-                if header == URL_DATASHEET_COLUMN and value != "":
-                    item = QTableWidgetItem("🗏 Link öffnen")
-                    item.setToolTip(value)
-                elif header == URL_ORDER_COLUMN and value != "":
-                    item = QTableWidgetItem("🛒 Link öffnen")
-                    item.setToolTip(value)
-                else:
-                    # This line and the following one are needed to display the value directly in the table
-                    # All the other logic is needed for spectial columns like URLs and Buttons
-                    item = QTableWidgetItem(value)
-                table.setItem(row, column, item)
-    table.resizeColumnToContents(data.tableHeaders.index(LOCATION_COLUMN))
-
-
-def clickCell(data: Data, item: QTableWidgetItem):
-    """
-    An event Listener for the Table.
-    Pass this to ``QTableWidget.itemClicked.connect()``.
-
-    Parameters
-    ----------
-    item : The QTableWidgetItem that was clicked
-    """
-    header = data.tableHeaders[item.column()]
-    value = db.newRowFromIndex(data, item.row()).getValue(header)
-    if (
-        header == URL_DATASHEET_COLUMN or header == URL_ORDER_COLUMN
-    ) and value != "nan":
-        webbrowser.open(value)
-
-
 def addEntryClicked(state: State):
     addEntryWindow(state)
-    assert state.gui is not None
-    updateMenuBar(state.data, state.gui.menuBar)
-    updateTable(state, state.gui.table)
-
-
-class EditButtonDelegate(QStyledItemDelegate):
-    """
-    The edit button in the table
-
-    This class is one of the multiple steps to add arbitrary widgets to the Table
-    The most important part is the 'createEditor()' method which sets the editor of a cell to be the widget
-    For each widget with a different functionality, a new class is needed
-    The other steps are:
-    - set the column of the table to use the delegate ('QTableWidget.setItemDelegateForColumn()')
-    - set each cell to be the editor by default ('QTableWidget.openPersistentEditor()')
-    :param parent: The parent of the delegate, which is the TableWidget
-    """
-
-    def __init__(self, state: State, table: QTableWidget):
-        super(EditButtonDelegate, self).__init__(table)
-        self.state = state
-        self.table = table
-
-    def createEditor(
-        self,
-        parent: QWidget,
-        option: QStyleOptionViewItem,
-        index: QModelIndex | QPersistentModelIndex,
-    ) -> QWidget:
-        def edit():
-            assert self.state.gui is not None
-            editEntryWindow(self.state, self.state.data.scannedIDs[index.row()])
-            updateTable(self.state, self.table)
-
-        button = QPushButton(parent)
-        button.setText("✏️")
-        button.clicked.connect(edit)
-        return button
-
-
-class DeleteButtonDelegate(QStyledItemDelegate):
-    """
-    The delete button in the table
-
-    This class is one of the multiple steps to add arbitrary widgets to the Table
-    The most important part is the 'createEditor()' method which sets the editor of a cell to be the widget
-    For each widget with a different functionality, a new class is needed
-    The other steps are:
-    - set the column of the table to use the delegate ('QTableWidget.setItemDelegateForColumn()')
-    - set each cell to be the editor by default ('QTableWidget.openPersistentEditor()')
-    :param parent: The parent of the delegate, which is the TableWidget
-    """
-
-    def __init__(
-        self, state: State, table: QTableWidget, updateMenuBar: Callable[[], None]
-    ):
-        super(DeleteButtonDelegate, self).__init__(table)
-        self.state = state
-        self.table = table
-        self.updateMenuBar = updateMenuBar
-
-    def createEditor(
-        self,
-        parent: QWidget,
-        option: QStyleOptionViewItem,
-        index: QModelIndex | QPersistentModelIndex,
-    ) -> QWidget:
-        button = QPushButton(parent)
-        button.setText("🗑")
-        button.clicked.connect(lambda: self.deleteEntry(index.row()))
-        return button
-
-    def deleteEntry(self, row: int):
-        id_to_remove = self.state.data.scannedIDs[row]
-        self.state.data.scannedIDs.remove(id_to_remove)
-        self.state.data.anzahlScannedItems.pop(id_to_remove)
-        self.updateMenuBar()
-        updateTable(self.state, self.table)
-
-
-class CounterDelegate(QStyledItemDelegate):
-    """
-    The conter spinBox in the table
-
-    This class is one of the multiple steps to add arbitrary widgets to the Table
-    The most important part is the 'createEditor()' method which sets the editor of a cell to be the widget
-    For each widget with a different functionality, a new class is needed
-    The other steps are:
-    - set the column of the table to use the delegate ('QTableWidget.setItemDelegateForColumn()')
-    - set each cell to be the editor by default ('QTableWidget.openPersistentEditor()')
-    :param parent: The parent of the delegate, which is the TableWidget
-    """
-
-    def __init__(self, state: State, table: QTableWidget):
-        super(CounterDelegate, self).__init__(table)
-        self.state = state
-        self.table = table
-
-    def createEditor(
-        self,
-        parent: QWidget,
-        option: QStyleOptionViewItem,
-        index: QModelIndex | QPersistentModelIndex,
-    ) -> QWidget:
-        AnzSpinBox = QSpinBox(parent)
-        AnzSpinBox.setRange(1, 999999)
-        AnzSpinBox.setValue(
-            self.state.data.anzahlScannedItems.get(
-                self.state.data.scannedIDs[index.row()], 1
-            )
-        )  # Default to 1 if not found
-        AnzSpinBox.valueChanged.connect(
-            lambda: self.updateCount(AnzSpinBox.value(), index.row())
-        )  # Update the count when the value changes
-        return AnzSpinBox
-
-    def updateCount(self, value: int, row: int):
-        id_to_update = self.state.data.scannedIDs[row]
-        self.state.data.anzahlScannedItems[id_to_update] = value
-        updateTable(self.state, self.table)
 
 
 def createInputBar(state: State):
@@ -385,24 +159,6 @@ def createInputBar(state: State):
     return inputWidget, inputBar
 
 
-def createTable(state: State, onDelete: Callable[[], None]):
-    table = QTableWidget()
-    table.itemClicked.connect(lambda item: clickCell(state.data, item))  # type: ignore
-    table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
-
-    table.setItemDelegateForColumn(
-        state.data.tableHeaders.index("Edit"), EditButtonDelegate(state, table)
-    )
-    table.setItemDelegateForColumn(
-        state.data.tableHeaders.index("Delete"),
-        DeleteButtonDelegate(state, table, onDelete),
-    )
-    table.setItemDelegateForColumn(
-        state.data.tableHeaders.index("Anzahl"), CounterDelegate(state, table)
-    )
-    return table
-
-
 def createMenuBar(state: State):
     menuLayout = QHBoxLayout()
 
@@ -417,6 +173,14 @@ def createMenuBar(state: State):
 
     menuLayout.addWidget(addEntryButton)
 
+    # Button for importing many new Entries from a supplier sheet
+    importButton = QPushButton("📥")
+    importButton.setFixedSize(30, 30)
+    importButton.setToolTip("Einträge aus CSV- oder Excel-Datei importieren")
+    importButton.clicked.connect(lambda: showImportDialog(state))
+
+    menuLayout.addWidget(importButton)
+
     # Button for dumping the scanned Entries to a new Excel File
     saveToExcelButton = QPushButton("💾")
     saveToExcelButton.setFixedSize(30, 30)
@@ -425,6 +189,22 @@ def createMenuBar(state: State):
 
     menuLayout.addWidget(saveToExcelButton)
 
+    # Button for printing label sheets for many Entries
+    labelButton = QPushButton("🏷")
+    labelButton.setFixedSize(30, 30)
+    labelButton.setToolTip("Etiketten für gescannte Einträge oder einen Lagerort drucken")
+    labelButton.clicked.connect(lambda: showLabelDialog(state))
+
+    menuLayout.addWidget(labelButton)
+
+    # Button for the consumption of the Entries from the scan log
+    consumptionButton = QPushButton("📈")
+    consumptionButton.setFixedSize(30, 30)
+    consumptionButton.setToolTip("Verbrauch je Teil, Woche und Lagerort mit Bestellvorschlägen")
+    consumptionButton.clicked.connect(lambda: showConsumption(state))
+
+    menuLayout.addWidget(consumptionButton)
+
     # Button for clearing all scanned Entries from the UI
     searchButton = QPushButton("🔍")
     searchButton.setFixedSize(30, 30)
@@ -435,6 +215,15 @@ def createMenuBar(state: State):
 
     menuLayout.addWidget(searchButton)
 
+    # Button for sorting the scanned Entries along the pick route through the locations
+    routeButton = QPushButton("🧭")
+    routeButton.setFixedSize(30, 30)
+    routeButton.setCheckable(True)
+    routeButton.setToolTip("Liste nach Lagerort sortieren (Laufweg)")
+    routeButton.clicked.connect(lambda checked: state.setSortByLocation(checked))
+
+    menuLayout.addWidget(routeButton)
+
     # Button for clearing all scanned Entries from the UI
     clearAllButton = QPushButton("❌")
     clearAllButton.setFixedSize(30, 30)
@@ -472,23 +261,41 @@ def createMenuBar(state: State):
     )
     menuLayout.addItem(menuSpacer)
 
+    # Quick filter for the rows of the table, connected to the table in 'createScanView()'
+    filterInput = QLineEdit()
+    filterInput.setPlaceholderText("Liste filtern")
+    filterInput.setClearButtonEnabled(True)
+    filterInput.setMaximumWidth(250)
+
+    menuLayout.addWidget(filterInput)
+
     # Assuming MenuBar is defined elsewhere
-    menuBar = MenuBar(saveToExcelButton, addEntryButton)
+    menuBar = MenuBar(saveToExcelButton, addEntryButton, routeButton, filterInput)
 
     return menuWidget, menuBar
 
 
 def updateInputBar(state: State, inputBar: InputBar):
-    inputBar.text.clear()
-    inputBar.text.setPlaceholderText(
-        "Scan Code to add" if not state.delMode else "Scan Code to delete"
-    )
+    if state.inventory is not None:
+        inputBar.text.setPlaceholderText(
+            "Scan Code to count" if not state.delMode else "Scan Code to uncount"
+        )
+        inputBar.button.setText("Count" if not state.delMode else "Uncount")
+        bgColor = "rgb(80, 170, 255)" if not state.delMode else "rgb(255, 50, 0)"
+    else:
+        inputBar.text.setPlaceholderText(
+            "Scan Code to add" if not state.delMode else "Scan Code to delete"
+        )
+        inputBar.button.setText("Add" if not state.delMode else "Delete")
+        bgColor = "rgb(255, 165, 0)" if not state.delMode else "rgb(255, 50, 0)"
     inputBar.multiplierBox.setValue(state.multiplier)
-    inputBar.button.setText("Add" if not state.delMode else "Delete")
-    bgColor = "rgb(255, 165, 0)" if not state.delMode else "rgb(255, 50, 0)"
     inputBar.button.setStyleSheet(f"background: {bgColor}; color: rgb(0, 0, 0);")
 
 
+def updateRouteButton(state: State, menuBar: MenuBar):
+    menuBar.routeButton.setChecked(state.settings.sortByLocation)
+
+
 def updateMenuBar(data: Data, menuBar: MenuBar):
     """
     Updates the menu widget with the current state of the application.
@@ -561,7 +368,10 @@ def createScanView(
     menuWidget, menuBar = createMenuBar(state)
     rootLayout.addWidget(menuWidget)
 
-    table = createTable(state, lambda: updateMenuBar(state.data, menuBar))
+    rootLayout.addWidget(createInventoryPanel(state))
+
+    table, model, proxy = createTable(state)
+    menuBar.filterInput.textChanged.connect(proxy.setFilterText)
     rootLayout.addWidget(table)
 
     inputWidget, inputBar = createInputBar(state)
@@ -573,6 +383,84 @@ def createScanView(
 
     # Setting the initial state
     updateMenuBar(state.data, state.gui.menuBar)
-    updateTable(state, state.gui.table)
+    model.reset()
+    if LOCATION_COLUMN in model.headers:
+        table.resizeColumnToContents(model.headers.index(LOCATION_COLUMN))
     updateInputBar(state, state.gui.inputBar)
+    updateRouteButton(state, state.gui.menuBar)
+
+    subscribeScanView(state, rootWidget, table, model, menuBar, inputBar)
     return rootWidget
+
+
+def subscribeScanView(
+    state: State,
+    rootWidget: QWidget,
+    table: QTableView,
+    model: ScanTableModel,
+    menuBar: MenuBar,
+    inputBar: InputBar,
+):
+    """
+    Subscribes the parts of the scan view to the events of the data (see the ``events`` module).
+    Each event only updates the parts of the view that it changes.
+    The subscriptions are removed when the root widget is destroyed.
+    """
+    data = state.data
+
+    def onScanAdded(event: ScanAdded):
+        model.scanAdded(event.id)
+        updateMenuBar(data, menuBar)
+
+    def onScanRemoved(event: ScanRemoved):
+        model.scanRemoved(event.id, event.index)
+        updateMenuBar(data, menuBar)
+
+    def onScansCleared(_: ScansCleared):
+        model.reset()
+        updateMenuBar(data, menuBar)
+
+    def onModeChanged(_: ModeChanged):
+        updateInputBar(state, inputBar)
+        updateRouteButton(state, menuBar)
+        if state.settings.sortByLocation and table.horizontalHeader().sortIndicatorSection() >= 0:
+            # Show the pick route instead of the sorted column
+            table.horizontalHeader().setSortIndicator(-1, Qt.SortOrder.AscendingOrder)
+
+    def onColumnsChanged():
+        model.reset(set())
+        # The sorted column might have moved or be hidden
+        table.horizontalHeader().setSortIndicator(-1, Qt.SortOrder.AscendingOrder)
+
+    def onDataReloaded(event: DataReloaded):
+        diff = event.diff
+        scanned = set(data.scannedIDs)
+        if (
+            diff.structural
+            or diff.locationsChanged()
+            or diff.stockChanged
+            or diff.removedIDs & scanned
+        ):
+            model.reset()
+            updateMenuBar(data, menuBar)
+        else:
+            # Only redraw the rows that another user changed
+            model.rowsEdited(diff.changedIDs & scanned)
+
+    unsubscribers = [
+        data.events.subscribe(ScanAdded, onScanAdded),
+        data.events.subscribe(CountChanged, lambda event: model.countChanged(event.id)),
+        data.events.subscribe(ScanRemoved, onScanRemoved),
+        data.events.subscribe(ScansCleared, onScansCleared),
+        data.events.subscribe(RowEdited, lambda event: model.rowsEdited({event.id})),
+        data.events.subscribe(RowsEdited, lambda event: model.rowsEdited(event.ids)),
+        # The location texts of all rows might have changed
+        data.events.subscribe(LocationChanged, lambda _: model.reset()),
+        data.events.subscribe(DataReloaded, onDataReloaded),
+        data.events.subscribe(ScansReordered, lambda _: model.reset(set())),
+        data.events.subscribe(ColumnsChanged, lambda _: onColumnsChanged()),
+        data.events.subscribe(ModeChanged, onModeChanged),
+    ]
+    rootWidget.destroyed.connect(
+        lambda: [unsubscribe() for unsubscribe in unsubscribers]
+    )
@@ -9,8 +9,57 @@ import thefuzz.process
 
 
 import db
+from events import DataReloaded, RowDeleted, RowEdited, RowsAdded, RowsEdited
 
 searchWidget = None
+corpus = None
+
+
+class SearchCorpus:
+    """
+    Caches the searchable strings of all entries (see ``db.getSearchableStrings()``).
+
+    Only the strings of entries that were edited, deleted or changed by a reload are recreated.
+    """
+
+    def __init__(self, data: db.Data):
+        self.data = data
+        self.__strings = db.getSearchableStrings(data)
+        self.__list = None
+        data.events.subscribe(RowEdited, lambda event: self.update({event.id}))
+        data.events.subscribe(RowsAdded, lambda event: self.update(event.ids))
+        data.events.subscribe(RowsEdited, lambda event: self.update(event.ids))
+        data.events.subscribe(RowDeleted, lambda event: self.remove({event.id}))
+        data.events.subscribe(DataReloaded, self.__onReload)
+
+    def __onReload(self, event: DataReloaded):
+        diff = event.diff
+        if diff.structural:
+            self.__strings = db.getSearchableStrings(self.data)
+            self.__list = None
+            return
+        self.remove(diff.removedIDs)
+        self.update(diff.changedIDs | diff.addedIDs)
+
+    def update(self, ids):
+        if not ids:
+            return
+        for id in ids:
+            self.__strings.pop(id, None)
+        self.__strings.update(db.getSearchableStrings(self.data, ids))
+        self.__list = None
+
+    def remove(self, ids):
+        if not ids:
+            return
+        for id in ids:
+            self.__strings.pop(id, None)
+        self.__list = None
+
+    def strings(self):
+        if self.__list is None:
+            self.__list = list(self.__strings.values())
+        return self.__list
 
 
 class SecondWindow(QWidget):
@@ -30,7 +79,9 @@ def showSearch(data: db.Data, addId: Callable[[int], None]):
     data : The data to be searched
     addId : The callback to handle the found/selected ids.
     """
-    global searchWidget
+    global searchWidget, corpus
+    if corpus is None or corpus.data is not data:
+        corpus = SearchCorpus(data)
     if searchWidget is None:
         # Create the main widget
         searchWidget = SecondWindow()
@@ -94,7 +145,7 @@ def search(
         def inner():
             addId(id)
         return inner
-    strings = db.getSearchableStrings(data)
+    strings = corpus.strings()
     searchText = searchBar.text()
     results = thefuzz.process.extract(searchText, strings, limit=10)
 
@@ -11,12 +11,23 @@ from PySide6.QtWidgets import (
     QGroupBox,
     QRadioButton,
     QComboBox,
+    QSpinBox,
+    QCheckBox,
+    QListWidget,
+    QListWidgetItem,
+    QAbstractItemView,
 )
+from PySide6.QtCore import Qt
 
 from consts import SETTINGS_FILE_PATH
 import db
+from events import ColumnsChanged
+import remoteBackend
+import scanServer
+from integrity import checkIntegrity, showIntegrityReport
 import os
 from locationWidget import createLocationEditor
+from reports import showReport
 from state import *
 import json
 import copy
@@ -27,6 +38,10 @@ def settingsToDict(settings: Settings) -> dict[str, Any]:
         "language": settings.language,
         "persistScannedIDs": settings.persistScannedIDs,
         "unitSystem": settings.unitSystem,
+        "scanServerPort": settings.scanServerPort,
+        "scanServerPublic": settings.scanServerPublic,
+        "sortByLocation": settings.sortByLocation,
+        "columns": settings.columns,
     }
 
 def writeSettings(settings: Settings):
@@ -44,6 +59,10 @@ def readSettings():
     language = "German"
     unitSystem = "Imperial"
     persistScannedIDs = True
+    scanServerPort = 0
+    scanServerPublic = False
+    sortByLocation = False
+    columns = None
 
     # Settings File
     try:
@@ -53,6 +72,11 @@ def readSettings():
             language = data.get("language", "German")
             unitSystem = data.get("unitSystem", "Metrisch")
             persistScannedIDs = bool(data.get("persistScannedIDs", True))
+            scanServerPort = int(data.get("scanServerPort", 0))
+            scanServerPublic = bool(data.get("scanServerPublic", False))
+            sortByLocation = bool(data.get("sortByLocation", False))
+            if isinstance(data.get("columns"), list):
+                columns = [str(column) for column in data["columns"]]
     except Exception as e:
         print(f"Error reading settings file: {e}")
 
@@ -60,7 +84,11 @@ def readSettings():
         language=language,
         unitSystem=unitSystem,
         persistScannedIDs=persistScannedIDs,
-        filePath=filePath
+        filePath=filePath,
+        scanServerPort=scanServerPort,
+        scanServerPublic=scanServerPublic,
+        sortByLocation=sortByLocation,
+        columns=columns,
     )
     return config
 
@@ -183,6 +211,54 @@ def createSettings(state: State, closeSettings: Callable[[], None]):
     settingsLayout.addLayout(fileLayout)
     filePathDisplay.textChanged.connect(setSettingsChanged)
 
+    # --- Scan Server ---
+    scanServerGroup = QGroupBox("Scanner im Netzwerk")
+    scanServerLayout = QHBoxLayout()
+    scanServerLayout.addWidget(QLabel("Port (0 = aus):"))
+    scanServerPortBox = QSpinBox()
+    scanServerPortBox.setRange(0, 65535)
+    scanServerPortBox.setValue(tempSettings.scanServerPort)
+    scanServerLayout.addWidget(scanServerPortBox)
+    scanServerPublicBox = QCheckBox("Aus dem Netzwerk erreichbar")
+    scanServerPublicBox.setChecked(tempSettings.scanServerPublic)
+    scanServerLayout.addWidget(scanServerPublicBox)
+    scanServerGroup.setLayout(scanServerLayout)
+    settingsLayout.addWidget(scanServerGroup)
+    scanServerPortBox.valueChanged.connect(setSettingsChanged)
+    scanServerPublicBox.toggled.connect(setSettingsChanged)
+
+    # --- Columns of the List ---
+    columnsGroup = QGroupBox("Spalten der Liste (Haken = sichtbar, Reihenfolge per Drag and Drop)")
+    columnsLayout = QVBoxLayout()
+    columnsList = QListWidget()
+    columnsList.setDragDropMode(QAbstractItemView.DragDropMode.InternalMove)
+    columnsList.setMaximumHeight(150)
+    databaseColumns = [
+        header for header in state.data.tableHeaders if header not in db.BUTTON_HEADERS
+    ]
+    shownColumns = db.visibleHeaders(state.data, tempSettings.columns)
+    # The shown columns first in their order, then the hidden ones
+    for header in shownColumns + databaseColumns:
+        if header in db.BUTTON_HEADERS or columnsList.findItems(header, Qt.MatchFlag.MatchExactly):
+            continue
+        item = QListWidgetItem(header)
+        item.setFlags(item.flags() | Qt.ItemFlag.ItemIsUserCheckable)
+        item.setCheckState(
+            Qt.CheckState.Checked if header in shownColumns else Qt.CheckState.Unchecked
+        )
+        columnsList.addItem(item)
+    columnsLayout.addWidget(columnsList)
+    columnsGroup.setLayout(columnsLayout)
+    settingsLayout.addWidget(columnsGroup)
+    columnsList.itemChanged.connect(setSettingsChanged)
+    columnsList.model().rowsMoved.connect(setSettingsChanged)
+
+    def chosenColumns() -> list[str] | None:
+        """Returns the checked columns in their order, None if all columns are shown in the order of the database."""
+        items = [columnsList.item(row) for row in range(columnsList.count())]
+        checked = [item.text() for item in items if item.checkState() == Qt.CheckState.Checked]
+        return None if checked == databaseColumns else checked
+
     # --- Tree View for Storage Locations ---
     storageLocations = QLabel("Lagerorte")
     storageLocations.setStyleSheet("font-weight: bold; font-size: 20px")
@@ -191,6 +267,11 @@ def createSettings(state: State, closeSettings: Callable[[], None]):
     locationWidget = createLocationEditor(state)
     settingsLayout.addWidget(locationWidget)
 
+    reportButton = QPushButton("Bestand je Lagerort")
+    reportButton.setToolTip("Anzahl der Einträge und Stückzahl in jedem Lagerort inkl. Unterorte")
+    reportButton.clicked.connect(lambda: showReport(state))
+    settingsLayout.addWidget(reportButton)
+
     settingsLayout.addItem(
         QSpacerItem(0, 0, QSizePolicy.Policy.Minimum, QSizePolicy.Policy.Expanding)
     )
@@ -211,9 +292,15 @@ def createSettings(state: State, closeSettings: Callable[[], None]):
         """Saves the settings to the configuration file."""
         tempSettings.unitSystem = "Metrisch" if lightRadio.isChecked() else "Imperial"
         tempSettings.language = languageCombo.currentText()
+        tempSettings.scanServerPort = scanServerPortBox.value()
+        tempSettings.scanServerPublic = scanServerPublicBox.isChecked()
+        tempSettings.columns = chosenColumns()
 
         # Check if the file path exists
-        if not os.path.exists(filePathDisplay.text()):
+        if not (
+            os.path.exists(filePathDisplay.text())
+            or remoteBackend.isRemote(filePathDisplay.text())
+        ):
             filePathDisplay.setStyleSheet("QLineEdit { border: 2px solid red; }")
             QMessageBox.information(settingsWidget, "Error", "Datei existiert nicht.")
             return
@@ -221,6 +308,8 @@ def createSettings(state: State, closeSettings: Callable[[], None]):
 
         # Reload data from the file and save the configuration
         try:
+            # Pending changes belong to the old file
+            db.flush(state.data, state.settings.filePath)
             db.reloadFromFile(state.data, filePath)
         except Exception:
             filePathDisplay.setStyleSheet("QLineEdit { border: 2px solid red; }")
@@ -229,11 +318,22 @@ def createSettings(state: State, closeSettings: Callable[[], None]):
             )
             return
 
+        showIntegrityReport(checkIntegrity(state.data), settingsWidget)
+
         # Update storage locations
         # tempSettings.locations = getStorageLocations()
 
         # Save the updated settings
+        columnsChanged = tempSettings.columns != state.settings.columns
         state.settings = tempSettings
+        if columnsChanged:
+            state.data.events.emit(ColumnsChanged())
+        try:
+            scanServer.applySettings(state)
+        except OSError as e:
+            QMessageBox.warning(
+                settingsWidget, "Fehler", f"Scan-Server konnte nicht gestartet werden: {e}"
+            )
         writeSettings(state.settings)
         print("Settings saved successfully.")
         QMessageBox.information(
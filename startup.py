@@ -0,0 +1,145 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+import time
+from typing import Any, Callable
+from PySide6.QtCore import QEventLoop, QObject, Qt, Signal
+from PySide6.QtGui import QPixmap
+from PySide6.QtWidgets import QSplashScreen, QWidget
+
+import db
+import lazyLoad
+from state import Data, Settings
+
+
+@dataclass
+class StageTiming:
+    """
+    How long a stage of the startup took.
+
+    Parameters
+    ----------
+    name : The name of the stage, shown on the splash screen
+    seconds : The duration, None while the stage runs
+    """
+
+    name: str
+    seconds: float | None = None
+
+
+class Startup(QObject):
+    """
+    Runs the stages of the startup and shows them with their duration on a splash screen.
+
+    Independent stages, e.g. reading the database and the scanned IDs, run at the same time in worker threads
+    (``start()``), while the main thread builds the parts of the GUI that do not need their results (``run()``).
+    ``wait()`` returns the result of a stage once it is needed and runs an event loop until then.
+    The stages report when they start and end with signals, which update the splash screen in the main thread.
+    The timings are also printed, to find slow stages.
+
+    Parameters
+    ----------
+    logo : The image of the splash screen
+    """
+
+    # Emitted when a stage starts or ends, also from the worker threads
+    stageChanged = Signal()
+    # Emitted when a stage started with ``start()`` is done, from its worker thread
+    stageDone = Signal()
+
+    def __init__(self, logo: str):
+        super().__init__()
+        self.stages: list[StageTiming] = []
+        self.begin = time.perf_counter()
+        self.executor = ThreadPoolExecutor(thread_name_prefix="Startup")
+        pixmap = QPixmap(logo)
+        if not pixmap.isNull():
+            pixmap = pixmap.scaledToWidth(400, Qt.TransformationMode.SmoothTransformation)
+        self.splash = QSplashScreen(pixmap)
+        self.splash.show()
+        # Queued into the main thread when emitted by a worker thread
+        self.stageChanged.connect(self.showStages)
+        self.showStages()
+
+    def timed(self, name: str, function: Callable[..., Any], *args: Any) -> Callable[[], Any]:
+        stage = StageTiming(name)
+        self.stages.append(stage)
+
+        def call() -> Any:
+            self.stageChanged.emit()
+            start = time.perf_counter()
+            try:
+                return function(*args)
+            finally:
+                stage.seconds = time.perf_counter() - start
+                self.stageChanged.emit()
+
+        return call
+
+    def start(self, name: str, function: Callable[..., Any], *args: Any) -> Future:
+        """
+        Starts a stage in a worker thread. It must not use any widgets.
+        """
+        return self.executor.submit(self.timed(name, function, *args))
+
+    def run(self, name: str, function: Callable[..., Any], *args: Any) -> Any:
+        """
+        Runs a stage in the main thread, e.g. to create widgets.
+        """
+        return self.timed(name, function, *args)()
+
+    def wait(self, future: Future) -> Any:
+        """
+        Returns the result of a stage started with ``start()``.
+        While waiting, an event loop keeps the splash screen updated and ends when the stage is done.
+        Throws the exception of the stage.
+        """
+        loop = QEventLoop()
+        self.stageDone.connect(loop.quit)
+        try:
+            # Called right away if the stage is already done, then the loop is not needed
+            future.add_done_callback(lambda _: self.stageDone.emit())
+            while not future.done():
+                loop.exec()
+        finally:
+            self.stageDone.disconnect(loop.quit)
+        return future.result()
+
+    def showStages(self):
+        lines = [
+            f"{stage.name}: {stage.seconds:.2f} s" if stage.seconds is not None else f"{stage.name} …"
+            for stage in self.stages
+        ]
+        self.splash.showMessage(
+            "\n".join(lines),
+            Qt.AlignmentFlag.AlignBottom | Qt.AlignmentFlag.AlignLeft,
+        )
+
+    def hide(self):
+        """
+        Hides the splash screen, e.g. for a dialog during the startup.
+        """
+        self.splash.hide()
+
+    def finish(self, window: QWidget):
+        """
+        Closes the splash screen once the window is shown and prints the timings of all stages.
+        """
+        self.splash.finish(window)
+        self.executor.shutdown(wait=False)
+        for stage in self.stages:
+            seconds = f"{stage.seconds:.3f} s" if stage.seconds is not None else "-"
+            print(f"[Startup] {stage.name}: {seconds}")
+        print(f"[Startup] Gesamt: {time.perf_counter() - self.begin:.3f} s")
+
+
+def loadDatabase(settings: Settings) -> Data:
+    """
+    Loads the columns needed to scan (see ``lazyLoad.loadScanReady()``), all columns from a sync server.
+    Prints the memory used by the loaded entries (see ``db.memoryReport()``).
+    Throws a ValueError if the data could not be loaded or if the columns are invalid.
+    """
+    data = lazyLoad.loadScanReady(settings)
+    if data is None:
+        data = db.loadData(settings.filePath)
+    print(f"[Memory] {db.memoryReport(data.df)}")
+    return data
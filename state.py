@@ -1,15 +1,19 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+import random
+from typing import Callable, Iterable
 from PySide6.QtWidgets import (
     QApplication,
     QLineEdit,
     QPushButton,
     QSpinBox,
     QMainWindow,
-    QTableWidget,
+    QTableView,
 )
 
 import pandas as pd
 
+from events import CountChanged, EventBus, ModeChanged, ScanAdded, ScanRemoved
+
 __window: QMainWindow
 
 
@@ -75,10 +79,14 @@ class MenuBar:
     ----------
     saveToExcelButton : reference to the QPushButton that saves the data to an excel file
     addEntryButton : reference to the QPushButton that adds a new entry to the data
+    routeButton : reference to the checkable QPushButton that sorts the list along the pick route
+    filterInput : reference to the QLineEdit that filters the rows of the table
     """
 
     saveToExcelButton: QPushButton
     addEntryButton: QPushButton
+    routeButton: QPushButton
+    filterInput: QLineEdit
 
 
 @dataclass
@@ -95,14 +103,14 @@ class GUI:
     Parameters
     ----------
     app : The UI Application Context.
-    table : The table widget.
+    table : The table view of the scanned entries, see the ``scanTable`` module.
     inputBar : Reference to the inputBar struct.
     menuBar : Reference to the menuBar struct.
     """
 
     app: QApplication
     window: QMainWindow
-    table: QTableWidget
+    table: QTableView
     inputBar: InputBar
     menuBar: MenuBar
 
@@ -130,6 +138,11 @@ class Settings:
     language : The display language (Example)
     unitSystem : Which Unit System ("Metrisch" doer "Imperial") to use (Test)
     persistScannedIDs : Whether to persist the scanned IDs over sessions
+    scanServerPort : Port on which codes from other scanners are accepted, 0 disables it (see the ``scanServer`` module)
+    scanServerPublic : Whether the scan server can be reached from the network or only from this computer
+    sortByLocation : Whether the list of scanned entries is sorted along the pick route (see the ``pickRoute`` module)
+    columns : The columns shown in the list of scanned entries in their order, None for all columns of the database.
+        Hidden columns are not converted to text for the table (see ``db.visibleHeaders()``).
 
     """
 
@@ -137,6 +150,10 @@ class Settings:
     language: str
     unitSystem: str
     persistScannedIDs: bool
+    scanServerPort: int = 0
+    scanServerPublic: bool = False
+    sortByLocation: bool = False
+    columns: list[str] | None = None
 
 
 @dataclass
@@ -152,6 +169,219 @@ class DBInfo:
     version: str
 
 
+@dataclass
+class DataDiff:
+    """
+    The changes between the data in memory and the data in the database.
+    Returned by ``db.reloadFromFile()``, which only applies these changes to the data.
+
+    Parameters
+    ----------
+    addedIDs : The ids of the entries that are new in the database
+    removedIDs : The ids of the entries that were removed from the database
+    changedIDs : The ids of the entries whose values changed
+    addedLocations : The ids of the new locations
+    removedLocations : The ids of the removed locations
+    changedLocations : The ids of the locations that were renamed or moved
+    stockChanged : True if the further locations of entries changed (``Data.stock``)
+    structural : True if the columns changed or the ids are not unique.
+        Then the whole data was replaced and all ids are in ``changedIDs``.
+    """
+
+    addedIDs: set[int] = field(default_factory=set)
+    removedIDs: set[int] = field(default_factory=set)
+    changedIDs: set[int] = field(default_factory=set)
+    addedLocations: set[str] = field(default_factory=set)
+    removedLocations: set[str] = field(default_factory=set)
+    changedLocations: set[str] = field(default_factory=set)
+    stockChanged: bool = False
+    structural: bool = False
+
+    def rowsChanged(self) -> bool:
+        return bool(self.addedIDs or self.removedIDs or self.changedIDs)
+
+    def locationsChanged(self) -> bool:
+        return bool(
+            self.addedLocations or self.removedLocations or self.changedLocations
+        )
+
+    def empty(self) -> bool:
+        return not (
+            self.structural
+            or self.rowsChanged()
+            or self.locationsChanged()
+            or self.stockChanged
+        )
+
+
+@dataclass
+class StockIndex:
+    """
+    Where the entries are stored: the main location (``Position`` and ``Stueckzahl`` columns)
+    and the further locations of the stock sheet (``Data.stock``).
+    Answers "where is entry X" and "what is in location Y" without searching the rows.
+
+    Built by ``db.stockIndex()`` when it is first needed.
+    Single edited rows update it, it is rebuilt after many rows changed at once (e.g. reload).
+
+    Parameters
+    ----------
+    byEntry : The locations and the amount stored there by entry id, the main location comes first
+    byLocation : The entries and their amount by location id
+    further : The further locations and their amount by entry id
+    """
+
+    byEntry: dict[int, dict[str, int]] = field(default_factory=dict)
+    byLocation: dict[str, dict[int, int]] = field(default_factory=dict)
+    further: dict[int, dict[str, int]] = field(default_factory=dict)
+
+    def setEntry(self, id: int, main: str, amount: int):
+        """
+        Sets the main location of the entry and its amount, an empty location if it has none.
+        """
+        self.__unlink(id)
+        locations: dict[str, int] = {}
+        if main != "":
+            locations[main] = amount
+        for location, furtherAmount in self.further.get(id, {}).items():
+            locations[location] = locations.get(location, 0) + furtherAmount
+        if not locations:
+            return
+        self.byEntry[id] = locations
+        for location, locationAmount in locations.items():
+            self.byLocation.setdefault(location, {})[id] = locationAmount
+
+    def removeEntry(self, id: int):
+        self.__unlink(id)
+        self.further.pop(id, None)
+
+    def locationsOf(self, id: int) -> dict[str, int]:
+        return self.byEntry.get(id, {})
+
+    def entriesIn(self, locations: Iterable[str]) -> dict[int, int]:
+        """
+        Returns the entries stored in any of the locations with their total amount there.
+        Pass ``location.getSubtreeIds()`` to get everything in a location and its children.
+        """
+        entries: dict[int, int] = {}
+        for location in locations:
+            for id, amount in self.byLocation.get(location, {}).items():
+                entries[id] = entries.get(id, 0) + amount
+        return entries
+
+    def __unlink(self, id: int):
+        for location in self.byEntry.pop(id, {}):
+            entries = self.byLocation[location]
+            entries.pop(id, None)
+            if not entries:
+                del self.byLocation[location]
+
+
+@dataclass
+class RowConflict:
+    """
+    An entry that was changed by this user and by another user since it was loaded.
+    Found by ``db.reloadFromFile()`` when the pending changes are merged into the database.
+
+    Parameters
+    ----------
+    id : The id of the entry
+    columns : The columns both users changed to different values, the value of this user is kept
+    deletedByOthers : The other user deleted the entry, it is added again with the values of this user
+    deletedHere : This user deleted the entry that the other user changed, it stays deleted
+    """
+
+    id: int
+    columns: list[str] = field(default_factory=list)
+    deletedByOthers: bool = False
+    deletedHere: bool = False
+
+
+@dataclass
+class PendingChanges:
+    """
+    Changes to the data that are not yet written to the database.
+
+    Filled by ``db.Row.write()`` and ``db.Row.delete()`` and written with ``db.flush()``.
+    When the data is reloaded, the pending changes are applied on top of the new data, so they are not lost.
+
+    Part of the ``Data`` struct.
+
+    Parameters
+    ----------
+    rows : The values of the written rows by their id
+    deleted : The ids of the deleted rows
+    base : The values the written and deleted rows had when they were loaded, None for new rows.
+        Used to merge the changes with the changes of other users, see ``db.reloadFromFile()``.
+    mutations : The amount of writes and deletes since the last flush
+    locationsBase : The locations before they were changed, None if they were not changed.
+        A sync server merges the changed locations with the changes of other users with it, see ``location.mergeLocations()``.
+    stockBase : The further locations of entries (``Data.stock``) before they were changed, None if they were not changed.
+        Used like ``locationsBase``, see ``db.mergeStock()``.
+    onDirty : Called after every mutation that did not cause a flush, e.g. to (re)start the idle timer of the ``saveScheduler.SaveScheduler``.
+        If None, every mutation is written to the database immediately.
+    """
+
+    rows: dict[int, list[int | str]] = field(default_factory=dict)
+    deleted: set[int] = field(default_factory=set)
+    base: dict[int, list[int | str] | None] = field(default_factory=dict)
+    mutations: int = 0
+    locationsBase: list[Location] | None = None
+    stockBase: pd.DataFrame | None = None
+    onDirty: Callable[[], None] | None = None
+
+    def dirty(self) -> bool:
+        return self.mutations > 0
+
+    def clear(self):
+        self.rows.clear()
+        self.deleted.clear()
+        self.base.clear()
+        self.mutations = 0
+        self.locationsBase = None
+        self.stockBase = None
+
+
+@dataclass
+class IdAllocator:
+    """
+    Hands out new IDs and codes for entries, without sorting the IDs or searching the dataframe for the codes.
+
+    Filled by ``db.newDataFromExel()`` and kept up to date when rows are written or reloaded.
+    Handed out IDs and codes are reserved, even if the entry is never saved.
+
+    Part of the ``Data`` struct.
+
+    Parameters
+    ----------
+    maxId : The highest ID that is used or was handed out
+    usedCodes : All codes that are used or were handed out
+    """
+
+    maxId: int = 0
+    usedCodes: set[str] = field(default_factory=set)
+
+    def nextIds(self, count: int = 1) -> list[int]:
+        ids = list(range(self.maxId + 1, self.maxId + 1 + count))
+        self.maxId += count
+        return ids
+
+    def nextCodes(self, count: int = 1) -> list[str]:
+        """Returns new random 10 digit codes."""
+        codes: list[str] = []
+        while len(codes) < count:
+            code = str(random.randint(0, 9999999999)).zfill(10)
+            if code not in self.usedCodes:
+                self.usedCodes.add(code)
+                codes.append(code)
+        return codes
+
+    def reserve(self, ids: Iterable[int], codes: Iterable[str]):
+        """Marks the IDs and codes as used."""
+        self.maxId = max(self.maxId, max(ids, default=0))
+        self.usedCodes.update(codes)
+
+
 @dataclass
 class Data:
     """
@@ -171,6 +401,16 @@ class Data:
     df : The dataframe that holds the data from the excel file.
         Should not be used directly, instead use the ``db`` Module to get data.
     locations : A list of all Locations
+    pending : The changes that are not yet written to the database
+    events : Notifies about changes to the data, see the ``events`` module
+    allocator : Hands out the IDs and codes for new entries
+    fileStamp : Path, modification time and size of the excel file when it was last read or written.
+        If the file still has this stamp, nobody else changed it and it does not need to be read again.
+    stock : The further locations of entries with their amount (columns ``consts.STOCK_COLUMNS``)
+    stockIndex : Where the entries are stored, use ``db.stockIndex()`` to get it.
+        Set to None when it needs to be rebuilt.
+    projected : Whether only some columns of the database were loaded (see ``db.newDataFromExel()``).
+        Such data can not be saved, the whole file is written from the dataframe.
     """
 
     tableHeaders: list[str]
@@ -180,13 +420,30 @@ class Data:
     df: pd.DataFrame
     locations: list[Location]
     info: DBInfo
+    pending: PendingChanges = field(default_factory=PendingChanges)
+    events: EventBus = field(default_factory=EventBus)
+    allocator: IdAllocator = field(default_factory=IdAllocator)
+    fileStamp: tuple[str, float, int] | None = None
+    stock: pd.DataFrame = field(default_factory=pd.DataFrame)
+    stockIndex: StockIndex | None = None
+    projected: bool = False
 
     def addId(self, id: int):
         if id not in self.scannedIDs:
             self.scannedIDs.append(id)
             self.anzahlScannedItems[id] = 1
+            self.events.emit(ScanAdded(id))
         else:
             self.anzahlScannedItems[id] += 1
+            self.events.emit(CountChanged(id))
+
+    def removeId(self, id: int):
+        if id not in self.scannedIDs:
+            return
+        index = self.scannedIDs.index(id)
+        self.scannedIDs.pop(index)
+        self.anzahlScannedItems.pop(id, None)
+        self.events.emit(ScanRemoved(id, index))
 
     def rowCount(self) -> int:
         return len(self.scannedIDs)
@@ -200,7 +457,37 @@ class Data:
         return self.anzahlScannedItems[int(id)]
 
     def setScanCount(self, id: int, scanCount: int):
+        if self.anzahlScannedItems.get(id) == scanCount:
+            return
         self.anzahlScannedItems[id] = scanCount
+        self.events.emit(CountChanged(id))
+
+
+@dataclass
+class InventorySession:
+    """
+    A running stock-taking, started and finished with a special code (see the ``inventory`` module).
+    While it runs, scans count the pieces of the entries instead of adding them to the list.
+    Nothing is written until the session is finished.
+
+    Part of the ``State`` struct.
+
+    Parameters
+    ----------
+    counted : The counted pieces by entry id
+    stored : The stored amount of the entries when they were counted first, by entry id
+    """
+
+    counted: dict[int, int] = field(default_factory=dict)
+    stored: dict[int, int] = field(default_factory=dict)
+
+    def changes(self) -> dict[int, int]:
+        """
+        Returns the counted pieces of the entries that differ from their stored amount.
+        """
+        return {
+            id: count for id, count in self.counted.items() if count != self.stored.get(id)
+        }
 
 
 @dataclass
@@ -222,6 +509,7 @@ class State:
         None before the gui is created
     multiplier : The multiplier that is currently used when scanning codes
     delMode : If the delete mode is active
+    inventory : The running stock-taking, None if there is none
     """
 
     data: Data
@@ -229,6 +517,24 @@ class State:
     settings: Settings
     multiplier: int
     delMode: bool
+    inventory: InventorySession | None = None
 
     def setMultiplier(self, value: int):
+        if self.multiplier == value:
+            return
         self.multiplier = value
+        self.data.events.emit(ModeChanged())
+
+    def setDelMode(self, value: bool):
+        self.delMode = value
+        self.data.events.emit(ModeChanged())
+
+    def setInventory(self, session: InventorySession | None):
+        self.inventory = session
+        self.data.events.emit(ModeChanged())
+
+    def setSortByLocation(self, value: bool):
+        if self.settings.sortByLocation == value:
+            return
+        self.settings.sortByLocation = value
+        self.data.events.emit(ModeChanged())
@@ -0,0 +1,424 @@
+import argparse
+from dataclasses import dataclass, field
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import pandas as pd
+
+from consts import *
+import db
+from integrity import checkIntegrity
+from location import getLocation
+import remoteBackend
+from state import DBInfo, Location, Settings, State
+
+# Operations of a simulated client
+WRITE = "write"
+CREATE = "create"
+DELETE = "delete"
+LOCATION = "location"
+
+
+@dataclass
+class StressConfig:
+    """
+    Settings of a stress test run, see ``stressTest.main()`` for the command line options.
+
+    Parameters
+    ----------
+    path : The workbook (or the address of a sync server) all clients work on
+    clients : Number of simulated clients, each one is its own process
+    duration : Seconds every client runs
+    rates : Operations per second of every client, by operation
+    seed : Seed for the random choices, every client adds its index
+    """
+
+    path: str
+    clients: int
+    duration: float
+    rates: dict[str, float]
+    seed: int = 0
+
+
+@dataclass
+class ClientResult:
+    """
+    What a simulated client did and what it expects to find in the workbook at the end.
+
+    Parameters
+    ----------
+    index : Index of the client
+    latencies : Seconds every successful operation took, by operation
+    errors : Error messages of failed operations
+    expectedValues : The last value the client wrote to the type column of its entries, by id
+    createdValues : The type of the entries the client created, by code.
+        Their ids can change if another client created an entry with the same id at the same time.
+    deletedIds : The ids of the entries the client deleted
+    expectedLocation : The id and last name of the location the client renamed
+    """
+
+    index: int
+    latencies: dict[str, list[float]] = field(default_factory=dict)
+    errors: list[str] = field(default_factory=list)
+    expectedValues: dict[int, str] = field(default_factory=dict)
+    createdValues: dict[str, str] = field(default_factory=dict)
+    deletedIds: set[int] = field(default_factory=set)
+    expectedLocation: tuple[str, str] | None = None
+
+
+def createWorkbook(path: str, rows: int):
+    """
+    Creates a workbook with generated entries and a few locations.
+    """
+    locations = [
+        Location("Keller", "stress-keller", None),
+        Location("Regal 1", "stress-regal-1", "stress-keller"),
+        Location("Regal 2", "stress-regal-2", "stress-keller"),
+    ]
+    ids = list(range(1, rows + 1))
+    df = pd.DataFrame(
+        {
+            ID_COLUMN: ids,
+            CODE_COLUMN: [str(1000000000 + id) for id in ids],
+            # Few distinct types, so the column is stored as categories (see ``db.compactColumns()``)
+            TYPE_COLUMN: [f"Typ {id % 5}" for id in ids],
+            DESC_COLUMN: [f"Bauteil {id}" for id in ids],
+            IDENT_COLUMN: [f"ID-{id}" for id in ids],
+            LOCATION_COLUMN: [locations[1 + id % 2].id for id in ids],
+            STORED_AMOUNT_COLUMN: [id % 10 for id in ids],
+            URL_DATASHEET_COLUMN: ["" for _ in ids],
+            URL_ORDER_COLUMN: ["" for _ in ids],
+        }
+    )
+    data = db.newDataFromContents(df, locations, DBInfo(REQUIRED_DB_VERSION))
+    db.saveToExel(data, path)
+
+
+def checkNewCategories(directory: str) -> list[str]:
+    """
+    Two stations each give an entry types that did not exist before and then both reload.
+    The new types are new categories on both sides and the first station still has a category that is no longer
+    in the file, so the categories of the file and the stations differ and the reload has to merge them.
+    Returns the problems found.
+    """
+    path = os.path.join(directory, "categories.xlsx")
+    createWorkbook(path, 20)
+    stations = [db.loadData(path), db.loadData(path)]
+    changes = [(0, 1, "Kategorie A"), (0, 1, "Kategorie C"), (1, 2, "Kategorie B")]
+    expected = {id: value for _, id, value in changes}
+    problems: list[str] = []
+    try:
+        for index, id, value in changes:
+            data = stations[index]
+            row = db.newRow(data, id)
+            row.setValue(TYPE_COLUMN, value)
+            row.write(data, path)
+        for data in stations:
+            db.reloadFromFile(data, path)
+    except Exception as e:
+        return [f"Neue Kategorien: {type(e).__name__}: {e}"]
+    for index, data in enumerate(stations):
+        for id, value in expected.items():
+            found = db.newRow(data, id).getValue(TYPE_COLUMN)
+            if found != value:
+                problems.append(
+                    f"Neue Kategorien: Arbeitsplatz {index}, ID {id}: erwartet '{value}', gefunden '{found}'"
+                )
+    return problems
+
+
+def checkStaleLocations(target: str) -> list[str]:
+    """
+    Two stations rename different locations, the second one from a copy loaded before the first rename.
+    A sync server has to merge both renames instead of replacing the locations with the stale copy.
+    Returns the problems found.
+    """
+    first = State(db.loadData(target), None, Settings(target, "German", "Metrisch", False), 1, False)
+    second = db.loadData(target)
+    names = {"stress-regal-1": "Regal 1 (Arbeitsplatz 0)", "stress-regal-2": "Regal 2 (Arbeitsplatz 1)"}
+    try:
+        db.renameLocation(first, getLocation(first.data.locations, "stress-regal-1"), names["stress-regal-1"])
+        # Without reloading, like a station that sends its change right after another one
+        db.rememberLocations(second)
+        getLocation(second.locations, "stress-regal-2").name = names["stress-regal-2"]
+        db.save(second, target, locations=True)
+        locations = db.loadData(target).locations
+    except Exception as e:
+        return [f"Veraltete Lagerorte: {type(e).__name__}: {e}"]
+    found = {location.id: location.name for location in locations}
+    return [
+        f"Veraltete Lagerorte: '{name}' verloren, gefunden '{found.get(id)}'"
+        for id, name in names.items()
+        if found.get(id) != name
+    ]
+
+
+def runClient(config: StressConfig, index: int) -> ClientResult:
+    """
+    Runs one simulated client for the configured duration.
+
+    Every client only edits and deletes the original entries whose id modulo the number of clients is its index
+    and only renames its own location. So every value that is missing at the end is a lost update,
+    not a legitimate overwrite by another client.
+    Every operation is written immediately, like five stations pressing "Speichern" at the same time.
+    """
+    rng = random.Random(config.seed + index)
+    result = ClientResult(index)
+    settings = Settings(config.path, "German", "Metrisch", False)
+    try:
+        state = State(db.loadData(config.path), None, settings, 1, False)
+    except ValueError as e:
+        result.errors.append(f"load: {e}")
+        return result
+    data = state.data
+    ids = data.df[ID_COLUMN]
+    ownIds = [int(id) for id in ids[ids % config.clients == index]]
+
+    def write():
+        if not ownIds:
+            return
+        id = rng.choice(ownIds)
+        row = db.newRow(data, id)
+        value = f"client {index} #{rng.randrange(10**9)}"
+        row.setValue(TYPE_COLUMN, value)
+        row.write(data, config.path)
+        result.expectedValues[id] = value
+
+    def create():
+        row = db.newEmptyRow(data)
+        value = f"client {index} neu #{rng.randrange(10**9)}"
+        row.setValue(TYPE_COLUMN, value)
+        row.setValue(STORED_AMOUNT_COLUMN, 1)
+        row.write(data, config.path)
+        result.createdValues[row.code()] = value
+
+    def delete():
+        if not ownIds:
+            return
+        id = ownIds.pop(rng.randrange(len(ownIds)))
+        db.newRow(data, id).delete(data, config.path)
+        result.deletedIds.add(id)
+        result.expectedValues.pop(id, None)
+
+    locationId = f"stress-client-{index}"
+
+    def location():
+        name = f"Client {index} #{rng.randrange(10**9)}"
+        existing = [loc for loc in data.locations if loc.id == locationId]
+        if existing:
+            db.renameLocation(state, existing[0], name)
+        else:
+            db.addLocation(state, Location(name, locationId, None))
+        result.expectedLocation = (locationId, name)
+
+    operations = {WRITE: write, CREATE: create, DELETE: delete, LOCATION: location}
+    kinds = [kind for kind, rate in config.rates.items() if rate > 0]
+    weights = [config.rates[kind] for kind in kinds]
+    totalRate = sum(weights)
+    if totalRate == 0:
+        return result
+
+    end = time.perf_counter() + config.duration
+    nextStart = time.perf_counter()
+    while True:
+        nextStart += rng.expovariate(totalRate)
+        now = time.perf_counter()
+        if nextStart >= end:
+            break
+        if nextStart > now:
+            time.sleep(nextStart - now)
+        kind = rng.choices(kinds, weights)[0]
+        start = time.perf_counter()
+        try:
+            operations[kind]()
+            result.latencies.setdefault(kind, []).append(time.perf_counter() - start)
+        except Exception as e:
+            result.errors.append(f"{kind}: {type(e).__name__}: {e}")
+            # Start over from the database, like a user reopening the program
+            try:
+                data.pending.clear()
+                db.reloadFromFile(data, config.path)
+            except Exception:
+                pass
+    return result
+
+
+def watchFile(path: str, duration: float, interval: float) -> tuple[int, int]:
+    """
+    Reads the workbook again and again while the clients run.
+    Returns how often it was read and how often it could not be read (a half written or corrupted file).
+    """
+    reads = 0
+    failures = 0
+    end = time.perf_counter() + duration
+    while time.perf_counter() < end:
+        reads += 1
+        try:
+            db.newDataFromExel(path)
+        except ValueError:
+            failures += 1
+        time.sleep(interval)
+    return reads, failures
+
+
+def percentile(values: list[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def verify(path: str, results: list[ClientResult]) -> list[str]:
+    """
+    Compares the final workbook with what the clients expect. Returns the problems found.
+    """
+    try:
+        data = db.newDataFromExel(path)
+    except ValueError as e:
+        return [f"Die Datei ist beschädigt: {e}"]
+    problems: list[str] = []
+    values = dict(zip(data.df[ID_COLUMN].astype(int), data.df[TYPE_COLUMN].astype(str)))
+    valuesByCode = dict(zip(data.df[CODE_COLUMN].astype(str), data.df[TYPE_COLUMN].astype(str)))
+    names = {location.id: location.name for location in data.locations}
+    for result in results:
+        for id, value in result.expectedValues.items():
+            if values.get(id) != value:
+                problems.append(
+                    f"Verlorene Änderung: Client {result.index}, ID {id}: "
+                    f"erwartet '{value}', gefunden '{values.get(id)}'"
+                )
+        for code, value in result.createdValues.items():
+            if valuesByCode.get(code) != value:
+                problems.append(
+                    f"Verlorener neuer Eintrag: Client {result.index}, Code {code}: "
+                    f"erwartet '{value}', gefunden '{valuesByCode.get(code)}'"
+                )
+        for id in result.deletedIds:
+            if id in values:
+                problems.append(f"Verlorenes Löschen: Client {result.index}, ID {id}")
+        if result.expectedLocation is not None:
+            id, name = result.expectedLocation
+            if names.get(id) != name:
+                problems.append(
+                    f"Verlorene Lagerort-Änderung: Client {result.index}: "
+                    f"erwartet '{name}', gefunden '{names.get(id)}'"
+                )
+    report = checkIntegrity(data)
+    if not report.ok():
+        problems.append(f"Integritätsprobleme: {report.summary()}")
+    return problems
+
+
+def runServer(path: str, port: int):
+    import syncServer
+
+    syncServer.main([path, "--host", "127.0.0.1", "--port", str(port)])
+
+
+def main(args: list[str]) -> int:
+    parser = argparse.ArgumentParser(
+        description="Simuliert mehrere Arbeitsplätze, die gleichzeitig in eine Excel-Datei schreiben. "
+        "Beendet sich mit 0, wenn keine Änderung verloren ging und die Datei lesbar ist."
+    )
+    parser.add_argument("--clients", type=int, default=5, help="Anzahl der Arbeitsplätze")
+    parser.add_argument("--duration", type=float, default=20, help="Laufzeit in Sekunden")
+    parser.add_argument("--rows", type=int, default=200, help="Anzahl der Einträge der erzeugten Datei")
+    parser.add_argument("--workbook", help="Vorhandene Excel-Datei verwenden (wird kopiert)")
+    parser.add_argument("--dir", help="Arbeitsordner (Standard: temporärer Ordner)")
+    parser.add_argument("--write-rate", type=float, default=1, help="Änderungen pro Sekunde und Arbeitsplatz")
+    parser.add_argument("--create-rate", type=float, default=0.2, help="Neue Einträge pro Sekunde und Arbeitsplatz")
+    parser.add_argument("--delete-rate", type=float, default=0.1, help="Löschungen pro Sekunde und Arbeitsplatz")
+    parser.add_argument("--location-rate", type=float, default=0.1, help="Lagerort-Änderungen pro Sekunde und Arbeitsplatz")
+    parser.add_argument("--server", type=int, metavar="PORT", help="Über einen Sync-Server auf diesem Port arbeiten")
+    parser.add_argument("--seed", type=int, default=0)
+    options = parser.parse_args(args)
+
+    directory = options.dir or tempfile.mkdtemp(prefix="logistic-stress-")
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, "stress.xlsx")
+    if options.workbook:
+        shutil.copy(options.workbook, path)
+    else:
+        createWorkbook(path, options.rows)
+
+    # Every client starts as a fresh process like a separate station, no state (e.g. connections) is inherited
+    context = multiprocessing.get_context("spawn")
+    server = None
+    target = path
+    if options.server:
+        server = context.Process(target=runServer, args=(path, options.server))
+        server.start()
+        target = f"http://127.0.0.1:{options.server}"
+        # Wait until the server accepts connections
+        for _ in range(100):
+            try:
+                db.loadData(target)
+                break
+            except ValueError:
+                time.sleep(0.1)
+
+    config = StressConfig(
+        path=target,
+        clients=options.clients,
+        duration=options.duration,
+        rates={
+            WRITE: options.write_rate,
+            CREATE: options.create_rate,
+            DELETE: options.delete_rate,
+            LOCATION: options.location_rate,
+        },
+        seed=options.seed,
+    )
+    print(f"{config.clients} Arbeitsplätze, {config.duration}s, Datei: {path}")
+
+    checkProblems = checkNewCategories(directory)
+    if server is not None:
+        # Before the clients start, so only the two stations of the check change the locations
+        checkProblems += checkStaleLocations(target)
+
+    start = time.perf_counter()
+    with context.Pool(config.clients + 1) as pool:
+        watcher = pool.apply_async(watchFile, (path, config.duration, 0.05))
+        results = pool.starmap(runClient, [(config, i) for i in range(config.clients)])
+        reads, failedReads = watcher.get()
+    elapsed = time.perf_counter() - start
+
+    if server is not None:
+        remoteBackend.connect(target).request("POST", "/save", {})
+        server.terminate()
+        server.join()
+
+    problems = checkProblems + verify(path, results)
+
+    latencies: dict[str, list[float]] = {}
+    for result in results:
+        for kind, values in result.latencies.items():
+            latencies.setdefault(kind, []).extend(values)
+    errors = [error for result in results for error in result.errors]
+    operations = sum(len(values) for values in latencies.values())
+
+    print(f"\nDurchsatz: {operations / elapsed:.1f} Operationen/s ({operations} in {elapsed:.1f}s)")
+    print(f"{'Operation':<10} {'Anzahl':>7} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for kind, values in sorted(latencies.items()):
+        print(
+            f"{kind:<10} {len(values):>7} "
+            + " ".join(f"{percentile(values, p) * 1000:>8.1f}" for p in [50, 90, 99, 100])
+        )
+    print(f"\nFehlgeschlagene Operationen: {len(errors)}")
+    for error in errors[:10]:
+        print(f"  {error}")
+    print(f"Unlesbare Datei beim Mitlesen: {failedReads} von {reads}")
+    print(f"Verlorene Änderungen / Probleme am Ende: {len(problems)}")
+    for problem in problems[:20]:
+        print(f"  {problem}")
+
+    ok = not problems and not errors and failedReads == 0
+    print("\nBESTANDEN" if ok else "\nNICHT BESTANDEN")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main(sys.argv[1:]))
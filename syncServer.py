@@ -0,0 +1,279 @@
+import argparse
+import copy
+from dataclasses import asdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import sys
+import threading
+from typing import Any
+from urllib.parse import parse_qs, urlsplit
+import pandas as pd
+
+from consts import (
+    CODE_COLUMN,
+    LOCATION_ID_COLUMN,
+    LOCATION_NAME_COLUMN,
+    LOCATION_PARENT_COLUMN,
+    SAVE_IDLE_MS,
+    STOCK_COLUMNS,
+)
+import db
+from location import mergeLocations, parseLocations
+from state import PendingChanges, RowConflict
+
+
+class SyncStore:
+    """
+    Holds the data of the excel file in memory and is the only one writing the file.
+
+    Every change increases the version. Changes are written to the file after ``idleMs`` milliseconds
+    without a new change, so many edits of many clients cost a single write.
+
+    Parameters
+    ----------
+    path : The path of the excel file
+    idleMs : Milliseconds without a change before the file is written
+    """
+
+    def __init__(self, path: str, idleMs: int = SAVE_IDLE_MS):
+        self.path = path
+        self.idleMs = idleMs
+        self.data = db.newDataFromExel(path)
+        self.version = 0
+        self.savedVersion = 0
+        self.lock = threading.Lock()
+        # Only one write of the file at a time
+        self.saveLock = threading.Lock()
+        self.saveTimer: threading.Timer | None = None
+        # The serialized snapshot of the current version, shared by all clients
+        self.snapshotCache: tuple[int, bytes] | None = None
+
+    def snapshot(self) -> tuple[int, bytes]:
+        """
+        Returns the version and all data as JSON, see ``db.snapshotOfData()``.
+        """
+        with self.lock:
+            if self.snapshotCache is None or self.snapshotCache[0] != self.version:
+                snapshot = db.snapshotOfData(self.data, self.version)
+                body = json.dumps(snapshot).encode("utf-8")
+                self.snapshotCache = (self.version, body)
+            return self.snapshotCache
+
+    def lookup(self, code: str) -> list[Any] | None:
+        with self.lock:
+            df = self.data.df
+            rows = df.loc[df[CODE_COLUMN].astype(str) == code, self.data.dataHeaders]
+            if rows.empty:
+                return None
+            return db.toJsonValues(rows.values.tolist()[:1])[0]
+
+    def applyRows(
+        self,
+        headers: list[str],
+        rows: list[list[Any]],
+        deleted: list[int],
+        base: dict[int, list[Any] | None],
+    ) -> tuple[int, int, list[RowConflict]]:
+        """
+        Merges changed, new and deleted rows (see ``db.applyChanges()``).
+        Returns the previous and the new version and the conflicts with changes of other clients.
+        """
+        with self.lock:
+            conflicts = db.applyChanges(self.data, rows, deleted, headers, base)
+            return *self.__changed(), conflicts
+
+    def setLocations(
+        self, locations: list[dict[str, Any]], base: list[dict[str, Any]] | None
+    ) -> tuple[int, int]:
+        """
+        Merges the locations changed by a client with the changes of other clients (see ``location.mergeLocations()``),
+        replaces all locations if there is no base. Returns the previous and the new version.
+        """
+        mine = parseLocations(self.__locationSheet(locations))
+        with self.lock:
+            if base is None:
+                self.data.locations = mine
+            else:
+                self.data.locations = mergeLocations(
+                    parseLocations(self.__locationSheet(base)), mine, self.data.locations
+                )
+            return self.__changed()
+
+    def setStock(self, rows: list[list[Any]], base: list[list[Any]] | None) -> tuple[int, int]:
+        """
+        Merges the further locations of entries changed by a client with the changes of other clients
+        (see ``db.mergeStock()``), replaces them if there is no base. Returns the previous and the new version.
+        """
+        mine = db.newStock(pd.DataFrame(rows, columns=STOCK_COLUMNS))
+        with self.lock:
+            if base is None:
+                self.data.stock = mine
+            else:
+                self.data.stock = db.mergeStock(
+                    db.newStock(pd.DataFrame(base, columns=STOCK_COLUMNS)), mine, self.data.stock
+                )
+            self.data.stockIndex = None
+            return self.__changed()
+
+    def __locationSheet(self, locations: list[dict[str, Any]]) -> pd.DataFrame:
+        return pd.DataFrame(
+            locations,
+            columns=[LOCATION_ID_COLUMN, LOCATION_NAME_COLUMN, LOCATION_PARENT_COLUMN],
+        ).fillna("")
+
+    def __changed(self) -> tuple[int, int]:
+        previous = self.version
+        self.version += 1
+        if self.saveTimer is not None:
+            self.saveTimer.cancel()
+        self.saveTimer = threading.Timer(self.idleMs / 1000, self.save)
+        self.saveTimer.daemon = True
+        self.saveTimer.start()
+        return previous, self.version
+
+    def save(self):
+        """
+        Writes the data to the excel file if it changed since the last write.
+        The data is copied, so clients are not blocked while the file is written.
+        """
+        with self.saveLock:
+            with self.lock:
+                if self.savedVersion == self.version:
+                    return
+                version = self.version
+                data = copy.copy(self.data)
+                data.df = self.data.df.copy()
+                data.locations = copy.deepcopy(self.data.locations)
+                data.pending = PendingChanges()
+            db.saveToExel(data, self.path)
+            with self.lock:
+                self.savedVersion = version
+
+
+class SyncRequestHandler(BaseHTTPRequestHandler):
+    """
+    The protocol of the sync server, all bodies are JSON.
+
+    - ``GET /data``: All data (see ``db.snapshotOfData()``), 304 if the ``If-None-Match`` header is the current version
+    - ``GET /lookup?code=[code]``: ``{"row": [...]}`` with the values of the entry, 404 if there is none
+    - ``POST /rows``: ``{"headers": [...], "rows": [[...]], "deleted": [ids], "base": {id: [...]}}``,
+      merged with the changes of other clients, the answer also contains the ``conflicts``
+    - ``POST /locations``: ``{"locations": [...], "base": [...]}`` in the format of ``location.serializeLocations()``,
+      merged with the changes of other clients based on the locations before the change (``base``, may be null)
+    - ``POST /stock``: ``{"rows": [[id, location, amount]], "base": [[...]]}``, the further locations of entries,
+      merged like the locations
+    - ``POST /save``: Writes the excel file now instead of after the idle time
+
+    The POST requests answer with ``{"previousVersion": ..., "version": ...}``.
+    """
+
+    protocol_version = "HTTP/1.1"
+    server: "SyncHTTPServer"
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        store = self.server.store
+        if url.path == "/data":
+            version, body = store.snapshot()
+            if self.headers.get("If-None-Match") == str(version):
+                self.send(304, b"")
+            else:
+                self.send(200, body)
+        elif url.path == "/lookup":
+            code = parse_qs(url.query).get("code", [""])[0]
+            row = store.lookup(code)
+            if row is None:
+                self.reply(404, {"error": f"Code '{code}' nicht gefunden"})
+            else:
+                self.reply(200, {"row": row})
+        else:
+            self.reply(404, {"error": "Unbekannter Pfad"})
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        store = self.server.store
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length))
+            conflicts: list[RowConflict] = []
+            if url.path == "/rows":
+                # JSON keys are always strings
+                base = {int(id): values for id, values in body.get("base", {}).items()}
+                previous, version, conflicts = store.applyRows(
+                    body["headers"], body["rows"], body["deleted"], base
+                )
+            elif url.path == "/locations":
+                previous, version = store.setLocations(body["locations"], body.get("base"))
+            elif url.path == "/stock":
+                previous, version = store.setStock(body["rows"], body.get("base"))
+            elif url.path == "/save":
+                store.save()
+                previous = version = store.version
+            else:
+                self.reply(404, {"error": "Unbekannter Pfad"})
+                return
+        except (ValueError, KeyError, TypeError) as e:
+            self.reply(400, {"error": f"Ungültige Anfrage: {e}"})
+            return
+        self.reply(
+            200,
+            {
+                "previousVersion": previous,
+                "version": version,
+                "conflicts": [asdict(conflict) for conflict in conflicts],
+            },
+        )
+
+    def reply(self, status: int, answer: dict[str, Any]):
+        self.send(status, json.dumps(answer, ensure_ascii=False).encode("utf-8"))
+
+    def send(self, status: int, body: bytes):
+        self.send_response(status)
+        if body:
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any):
+        pass
+
+
+class SyncHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], store: SyncStore):
+        super().__init__(address, SyncRequestHandler)
+        self.store = store
+
+
+def main(args: list[str]):
+    parser = argparse.ArgumentParser(
+        description="Stellt eine Excel-Datenbank für mehrere Arbeitsplätze bereit. "
+        "In den Einstellungen der Arbeitsplätze wird statt des Datei-Pfads die Adresse "
+        "http://[Server]:[Port] eingetragen."
+    )
+    parser.add_argument("database", help="Pfad zur Excel-Datei")
+    parser.add_argument("--host", default="0.0.0.0", help="Adresse (Standard: alle Netzwerke)")
+    parser.add_argument("--port", type=int, default=8770, help="Port (Standard: 8770)")
+    options = parser.parse_args(args)
+
+    try:
+        store = SyncStore(options.database)
+    except ValueError as e:
+        print(f"[Error] {e.args[0]}")
+        return 1
+    server = SyncHTTPServer((options.host, options.port), store)
+    print(f"Server läuft auf http://{options.host}:{options.port} ({len(store.data.df)} Einträge)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        store.save()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))